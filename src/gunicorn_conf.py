@@ -1,6 +1,16 @@
+import os
 from multiprocessing import cpu_count
 
 bind = "0.0.0.0:8000"
-workers = cpu_count() * 2 + 1
 limit_request_fields = 32000
 limit_request_field_size = 0
+
+# sync - WSGI-приложение и синхронные воркеры; asgi - ASGI-приложение и воркеры uvicorn, в которых
+# ожидание внешних сервисов (Яндекс ID) не блокирует воркер
+if os.environ.get("GUNICORN_MODE", "sync") == "asgi":
+    wsgi_app = "lizaalert.settings.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+    workers = cpu_count() + 1
+else:
+    wsgi_app = "lizaalert.settings.wsgi:application"
+    workers = cpu_count() * 2 + 1
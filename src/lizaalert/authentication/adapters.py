@@ -1,6 +1,5 @@
 import uuid
 
-import requests
 from allauth.account import app_settings as account_settings
 from allauth.account.adapter import DefaultAccountAdapter
 from allauth.account.utils import user_email, user_field, user_username
@@ -11,6 +10,8 @@ from allauth.utils import email_address_exists, valid_email_or_none
 from django.conf import settings
 from rest_framework.exceptions import AuthenticationFailed
 
+from lizaalert.authentication.http import get_yandex_user_info
+
 
 class SocialAccountAdapter(DefaultSocialAccountAdapter):
     def is_auto_signup_allowed(self, request, sociallogin):
@@ -63,11 +64,7 @@ class YandexCustomAdapter(YandexAuth2Adapter):
     def complete_login(self, request, app, token, **kwargs):
         # Изменен способ передачи токена при GET-запросе на более безопасный - через
         # header (согласно рекомендациям Yandex.API).
-        resp = requests.get(
-            self.profile_url,
-            headers={"Authorization": "OAuth " + token.token},
-            params={"format": "json"},
-        )
+        resp = get_yandex_user_info(self.profile_url, token.token, params={"format": "json"})
         resp.raise_for_status()
         extra_data = resp.json()
         return self.get_provider().sociallogin_from_response(request, extra_data)
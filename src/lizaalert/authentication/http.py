@@ -0,0 +1,41 @@
+"""
+Общий HTTP-клиент для исходящих запросов к внешним сервисам (Яндекс ID).
+
+Одна сессия requests на процесс переиспользует TCP/TLS-соединения из пула, а таймаут по умолчанию
+(OUTBOUND_HTTP_TIMEOUT) не дает медленному внешнему сервису занять воркер на неограниченное время.
+"""
+from functools import lru_cache
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+class TimeoutSession(requests.Session):
+    """Сессия с таймаутом по умолчанию для всех запросов."""
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", settings.OUTBOUND_HTTP_TIMEOUT)
+        return super().request(method, url, **kwargs)
+
+
+@lru_cache(maxsize=None)
+def get_session():
+    """Сессия с пулом соединений, общая для всех потоков процесса."""
+    session = TimeoutSession()
+    adapter = HTTPAdapter(
+        pool_connections=settings.OUTBOUND_HTTP_POOL_SIZE, pool_maxsize=settings.OUTBOUND_HTTP_POOL_SIZE
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_yandex_user_info(url, oauth_token, **kwargs):
+    """Запросить данные пользователя Яндекс ID, токен передается в заголовке."""
+    return get_session().get(url, headers={"Authorization": f"OAuth {oauth_token}"}, **kwargs)
+
+
+# Ожидание ответа выполняется в пуле потоков, не блокируя цикл событий ASGI-воркера
+async_get_yandex_user_info = sync_to_async(get_yandex_user_info, thread_sensitive=False)
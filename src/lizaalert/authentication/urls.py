@@ -7,4 +7,5 @@ urlpatterns = [
     path("auth/users/", views.CustomCreateUser.as_view(), name="custom_register"),
     path("auth/users/test/", views.HiddenTestAuth.as_view(), name="test_auth"),
     path("auth/token/create/", views.TokenExchange.as_view(), name="token_exchange"),
+    path("auth/token/create/async/", views.async_token_exchange, name="token_exchange_async"),
 ]
@@ -3,16 +3,18 @@
 Note:
 - generate refresh token  from rest_framework_simplejwt.tokens import RefreshToken
 """
+import json
 import logging
 import smtplib
 import socket
 from collections import namedtuple
 
 import requests
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.mail import send_mail
-from django.http import JsonResponse
+from django.http import HttpResponseNotAllowed, JsonResponse
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status
 from rest_framework.parsers import JSONParser
@@ -23,6 +25,7 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from lizaalert.authentication.http import async_get_yandex_user_info, get_yandex_user_info
 from lizaalert.authentication.serializers import (
     OauthTokenSerializer,
     ResetPasswordSerializer,
@@ -157,19 +160,75 @@ class TokenExchange(APIView):
     def post(self, request):
         yandex_user_data, status_code = self.get_yandex_user_data(request.data["oauth_token"])
         if not yandex_user_data:
-            serializer = YandexResponseStatusSerializer(status_code)
-            return Response(serializer.data, status=status.HTTP_401_UNAUTHORIZED)
-        user, _ = User.objects.get_or_create(id=int(yandex_user_data.id), username=yandex_user_data.login)
-        refresh = RefreshToken.for_user(user)
-        tokens = self.Tokens(str(refresh), str(refresh.access_token))
-        return Response(TokenRefreshSerializer(tokens).data, status=status.HTTP_201_CREATED)
+            return Response(*self.yandex_error(status_code))
+        return Response(self.create_tokens(yandex_user_data), status=status.HTTP_201_CREATED)
 
     def get_yandex_user_data(self, oauth_token):
-        headers = {"Authorization": f"OAuth {oauth_token}"}
-        request = requests.get(settings.YANDEX_INFO_URL, headers=headers)
-        if request.status_code == status.HTTP_200_OK:
-            request_data = request.json()
+        try:
+            request = get_yandex_user_info(settings.YANDEX_INFO_URL, oauth_token)
+        except requests.RequestException as ex:
+            logger.warning(f"Yandex ID is unavailable: {ex!r}")
+            return None, self.YandexStatus(status.HTTP_504_GATEWAY_TIMEOUT)
+        return self.parse_yandex_response(request.status_code, request.json)
+
+    def parse_yandex_response(self, status_code, get_json):
+        if status_code == status.HTTP_200_OK:
+            request_data = get_json()
             user_data = self.UserData(request_data["id"], request_data["login"])
         else:
             user_data = None
-        return user_data, self.YandexStatus(request.status_code)
+        return user_data, self.YandexStatus(status_code)
+
+    @staticmethod
+    def yandex_error(status_code):
+        """Тело и код ответа при неудачном запросе к Яндекс ID: 401 при отказе, 502 при недоступности сервиса."""
+        response_status = (
+            status.HTTP_502_BAD_GATEWAY
+            if status_code.yandex_response_status >= status.HTTP_500_INTERNAL_SERVER_ERROR
+            else status.HTTP_401_UNAUTHORIZED
+        )
+        return YandexResponseStatusSerializer(status_code).data, response_status
+
+    @classmethod
+    def create_tokens(cls, yandex_user_data):
+        user, _ = User.objects.get_or_create(id=int(yandex_user_data.id), username=yandex_user_data.login)
+        refresh = RefreshToken.for_user(user)
+        tokens = cls.Tokens(str(refresh), str(refresh.access_token))
+        return TokenRefreshSerializer(tokens).data
+
+
+async def async_token_exchange(request):
+    """
+    Асинхронная версия TokenExchange для запуска под ASGI (uvicorn-воркеры).
+
+    Ожидание ответа Яндекс ID не занимает воркер: запрос выполняется в пуле потоков через общий
+    HTTP-клиент, обращения к БД - в синхронном потоке Django. Django 3.2 поддерживает асинхронными
+    только функции-представления, поэтому представление не использует APIView.
+
+    Методы:
+    - POST: Принимает OAuth-токен Яндекс, Возвращает acsess и refresh JWT-токены.
+
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    try:
+        oauth_token = json.loads(request.body)["oauth_token"] if request.body else request.POST["oauth_token"]
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({"oauth_token": ["Обязательное поле."]}, status=status.HTTP_400_BAD_REQUEST)
+    token_exchange = TokenExchange()
+    try:
+        response = await async_get_yandex_user_info(settings.YANDEX_INFO_URL, oauth_token)
+    except requests.RequestException as ex:
+        logger.warning(f"Yandex ID is unavailable: {ex!r}")
+        yandex_user_data, status_code = None, token_exchange.YandexStatus(status.HTTP_504_GATEWAY_TIMEOUT)
+    else:
+        yandex_user_data, status_code = token_exchange.parse_yandex_response(response.status_code, response.json)
+    if not yandex_user_data:
+        data, response_status = token_exchange.yandex_error(status_code)
+        return JsonResponse(data, status=response_status)
+    tokens = await sync_to_async(token_exchange.create_tokens)(yandex_user_data)
+    return JsonResponse(tokens, status=status.HTTP_201_CREATED)
+
+
+# csrf_exempt из Django 3.2 оборачивает представление в синхронную функцию
+async_token_exchange.csrf_exempt = True
@@ -1,8 +1,13 @@
-from django.contrib import admin
+from collections import Counter
+
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.shortcuts import render
 from django.urls import reverse
 from django.utils.html import format_html
 
-from lizaalert.courses.forms import CohortForm
+from lizaalert.courses.enrollment import BulkEnrollment
+from lizaalert.courses.forms import BulkEnrollmentForm, CohortForm
 from lizaalert.courses.models import (
     FAQ,
     Chapter,
@@ -123,9 +128,44 @@ class CourseAdmin(BaseAdmin):
         "updated_at",
         "division",
     )
+    readonly_fields = ("lessons_count", "course_duration")
     ordering = ("-updated_at",)
     empty_value_display = "-пусто-"
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.actions += ("bulk_enroll",)
+
+    @admin.action(description="Записать пользователей на курс")
+    def bulk_enroll(self, request, queryset):
+        """Записать на выбранный курс список пользователей, заданный на промежуточной странице."""
+        if queryset.count() != 1:
+            self.message_user(request, "Для записи пользователей выберите один курс.", messages.ERROR)
+            return None
+        course = queryset.get()
+        form = BulkEnrollmentForm(request.POST if "apply" in request.POST else None)
+        if not form.is_valid():
+            context = {
+                **self.admin_site.each_context(request),
+                "title": f"Запись пользователей на курс {course.title}",
+                "opts": self.model._meta,
+                "course": course,
+                "form": form,
+                "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+            }
+            return render(request, "admin/courses/course/bulk_enroll.html", context)
+        results = BulkEnrollment(course, **form.cleaned_data["users"]).run()
+        counts = Counter(result["status"] for result in results)
+        self.message_user(
+            request,
+            "; ".join(f"{label}: {counts[status]}" for status, label in BulkEnrollment.Status.choices),
+            messages.SUCCESS if counts[BulkEnrollment.Status.ENROLLED] else messages.WARNING,
+        )
+        not_found = [result["user"] for result in results if result["status"] == BulkEnrollment.Status.NOT_FOUND]
+        if not_found:
+            self.message_user(request, f"Не найдены: {', '.join(not_found)}", messages.WARNING)
+        return None
+
     # Автоматическое заполнение полей user_created и user_modifier для главы
     def save_formset(self, request, form, formset, change):
         if formset.model == Chapter:
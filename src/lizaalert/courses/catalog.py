@@ -0,0 +1,136 @@
+from django.db.models import Exists, F, FilteredRelation, OuterRef, Prefetch, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from lizaalert.courses.models import Chapter, Cohort, Course, CourseProgressStatus, Lesson, Subscription
+
+
+class CourseCatalogQuery:
+    """
+    Построитель запроса каталога курсов.
+
+    Собирает queryset курсов для списка и для детального просмотра так, чтобы каждый курс
+    встречался в выдаче ровно один раз:
+
+    - количество и продолжительность уроков заранее посчитаны в полях курса (Course.update_statistics);
+    - наличие подходящей когорты проверяется через EXISTS, без JOIN, размножающего строки курса;
+    - поля пользователя берутся из LEFT JOIN на его подписку и прогресс по курсу
+      (пары user, course и subscription, course уникальны).
+
+    course - курс для детального просмотра, для списка курсов не передается.
+    with_content - загружать FAQ, умения, главы и уроки; не нужно, если содержимое курса
+    берется из закешированного снимка (CourseSnapshot).
+    """
+
+    subscription_alias = "user_subscription"
+
+    def __init__(self, user, course=None, with_content=True):
+        self.user = user
+        self.course = course
+        self.with_content = with_content
+
+    @property
+    def is_authenticated(self):
+        return self.user.is_authenticated
+
+    def available_cohort_exists(self):
+        """
+        Проверка наличия когорты для записи.
+
+        Подходит всегда открытая когорта либо стартующая позже и со свободными местами.
+        Курс, у которого когорт нет совсем, как и прежде считается всегда доступным.
+        """
+        cohorts = Cohort.objects.filter(course=OuterRef("pk"))
+        available_cohorts = cohorts.filter(
+            Q(start_date=None, max_students=None)
+            | Q(start_date__gte=timezone.now().date(), students_count__lt=F("max_students"))
+        )
+        return Q(Exists(available_cohorts)) | ~Q(Exists(cohorts))
+
+    def visibility_filter(self):
+        """
+        Условие попадания курса в каталог.
+
+        Опубликованные курсы с доступной когортой видны всем.
+        Аутентифицированному пользователю также видны опубликованные и скрытые курсы, на которые он подписан.
+        """
+        visible = Q(status=Course.CourseStatus.PUBLISHED) & self.available_cohort_exists()
+        if self.is_authenticated:
+            visible |= Q(
+                status__in=(Course.CourseStatus.PUBLISHED, Course.CourseStatus.HIDDEN),
+                **{f"{self.subscription_alias}__isnull": False},
+            )
+        return visible
+
+    def user_subscription_relation(self):
+        """Подписка текущего пользователя на курс, присоединяемая через LEFT JOIN."""
+        return FilteredRelation(
+            "subscriptions",
+            condition=Q(subscriptions__user=self.user, subscriptions__deleted_at__isnull=True),
+        )
+
+    def user_annotations(self):
+        """
+        Аннотации, зависящие от пользователя.
+
+        - user_status - статус подписки пользователя на курс;
+        - user_course_progress - прогресс пользователя по курсу;
+        - start_date - дата начала когорты пользователя;
+        - current_lesson, current_chapter - текущий урок и глава (только для детального просмотра).
+        """
+        annotations = {
+            "user_status": Coalesce(
+                F(f"{self.subscription_alias}__status"),
+                Value(Subscription.Status.NOT_ENROLLED),
+            ),
+            "user_course_progress": Coalesce(
+                F(f"{self.subscription_alias}__course_progress__progress"),
+                Value(CourseProgressStatus.ProgressStatus.NOT_STARTED),
+            ),
+            "start_date": F(f"{self.subscription_alias}__cohort__start_date"),
+        }
+        if self.course:
+            current_lesson = self.course.current_lesson(self.user)
+            annotations["current_lesson"] = current_lesson.values("id")[:1]
+            annotations["current_chapter"] = current_lesson.values("chapter_id")[:1]
+        return annotations
+
+    @staticmethod
+    def user_status(course, user):
+        """
+        Статус пользователя по отношению к курсу из аннотаций каталога.
+
+        Доступность когорты определяется по аннотированной дате начала (start_date),
+        поэтому дополнительных запросов на каждый курс не выполняется.
+        """
+        if not user.is_authenticated:
+            return Subscription.Status.NOT_ENROLLED
+        if course.user_status == Subscription.Status.ENROLLED and Cohort.is_started(course.start_date):
+            return Subscription.Status.AVAILABLE
+        return course.user_status
+
+    @staticmethod
+    def chapters_prefetch():
+        """
+        Главы и уроки курса, нужны только для детального просмотра.
+
+        Прогресс пользователя по главам и урокам не аннотируется, а загружается отдельно (ProgressSnapshot).
+        """
+        return (
+            Prefetch("chapters", queryset=Chapter.objects.all()),
+            Prefetch("chapters__lessons", queryset=Lesson.objects.all()),
+        )
+
+    def build(self):
+        """Вернуть queryset каталога, упорядоченный по id и без дублей курсов."""
+        queryset = Course.objects.select_related("level")
+        if self.with_content:
+            queryset = queryset.prefetch_related("faq", "knowledge")
+            if self.course:
+                queryset = queryset.prefetch_related(*self.chapters_prefetch())
+        if self.is_authenticated:
+            queryset = queryset.annotate(**{self.subscription_alias: self.user_subscription_relation()})
+        queryset = queryset.filter(self.visibility_filter())
+        if self.is_authenticated:
+            queryset = queryset.annotate(**self.user_annotations())
+        return queryset.order_by("id")
@@ -0,0 +1,115 @@
+import hashlib
+import uuid
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from lizaalert.courses.models import Cohort
+
+
+class CatalogResponseCache:
+    """
+    Кеш ответов каталога курсов для неаутентифицированных пользователей.
+
+    Для анонимного пользователя список и детальный просмотр курса зависят только от опубликованных
+    курсов, доступности когорт и параметров запроса, поэтому готовые данные ответа хранятся в кеше Django.
+
+    Ключ строится из версии каталога, действия, id курса и нормализованных параметров запроса.
+    Версия меняется сигналами при изменении курсов, глав, уроков, когорт, FAQ и умений,
+    после чего прежние ключи больше не читаются и удаляются кешем по таймауту.
+    Доступность когорт зависит от текущей даты, поэтому запись живет не дольше ближайшей границы суток,
+    на которой меняется доступность какой-либо когорты.
+    """
+
+    key_prefix = "courses:catalog"
+    version_key = f"{key_prefix}:version"
+    hits_key = f"{key_prefix}:hits"
+    misses_key = f"{key_prefix}:misses"
+    query_params = ("level", "course_format", "cursor", "page_size", "with_count")
+
+    def __init__(self, request, action, pk=None):
+        self.request = request
+        self.action = action
+        self.pk = pk
+
+    @classmethod
+    def is_cacheable(cls, request):
+        return request.method == "GET" and not request.user.is_authenticated
+
+    def normalized_params(self):
+        """Параметры запроса, влияющие на ответ, в каноническом виде: level сортируется, пустые значения опускаются."""
+        params = []
+        for name in self.query_params:
+            value = self.request.query_params.get(name, "")
+            if name == "level":
+                value = ",".join(sorted(filter(None, value.split(","))))
+            if value:
+                params.append(f"{name}={value}")
+        return "&".join(params)
+
+    @classmethod
+    def version(cls):
+        version = cache.get(cls.version_key)
+        if version is None:
+            version = uuid.uuid4().hex
+            cache.add(cls.version_key, version, None)
+            version = cache.get(cls.version_key, version)
+        return version
+
+    def cache_key(self):
+        # Хост входит в ключ, так как ссылки пагинации в ответе абсолютные
+        params = f"{self.request.get_host()}?{self.normalized_params()}"
+        digest = hashlib.md5(params.encode()).hexdigest()
+        return f"{self.key_prefix}:{self.version()}:{self.action}:{self.pk or ''}:{digest}"
+
+    @staticmethod
+    def timeout():
+        """
+        Время жизни записи в секундах.
+
+        Не больше COURSE_CATALOG_CACHE_TIMEOUT и не дольше полуночи после ближайшей
+        даты начала когорты (с этого момента когорта перестает быть доступной для записи).
+        """
+        timeout = settings.COURSE_CATALOG_CACHE_TIMEOUT
+        now = timezone.localtime()
+        next_start_date = (
+            Cohort.objects.filter(start_date__gte=now.date())
+            .order_by("start_date")
+            .values_list("start_date", flat=True)
+            .first()
+        )
+        if next_start_date:
+            boundary = timezone.make_aware(datetime.combine(next_start_date + timedelta(days=1), time.min))
+            timeout = min(timeout, max(int((boundary - now).total_seconds()), 1))
+        return timeout
+
+    @classmethod
+    def _increment(cls, key):
+        if cache.add(key, 1, None):
+            return
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+    def get(self):
+        """Вернуть закешированные данные ответа или None, учитывая попадание или промах."""
+        data = cache.get(self.cache_key())
+        self._increment(self.misses_key if data is None else self.hits_key)
+        return data
+
+    def set(self, data):
+        cache.set(self.cache_key(), data, self.timeout())
+
+    @classmethod
+    def invalidate(cls):
+        """Сбросить кеш каталога сменой версии."""
+        cache.set(cls.version_key, uuid.uuid4().hex, None)
+
+    @classmethod
+    def stats(cls):
+        """Счетчики попаданий и промахов кеша."""
+        counters = cache.get_many((cls.hits_key, cls.misses_key))
+        return {"hits": counters.get(cls.hits_key, 0), "misses": counters.get(cls.misses_key, 0)}
@@ -0,0 +1,77 @@
+import hashlib
+from datetime import datetime
+
+from django.db.models import F, Func, Subquery
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+
+
+def load_tree_state(queryset, **related):
+    """
+    Одним запросом получить состояние дерева объектов.
+
+    Для каждого queryset из related возвращается наибольший updated_at и количество записей
+    (ключи state_<name>_updated_at и state_<name>_count): изменение и мягкое удаление меняют дату,
+    полное удаление - количество.
+    queryset - запрос к корневому объекту, для которого выполняются подзапросы (обычно filter(pk=...)),
+    related-запросы могут ссылаться на него через OuterRef.
+    Возвращает словарь или None, если корневой объект не найден.
+    """
+    annotations = {}
+    for name, related_queryset in related.items():
+        related_queryset = related_queryset.order_by()
+        annotations[f"state_{name}_updated_at"] = Subquery(
+            related_queryset.values(value=Func(F("updated_at"), function="MAX"))
+        )
+        annotations[f"state_{name}_count"] = Subquery(related_queryset.values(value=Func(F("id"), function="COUNT")))
+    return queryset.values(**annotations).first()
+
+
+class ConditionalGetMixin:
+    """
+    Условные GET-запросы (ETag / Last-Modified) для детального просмотра.
+
+    Представление описывает состояние отдаваемого объекта методом get_conditional_state: значения,
+    от которых зависит ответ (даты изменения, количество записей, прогресс пользователя).
+    ETag строится из этих значений и пользователя, Last-Modified - наибольшая дата среди них.
+    Если клиент передал совпадающий If-None-Match (или If-Modified-Since), возвращается 304 без сериализации.
+    conditional_response вызывается после проверки разрешений, поэтому 304 не раскрывает недоступные объекты.
+    """
+
+    def get_conditional_state(self, obj):
+        """Вернуть кортеж значений, определяющих ответ, или None, если условный ответ невозможен."""
+        raise NotImplementedError
+
+    def get_etag(self, state):
+        # str, а не repr: значение перечисления (например, прогресс) и такое же число дают один ETag
+        source = "|".join(str(value) for value in (self.request.user.pk, *state))
+        digest = hashlib.md5(source.encode()).hexdigest()
+        return quote_etag(digest)
+
+    @staticmethod
+    def get_last_modified(state):
+        dates = [value for value in state if isinstance(value, datetime)]
+        return int(max(dates).timestamp()) if dates else None
+
+    def conditional_response(self, obj, build_response):
+        """
+        Вернуть 304, если состояние объекта не изменилось, иначе ответ build_response().
+
+        В успешный ответ добавляются заголовки ETag и Last-Modified.
+        """
+        state = self.get_conditional_state(obj)
+        if state is None:
+            return build_response()
+        etag = self.get_etag(state)
+        last_modified = self.get_last_modified(state)
+        response = get_conditional_response(self.request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = build_response()
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+            if last_modified:
+                response["Last-Modified"] = http_date(last_modified)
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ("Authorization",))
+        return response
@@ -0,0 +1,98 @@
+from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from lizaalert.courses.catalog_cache import CatalogResponseCache
+from lizaalert.courses.models import Cohort, Subscription
+
+User = get_user_model()
+
+
+class BulkEnrollment:
+    """
+    Запись группы пользователей на курс в одной транзакции.
+
+    Пользователи задаются списками id и email (email сравнивается без учета регистра).
+    Места в когортах занимаются сразу для всей группы (Cohort.claim_seats), подписки создаются одним
+    bulk_create, ранее отмененные (мягко удаленные) подписки восстанавливаются с новой когортой.
+    run() возвращает результат для каждого переданного идентификатора в порядке передачи.
+    """
+
+    class Status(models.TextChoices):
+        ENROLLED = "enrolled", "Записан на курс"
+        ALREADY_ENROLLED = "already_enrolled", "Уже записан на курс"
+        NOT_FOUND = "not_found", "Пользователь не найден"
+        NO_SEATS = "no_seats", "Нет свободных мест"
+
+    def __init__(self, course, user_ids=(), emails=()):
+        self.course = course
+        self.user_ids = list(user_ids)
+        self.emails = list(emails)
+
+    def find_users(self):
+        """
+        Найти пользователей одним запросом.
+
+        Возвращает пары (идентификатор из запроса, id пользователя или None) в порядке передачи.
+        """
+        users = User.objects.annotate(email_lower=Lower("email")).filter(
+            Q(id__in=self.user_ids) | Q(email_lower__in=[email.lower() for email in self.emails])
+        )
+        found_ids, by_email = set(), {}
+        for user_id, email in users.values_list("id", "email_lower"):
+            found_ids.add(user_id)
+            if email:
+                by_email[email] = user_id
+        return [(user_id, user_id if user_id in found_ids else None) for user_id in self.user_ids] + [
+            (email, by_email.get(email.lower())) for email in self.emails
+        ]
+
+    def run(self):
+        with transaction.atomic():
+            identifiers = self.find_users()
+            user_ids = list(dict.fromkeys(user_id for _, user_id in identifiers if user_id is not None))
+            existing = {
+                subscription.user_id: subscription
+                for subscription in Subscription.all_objects.filter(course=self.course, user_id__in=user_ids)
+            }
+            enrolled = {user_id for user_id, subscription in existing.items() if subscription.deleted_at is None}
+            pending = [user_id for user_id in user_ids if user_id not in enrolled]
+            seats = [cohort for cohort, count in Cohort.claim_seats(self.course, len(pending)) for _ in range(count)]
+            cohorts = dict(zip(pending, seats))
+            self.save_subscriptions(cohorts, existing)
+        if cohorts:
+            CatalogResponseCache.invalidate()
+        results = []
+        for identifier, user_id in identifiers:
+            cohort_id = None
+            if user_id is None:
+                status = self.Status.NOT_FOUND
+            elif user_id in enrolled:
+                status, cohort_id = self.Status.ALREADY_ENROLLED, existing[user_id].cohort_id
+            elif user_id in cohorts:
+                status, cohort_id = self.Status.ENROLLED, cohorts[user_id].id
+            else:
+                status = self.Status.NO_SEATS
+            results.append({"user": str(identifier), "user_id": user_id, "status": status, "cohort_id": cohort_id})
+        return results
+
+    def save_subscriptions(self, cohorts, existing):
+        """Создать подписки пользователей с занятыми местами и восстановить отмененные подписки."""
+        now = timezone.now()
+        restored = []
+        for user_id, cohort in cohorts.items():
+            if user_id in existing:
+                subscription = existing[user_id]
+                subscription.cohort = cohort
+                subscription.status = Subscription.Status.ENROLLED
+                subscription.deleted_at = None
+                subscription.updated_at = now
+                restored.append(subscription)
+        Subscription.all_objects.bulk_update(restored, ("cohort", "status", "deleted_at", "updated_at"))
+        Subscription.objects.bulk_create(
+            Subscription(user_id=user_id, course=self.course, cohort=cohort, status=Subscription.Status.ENROLLED)
+            for user_id, cohort in cohorts.items()
+            if user_id not in existing
+        )
@@ -0,0 +1,270 @@
+from rest_framework import serializers
+
+from lizaalert.courses.catalog import CourseCatalogQuery
+from lizaalert.courses.models import BaseProgress
+
+# Поля DRF форматируют даты и логические значения так же (формат, часовой пояс), как DRF-сериализаторы
+_datetime_field = serializers.DateTimeField()
+_date_field = serializers.DateField()
+_boolean_field = serializers.BooleanField()
+
+
+def as_int(value):
+    return None if value is None else int(value)
+
+
+def as_str(value):
+    return None if value is None else str(value)
+
+
+def as_bool(value):
+    return None if value is None else _boolean_field.to_representation(value)
+
+
+def as_datetime(value):
+    return None if value is None else _datetime_field.to_representation(value)
+
+
+def as_date(value):
+    return None if value is None else _date_field.to_representation(value)
+
+
+class FastSerializer:
+    """
+    Облегченный сериализатор только для чтения.
+
+    Собирает словарь ответа напрямую из атрибутов объекта, без механизма полей DRF, и выдает
+    тот же JSON, что и соответствующий DRF-сериализатор (serializer_class представления).
+    Повторяет используемую представлениями часть интерфейса DRF: instance, many, context и data.
+    """
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @property
+    def data(self):
+        if self.many:
+            return [self.to_representation(obj) for obj in self.instance]
+        return self.to_representation(self.instance)
+
+    def to_representation(self, obj):
+        raise NotImplementedError
+
+
+class FastSerializerMixin:
+    """
+    Миксин представления, отдающий ответы действий чтения облегченными сериализаторами.
+
+    fast_serializer_classes - словарь {action: класс FastSerializer}.
+    serializer_class / get_serializer_class по-прежнему описывают ответ в документации API,
+    при построении схемы (swagger_fake_view) используются они.
+    """
+
+    fast_serializer_classes = {}
+
+    def get_serializer(self, *args, **kwargs):
+        fast_serializer_class = self.fast_serializer_classes.get(getattr(self, "action", None))
+        if fast_serializer_class is None or getattr(self, "swagger_fake_view", False):
+            return super().get_serializer(*args, **kwargs)
+        kwargs.setdefault("context", self.get_serializer_context())
+        return fast_serializer_class(*args, **kwargs)
+
+
+class FastCourseSerializer(FastSerializer):
+    """Облегченный аналог CourseSerializer для списка курсов."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.request = self.context.get("request")
+
+    @staticmethod
+    def cover_url(course):
+        return course.cover_path.url if course.cover_path else None
+
+    def absolute_url(self, url):
+        if url is None:
+            return None
+        return self.request.build_absolute_uri(url) if self.request is not None else url
+
+    @staticmethod
+    def faq(course):
+        return [
+            {
+                "id": faq.id,
+                "question": as_str(faq.question),
+                "answer": as_str(faq.answer),
+                "author": faq.author_id,
+                "created_at": as_datetime(faq.created_at),
+                "updated_at": as_datetime(faq.updated_at),
+            }
+            for faq in course.faq.all()
+        ]
+
+    @staticmethod
+    def knowledge(course):
+        return [
+            {
+                "id": knowledge.id,
+                "title": as_str(knowledge.title),
+                "description": as_str(knowledge.description),
+                "author": knowledge.author_id,
+                "created_at": as_datetime(knowledge.created_at),
+                "updated_at": as_datetime(knowledge.updated_at),
+            }
+            for knowledge in course.knowledge.all()
+        ]
+
+    def user_fields(self, course):
+        """Поля пользователя: у анонимного пользователя аннотаций нет, используются значения по умолчанию."""
+        return {
+            "user_status": CourseCatalogQuery.user_status(course, self.request.user),
+            "user_course_progress": int(
+                getattr(course, "user_course_progress", BaseProgress.ProgressStatus.NOT_STARTED)
+            ),
+        }
+
+    def to_representation(self, course):
+        return {
+            "id": course.id,
+            "title": as_str(course.title),
+            "level": as_str(course.level),
+            "course_format": as_str(course.course_format),
+            "short_description": as_str(course.short_description),
+            "lessons_count": as_int(course.lessons_count),
+            "course_duration": as_int(course.course_duration),
+            "cover_path": self.absolute_url(self.cover_url(course)),
+            "faq": self.faq(course),
+            "knowledge": self.knowledge(course),
+            **self.user_fields(course),
+            "start_date": as_date(getattr(course, "start_date", None)),
+        }
+
+
+class FastCourseDetailSerializer(FastCourseSerializer):
+    """
+    Облегченный аналог CourseDetailSerializer.
+
+    Содержимое курса, не зависящее от пользователя, берется из снимка курса (context["snapshot"],
+    см. CourseSnapshot), а без него - из prefetch каталога. На содержимое накладываются
+    поля пользователя: статус, прогресс по курсу, главам и урокам, текущий урок.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.progress = self.context.get("progress")
+
+    @classmethod
+    def content(cls, course):
+        """Не зависящая от пользователя часть ответа; cover_path - относительный url."""
+        return {
+            "id": course.id,
+            "title": as_str(course.title),
+            "level": as_str(course.level),
+            "full_description": as_str(course.full_description),
+            "faq": cls.faq(course),
+            "knowledge": cls.knowledge(course),
+            "cover_path": cls.cover_url(course),
+            "chapters": [
+                {
+                    "id": chapter.id,
+                    "title": as_str(chapter.title),
+                    "order_number": as_int(chapter.order_number),
+                    "lessons": [
+                        {
+                            "id": lesson.id,
+                            "order_number": as_int(lesson.order_number),
+                            "lesson_type": lesson.lesson_type,
+                            "duration": lesson.duration,
+                            "title": lesson.title,
+                        }
+                        for lesson in chapter.lessons.all()
+                    ],
+                }
+                for chapter in course.chapters.all()
+            ],
+        }
+
+    def lesson_progress(self, lesson_id):
+        return self.progress.lesson(lesson_id) if self.progress else BaseProgress.ProgressStatus.NOT_STARTED
+
+    def chapter_progress(self, chapter_id):
+        return self.progress.chapter(chapter_id) if self.progress else BaseProgress.ProgressStatus.NOT_STARTED
+
+    def chapters(self, content):
+        return [
+            {
+                "id": chapter["id"],
+                "title": chapter["title"],
+                "user_chapter_progress": int(self.chapter_progress(chapter["id"])),
+                "order_number": chapter["order_number"],
+                "lessons": [
+                    {**lesson, "user_lesson_progress": int(self.lesson_progress(lesson["id"]))}
+                    for lesson in chapter["lessons"]
+                ],
+            }
+            for chapter in content["chapters"]
+        ]
+
+    def current_lesson(self, course):
+        if not self.request.user.is_authenticated:
+            return None
+        return {"chapter_id": as_int(course.current_chapter), "lesson_id": as_int(course.current_lesson)}
+
+    def to_representation(self, course):
+        content = self.context.get("snapshot") or self.content(course)
+        return {
+            "id": content["id"],
+            "title": content["title"],
+            "level": content["level"],
+            "full_description": content["full_description"],
+            "faq": content["faq"],
+            "knowledge": content["knowledge"],
+            "cover_path": self.absolute_url(content["cover_path"]),
+            # Статистика курса пересчитывается UPDATE без сигналов, поэтому берется из строки курса, а не из снимка
+            "lessons_count": as_int(course.lessons_count),
+            "course_duration": as_int(course.course_duration),
+            "chapters": self.chapters(content),
+            **self.user_fields(course),
+            "current_lesson": self.current_lesson(course),
+            "start_date": as_date(getattr(course, "start_date", None)),
+        }
+
+
+class FastLessonSerializer(FastSerializer):
+    """Облегченный аналог LessonSerializer: навигация и хлебные крошки берутся из оглавления курса."""
+
+    @staticmethod
+    def breadcrumb_lesson(lesson):
+        if lesson is None:
+            return {"chapter_id": None, "lesson_id": None}
+        return {"chapter_id": as_int(lesson["chapter_id"]), "lesson_id": as_int(lesson["lesson_id"])}
+
+    @staticmethod
+    def breadcrumbs(lesson):
+        breadcrumbs = lesson.outline.breadcrumbs(lesson.chapter_id)
+        return {
+            part: {"id": as_int(breadcrumbs[part]["id"]), "title": as_str(breadcrumbs[part]["title"])}
+            for part in ("course", "chapter")
+        }
+
+    def to_representation(self, lesson):
+        outline = lesson.outline
+        return {
+            "id": lesson.id,
+            "course_id": as_int(lesson.chapter.course_id),
+            "chapter_id": lesson.chapter_id,
+            "title": as_str(lesson.title),
+            "description": as_str(lesson.description),
+            "video_link": as_str(lesson.video_link),
+            "lesson_type": as_str(lesson.lesson_type),
+            "tags": as_str(lesson.tags),
+            "duration": as_int(lesson.duration),
+            "additional": as_bool(lesson.additional),
+            "diploma": as_bool(lesson.diploma),
+            "breadcrumbs": self.breadcrumbs(lesson),
+            "user_lesson_progress": as_int(getattr(lesson, "user_lesson_progress", 0)),
+            "next_lesson": self.breadcrumb_lesson(outline.next_lesson(lesson.id)),
+            "prev_lesson": self.breadcrumb_lesson(outline.prev_lesson(lesson.id)),
+        }
@@ -1,10 +1,13 @@
+import re
 from collections import namedtuple
 
 from django import forms
 from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
 from django.utils.safestring import mark_safe
 
 from lizaalert.courses.models import Cohort
+from lizaalert.settings.constants import BULK_ENROLLMENT_MAX_USERS
 
 
 class CohortForm(forms.ModelForm):
@@ -59,3 +62,32 @@ class CohortForm(forms.ModelForm):
                     )
                 )
         return None
+
+
+class BulkEnrollmentForm(forms.Form):
+    """
+    Форма массовой записи пользователей на курс в админке.
+
+    Пользователи перечисляются через запятую, пробел или с новой строки: числа считаются id, остальное - email.
+    """
+
+    users = forms.CharField(
+        label="Пользователи",
+        widget=forms.Textarea(attrs={"rows": 10, "cols": 60}),
+        help_text="id или email пользователей через запятую, пробел или с новой строки.",
+    )
+
+    def clean_users(self):
+        user_ids, emails = [], []
+        for value in filter(None, re.split(r"[\s,;]+", self.cleaned_data["users"])):
+            if value.isdigit():
+                user_ids.append(int(value))
+                continue
+            try:
+                validate_email(value)
+            except ValidationError:
+                raise ValidationError(f"{value} - не id и не email пользователя.")
+            emails.append(value)
+        if len(user_ids) + len(emails) > BULK_ENROLLMENT_MAX_USERS:
+            raise ValidationError(f"За один раз можно записать не более {BULK_ENROLLMENT_MAX_USERS} пользователей.")
+        return {"user_ids": user_ids, "emails": emails}
@@ -0,0 +1,176 @@
+import json
+import math
+import subprocess
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from lizaalert.courses.models import Course, Lesson, Subscription
+from lizaalert.settings.instrumentation import QueryRecorder
+
+ENDPOINTS = ("catalog", "course_detail", "lesson_open", "lesson_complete", "quiz_submit", "profile")
+
+
+def percentile(values, percent):
+    """Процентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(len(ordered) * percent / 100) - 1)]
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ("git", "rev-parse", "HEAD"), capture_output=True, text=True, check=True, cwd=settings.BASE_DIR
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный замер горячих эндпоинтов (каталог, курс, открытие и завершение урока, ответ на квиз, профиль) "
+        "через тестовый клиент Django на текущей базе данных, например заполненной командой seed_dataset. "
+        "Сценарий выполняется от имени первых подписчиков курсов в транзакции, которая откатывается после замеров. "
+        "Результат (p50/p95 времени ответа и запросы к БД на запрос) сохраняется в JSON для сравнения между коммитами."
+    )
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        subscriptions = list(
+            Subscription.objects.select_related("user", "course")
+            .filter(
+                status=Subscription.Status.IN_PROGRESS,
+                course__status=Course.CourseStatus.PUBLISHED,
+                cohort__start_date__lte=today,
+            )
+            .order_by("id")[: options["users"]]
+        )
+        if not subscriptions:
+            raise CommandError("Нет подписок для замеров, заполните базу данных командой seed_dataset.")
+        samples = defaultdict(list)
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]), transaction.atomic():
+            try:
+                for round_number in range(options["warmup"] + options["repeat"]):
+                    warmup = round_number < options["warmup"]
+                    for subscription in subscriptions:
+                        for endpoint, sample in self.run_scenario(subscription):
+                            if not warmup:
+                                samples[endpoint].append(sample)
+            finally:
+                transaction.set_rollback(True)
+        report = self.build_report(samples, len(subscriptions), options)
+        with open(options["output"], "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.print_report(report)
+        if options["baseline"] and self.compare(report, options["baseline"], options["threshold"]):
+            if options["fail_on_regression"]:
+                raise CommandError("Обнаружены регрессии относительно базового замера.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20, help="Количество подписок (пользователей) в замере")
+        parser.add_argument("--repeat", type=int, default=5, help="Количество прогонов сценария")
+        parser.add_argument("--warmup", type=int, default=1, help="Количество прогонов без учета в результатах")
+        parser.add_argument("--output", default="benchmark_endpoints.json", help="Файл для результатов в JSON")
+        parser.add_argument("--baseline", help="Файл результатов предыдущего замера для сравнения")
+        parser.add_argument(
+            "--threshold", type=float, default=20, help="Допустимый рост p95 относительно базового замера, %%"
+        )
+        parser.add_argument(
+            "--fail-on-regression", action="store_true", help="Завершиться с ошибкой при обнаружении регрессий"
+        )
+
+    @staticmethod
+    def measure(client, method, url, data=None):
+        """Выполнить запрос, вернуть код ответа, время в миллисекундах и количество запросов к БД."""
+        recorder = QueryRecorder()
+        with recorder.record():
+            start = time.perf_counter()
+            response = getattr(client, method)(url, data, format="json")
+            duration = (time.perf_counter() - start) * 1000
+        return {"status": response.status_code, "duration": duration, "queries": len(recorder.queries)}
+
+    def run_scenario(self, subscription):
+        """Сценарий пользователя: каталог, курс, текущий урок, его завершение, ответ на квиз курса и профиль."""
+        user, course_id = subscription.user, subscription.course_id
+        client = APIClient(raise_request_exception=False)
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+        yield "catalog", self.measure(client, "get", reverse("courses-list"))
+        yield "course_detail", self.measure(client, "get", reverse("courses-detail", kwargs={"pk": course_id}))
+        lesson = subscription.course.current_lesson(user).first()
+        if lesson is not None:
+            yield "lesson_open", self.measure(client, "get", reverse("lessons-detail", kwargs={"pk": lesson.id}))
+            yield "lesson_complete", self.measure(client, "post", reverse("lessons-complete", kwargs={"pk": lesson.id}))
+        quiz_lesson = Lesson.objects.filter(course_id=course_id, quiz__isnull=False).select_related("quiz").first()
+        if quiz_lesson is not None:
+            # Начало прохождения квиза - подготовка сценария, в замер не входит
+            client.post(reverse("run-quiz", kwargs={"lesson_id": quiz_lesson.id}), format="json")
+            answers = [
+                {"question_id": question_id, "answer_id": [1]}
+                for question_id in quiz_lesson.quiz.questions.values_list("id", flat=True)
+            ]
+            yield "quiz_submit", self.measure(
+                client, "post", reverse("quiz-answer", kwargs={"lesson_id": quiz_lesson.id}), answers
+            )
+        yield "profile", self.measure(client, "get", reverse("profile"))
+
+    @staticmethod
+    def build_report(samples, users, options):
+        endpoints = {}
+        for endpoint in ENDPOINTS:
+            if not samples[endpoint]:
+                continue
+            durations = [sample["duration"] for sample in samples[endpoint]]
+            queries = [sample["queries"] for sample in samples[endpoint]]
+            endpoints[endpoint] = {
+                "requests": len(durations),
+                "errors": sum(sample["status"] >= 400 for sample in samples[endpoint]),
+                "p50_ms": round(percentile(durations, 50), 2),
+                "p95_ms": round(percentile(durations, 95), 2),
+                "queries_mean": round(sum(queries) / len(queries), 2),
+                "queries_max": max(queries),
+            }
+        return {
+            "created_at": timezone.now().isoformat(),
+            "commit": current_commit(),
+            "database": connection.vendor,
+            "users": users,
+            "repeat": options["repeat"],
+            "endpoints": endpoints,
+        }
+
+    def print_report(self, report):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Замер на {report['database']}, коммит {report['commit']}"))
+        for endpoint, result in report["endpoints"].items():
+            line = (
+                f"  {endpoint}: p50 {result['p50_ms']} мс, p95 {result['p95_ms']} мс, "
+                f"запросов {result['queries_mean']} (max {result['queries_max']}), ошибок {result['errors']}"
+            )
+            self.stdout.write(self.style.ERROR(line) if result["errors"] else line)
+
+    def compare(self, report, baseline_path, threshold):
+        """Сравнить с базовым замером, вернуть True, если есть регрессии."""
+        with open(baseline_path, encoding="utf-8") as file:
+            baseline = json.load(file)
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Сравнение с коммитом {baseline.get('commit')}"))
+        regressions = False
+        for endpoint, result in report["endpoints"].items():
+            previous = baseline.get("endpoints", {}).get(endpoint)
+            if previous is None:
+                continue
+            growth = (result["p95_ms"] / previous["p95_ms"] - 1) * 100 if previous["p95_ms"] else 0
+            regression = growth > threshold or result["queries_max"] > previous["queries_max"]
+            regressions |= regression
+            line = (
+                f"  {endpoint}: p95 {previous['p95_ms']} -> {result['p95_ms']} мс ({growth:+.0f}%), "
+                f"запросов {previous['queries_max']} -> {result['queries_max']}"
+            )
+            self.stdout.write(self.style.ERROR(line) if regression else line)
+        return regressions
@@ -0,0 +1,116 @@
+import timeit
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from lizaalert.courses.catalog import CourseCatalogQuery
+from lizaalert.courses.fast_serializers import FastCourseDetailSerializer, FastCourseSerializer, FastLessonSerializer
+from lizaalert.courses.models import Chapter, Course, Lesson
+from lizaalert.courses.outline import CourseOutline
+from lizaalert.courses.progress import ProgressSnapshot
+from lizaalert.courses.serializers import CourseDetailSerializer, CourseSerializer, LessonSerializer
+from lizaalert.settings.constants import CHAPTER_STEP, LESSON_STEP
+from lizaalert.users.models import Level
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнить скорость DRF-сериализаторов и облегченных сериализаторов (fast_serializers) "
+        "на сгенерированном курсе. Данные создаются в транзакции и откатываются после замеров."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            course = self.create_course(options["chapters"], options["lessons"])
+            try:
+                self.run_benchmarks(course, options["repeat"])
+            finally:
+                CourseOutline.invalidate(course.id)
+                transaction.set_rollback(True)
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chapters", type=int, default=50, help="Количество глав в курсе")
+        parser.add_argument("--lessons", type=int, default=10, help="Количество уроков в каждой главе")
+        parser.add_argument("--repeat", type=int, default=20, help="Количество повторов сериализации")
+
+    @staticmethod
+    def create_course(chapters_count, lessons_count):
+        """Создать курс с главами и опубликованными уроками без сигналов (bulk_create)."""
+        author = User.objects.create_user(username="benchmark_serializers", email="benchmark@example.com")
+        level, _ = Level.objects.get_or_create(name=Level.LevelName.beginner)
+        course = Course.objects.create(
+            title="Курс для замеров",
+            course_format="Онлайн",
+            short_description="Курс для замеров",
+            full_description="Курс для замеров",
+            level=level,
+            user_created=author,
+            status=Course.CourseStatus.PUBLISHED,
+        )
+        Chapter.objects.bulk_create(
+            Chapter(
+                title=f"Глава {number}",
+                course=course,
+                order_number=number * CHAPTER_STEP,
+                user_created=author,
+                user_modifier=author,
+            )
+            for number in range(1, chapters_count + 1)
+        )
+        # Не все СУБД возвращают id из bulk_create, поэтому главы перечитываются
+        chapters = Chapter.objects.filter(course=course)
+        Lesson.objects.bulk_create(
+            Lesson(
+                title=f"Урок {number}",
+                chapter=chapter,
+                course=course,
+                position=chapter.order_number + number * LESSON_STEP,
+                order_number=number * LESSON_STEP,
+                lesson_type=Lesson.LessonType.LESSON,
+                tags="замеры",
+                duration=10,
+                status=Lesson.LessonStatus.PUBLISHED,
+                user_created=author,
+                user_modifier=author,
+            )
+            for chapter in chapters
+            for number in range(1, lessons_count + 1)
+        )
+        Course.update_statistics(Course.all_objects.filter(id=course.id))
+        return course
+
+    def run_benchmarks(self, course, repeat):
+        request = Request(APIRequestFactory().get("/"))
+        request.user = AnonymousUser()
+        context = {"request": request, "progress": ProgressSnapshot.load(request.user, course.id)}
+        course_detail = CourseCatalogQuery(request.user, course=course).build().get(id=course.id)
+        courses = list(CourseCatalogQuery(request.user).build())
+        lessons = list(Lesson.objects.select_related("chapter").filter(course=course).order_by("position")[:50])
+        benchmarks = (
+            ("Детальный просмотр курса", CourseDetailSerializer, FastCourseDetailSerializer, course_detail, {}),
+            ("Список курсов", CourseSerializer, FastCourseSerializer, courses, {"many": True}),
+            (f"Уроки курса ({len(lessons)})", LessonSerializer, FastLessonSerializer, lessons, {"many": True}),
+        )
+        renderer = JSONRenderer()
+        for title, serializer_class, fast_serializer_class, instance, kwargs in benchmarks:
+            results = []
+            for cls in (serializer_class, fast_serializer_class):
+                content = renderer.render(cls(instance, context=context, **kwargs).data)
+                seconds = timeit.timeit(
+                    lambda: renderer.render(cls(instance, context=context, **kwargs).data), number=repeat
+                )
+                results.append((cls.__name__, seconds / repeat, content))
+            (drf_name, drf_time, drf_content), (fast_name, fast_time, fast_content) = results
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(f"  {drf_name}: {drf_time * 1000:.2f} мс")
+            self.stdout.write(f"  {fast_name}: {fast_time * 1000:.2f} мс")
+            self.stdout.write(f"  Ускорение: {drf_time / fast_time:.1f}x")
+            if drf_content != fast_content:
+                self.stdout.write(self.style.ERROR("  JSON ответов различается"))
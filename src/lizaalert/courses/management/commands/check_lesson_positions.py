@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from lizaalert.courses.models import Lesson
+
+
+class Command(BaseCommand):
+    help = "Проверить сквозные позиции уроков в курсах и при необходимости пересчитать их"
+
+    def handle(self, *args, **options):
+        lessons = Lesson.all_objects.annotate(
+            expected_course=F("chapter__course_id"),
+            expected_position=F("chapter__order_number") + F("order_number"),
+        )
+        broken = lessons.filter(
+            Q(course__isnull=True, expected_course__isnull=False)
+            | Q(course__isnull=False, expected_course__isnull=True)
+            | Q(position__isnull=True, expected_position__isnull=False)
+            | ~Q(course_id=F("expected_course"))
+            | ~Q(position=F("expected_position"))
+        ).values_list("id", flat=True)
+        broken_ids = list(broken)
+        if not broken_ids:
+            self.stdout.write(self.style.SUCCESS("Позиции уроков согласованы"))
+            return
+        self.stdout.write(
+            self.style.WARNING(f"Уроков с неверной позицией: {len(broken_ids)} ({', '.join(map(str, broken_ids))})")
+        )
+        if options["fix"]:
+            updated = Lesson.update_positions(Lesson.all_objects.filter(id__in=broken_ids))
+            self.stdout.write(self.style.SUCCESS(f"Позиции пересчитаны для уроков: {updated}"))
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Пересчитать позиции уроков с расхождениями",
+        )
@@ -0,0 +1,94 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from lizaalert.courses.models import (
+    BaseProgress,
+    ChapterProgressStatus,
+    Cohort,
+    Lesson,
+    LessonProgressStatus,
+    Subscription,
+)
+
+
+def hot_queries(subscription):
+    """Горячие запросы курсов для подписки: название и queryset."""
+    lesson = Lesson.objects.filter(course_id=subscription.course_id).order_by("position").first()
+    return (
+        (
+            "Подписка пользователя на курс",
+            Subscription.objects.filter(user_id=subscription.user_id, course_id=subscription.course_id),
+        ),
+        (
+            "Пройденные уроки пользователя в курсе",
+            LessonProgressStatus.objects.filter(
+                subscription__user_id=subscription.user_id,
+                lesson__course_id=subscription.course_id,
+                progress=BaseProgress.ProgressStatus.FINISHED,
+            ).values("lesson_id"),
+        ),
+        (
+            "Прогресс по главе",
+            ChapterProgressStatus.objects.filter(
+                subscription=subscription, chapter_id=lesson.chapter_id if lesson else None
+            ),
+        ),
+        (
+            "Доступные когорты курса",
+            Cohort.objects.filter(
+                course_id=subscription.course_id,
+                start_date__gte=timezone.now().date(),
+                students_count__lt=F("max_students"),
+            ),
+        ),
+        (
+            "Опубликованные уроки главы",
+            Lesson.objects.filter(
+                chapter_id=lesson.chapter_id if lesson else None, status=Lesson.LessonStatus.PUBLISHED
+            ).order_by("order_number"),
+        ),
+        (
+            "Текущий урок курса",
+            Lesson.objects.filter(course_id=subscription.course_id, status=Lesson.LessonStatus.PUBLISHED).order_by(
+                "position"
+            )[:1],
+        ),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Вывести планы выполнения горячих запросов курсов (подписки, прогресс, когорты, уроки). "
+        "Для сравнения планов до и после индексов запустите команду до и после миграции courses 0034."
+    )
+
+    def handle(self, *args, **options):
+        subscriptions = Subscription.objects.order_by("id")
+        if subscription_id := options["subscription"]:
+            subscriptions = subscriptions.filter(id=subscription_id)
+        subscription = subscriptions.first()
+        if subscription is None:
+            raise CommandError("Нет подписки для построения запросов, заполните базу данных тестовыми данными.")
+        explain_options = {}
+        if options["analyze"]:
+            if connection.vendor != "postgresql":
+                raise CommandError("Параметр --analyze поддерживается только для PostgreSQL.")
+            explain_options["analyze"] = True
+        for title, queryset in hot_queries(subscription):
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write("")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--subscription",
+            type=int,
+            help="Id подписки, для которой строятся запросы, по умолчанию первая подписка",
+        )
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Выполнить запросы и показать фактическое время (EXPLAIN ANALYZE, только PostgreSQL)",
+        )
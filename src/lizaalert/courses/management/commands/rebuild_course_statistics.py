@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from lizaalert.courses.models import ChapterProgressStatus, Course, CourseProgressStatus
+
+
+class Command(BaseCommand):
+    help = "Пересчитать количество опубликованных уроков, глав и продолжительность курсов"
+
+    def handle(self, *args, **options):
+        courses = Course.all_objects.all()
+        if course_ids := options["courses"]:
+            courses = courses.filter(id__in=course_ids)
+        updated = Course.update_statistics(courses)
+        self.stdout.write(self.style.SUCCESS(f"Статистика пересчитана для курсов: {updated}"))
+        if options["progress"]:
+            course_ids = courses.values("id")
+            ChapterProgressStatus.update_counters(
+                ChapterProgressStatus.all_objects.filter(chapter__course__in=course_ids)
+            )
+            updated = CourseProgressStatus.update_counters(
+                CourseProgressStatus.all_objects.filter(course__in=course_ids)
+            )
+            self.stdout.write(self.style.SUCCESS(f"Счетчики прогресса пересчитаны для подписок: {updated}"))
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--courses",
+            type=int,
+            nargs="+",
+            help="Id курсов для пересчета, по умолчанию пересчитываются все курсы",
+        )
+        parser.add_argument(
+            "--progress",
+            action="store_true",
+            help="Также пересчитать счетчики пройденных уроков и глав в прогрессе пользователей",
+        )
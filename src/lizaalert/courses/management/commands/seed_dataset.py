@@ -0,0 +1,331 @@
+import random
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from lizaalert.courses.models import (
+    BaseProgress,
+    Chapter,
+    ChapterProgressStatus,
+    Cohort,
+    Course,
+    CourseProgressStatus,
+    Lesson,
+    LessonProgressStatus,
+    Subscription,
+)
+from lizaalert.quizzes.models import Question, Quiz
+from lizaalert.settings.constants import CHAPTER_STEP, LESSON_STEP
+from lizaalert.users.models import Level, Volunteer
+
+User = get_user_model()
+
+
+def chunked(iterable, size):
+    """Разбить итерируемый объект на списки не длиннее size."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполнить базу данных большим набором данных для нагрузочного тестирования: курсы с главами, уроками, "
+        "квизами и когортами, пользователи с профилями волонтеров, подписки и прогресс по урокам, главам и курсам. "
+        "Записи создаются bulk_create пачками, без сигналов; набор воспроизводим при одинаковом --seed."
+    )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.prefix = options["prefix"]
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        if User.objects.filter(username__startswith=f"{self.prefix}_").exists():
+            raise CommandError(f"Данные с префиксом {self.prefix} уже созданы, укажите другой --prefix.")
+        with transaction.atomic():
+            author = User.objects.create_user(username=f"{self.prefix}_author", email=f"{self.prefix}@example.com")
+            outlines = self.create_courses(author)
+            self.stdout.write(f"Курсов: {len(outlines)}")
+            user_ids = self.create_users()
+            self.stdout.write(f"Пользователей: {len(user_ids)}")
+            counts = self.create_subscriptions(user_ids, outlines)
+            self.stdout.write("Подписок: {subscriptions}, прогресса по урокам: {lessons}".format(**counts))
+
+    def add_arguments(self, parser):
+        parser.add_argument("--courses", type=int, default=2000, help="Количество курсов")
+        parser.add_argument("--chapters", type=int, default=5, help="Количество глав в курсе")
+        parser.add_argument("--lessons", type=int, default=6, help="Количество уроков в главе")
+        parser.add_argument("--cohorts", type=int, default=3, help="Количество когорт курса")
+        parser.add_argument("--users", type=int, default=100_000, help="Количество пользователей")
+        parser.add_argument("--subscriptions", type=int, default=5, help="Количество подписок пользователя")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Размер пачки bulk_create")
+        parser.add_argument("--seed", type=int, default=0, help="Начальное значение генератора случайных чисел")
+        parser.add_argument("--prefix", default="seed", help="Префикс имен пользователей и названий курсов")
+
+    def bulk_create(self, model, objects):
+        """Создать записи пачками: bulk_create превращает переданный генератор в список целиком."""
+        for chunk in chunked(objects, self.batch_size):
+            model.objects.bulk_create(chunk)
+
+    def create_courses(self, author):
+        """
+        Создать опубликованные курсы с главами, уроками, квизом в последнем уроке и когортами.
+
+        Возвращает оглавления курсов: {course_id: [(chapter_id, [lesson_id, ...]), ...]}.
+        """
+        level, _ = Level.objects.get_or_create(name=Level.LevelName.beginner)
+        self.bulk_create(
+            Course,
+            (
+                Course(
+                    title=f"{self.prefix} курс {number}",
+                    course_format=self.random.choice(("Онлайн", "Вебинар", "Смешанный")),
+                    short_description=f"Курс {number}",
+                    full_description=f"Полное описание курса {number}",
+                    level=level,
+                    user_created=author,
+                    status=Course.CourseStatus.PUBLISHED,
+                )
+                for number in range(1, self.options["courses"] + 1)
+            ),
+        )
+        # Не все СУБД возвращают id из bulk_create, поэтому записи перечитываются
+        courses = Course.objects.filter(user_created=author)
+        self.bulk_create(
+            Chapter,
+            (
+                Chapter(
+                    title=f"Глава {number}",
+                    course_id=course_id,
+                    order_number=number * CHAPTER_STEP,
+                    user_created=author,
+                    user_modifier=author,
+                )
+                for course_id in courses.values_list("id", flat=True).iterator()
+                for number in range(1, self.options["chapters"] + 1)
+            ),
+        )
+        chapters = Chapter.objects.filter(course__in=courses)
+        self.bulk_create(
+            Lesson,
+            (
+                Lesson(
+                    title=f"Урок {number}",
+                    chapter_id=chapter_id,
+                    course_id=course_id,
+                    position=order_number + number * LESSON_STEP,
+                    order_number=number * LESSON_STEP,
+                    lesson_type=Lesson.LessonType.LESSON,
+                    tags="нагрузка",
+                    duration=self.random.randint(5, 60),
+                    status=Lesson.LessonStatus.PUBLISHED,
+                    user_created=author,
+                    user_modifier=author,
+                )
+                for chapter_id, course_id, order_number in chapters.values_list(
+                    "id", "course_id", "order_number"
+                ).iterator()
+                for number in range(1, self.options["lessons"] + 1)
+            ),
+        )
+        outlines = {}
+        lessons = Lesson.objects.filter(course__in=courses).order_by("course_id", "position")
+        for lesson_id, chapter_id, course_id in lessons.values_list("id", "chapter_id", "course_id").iterator():
+            outline = outlines.setdefault(course_id, [])
+            if not outline or outline[-1][0] != chapter_id:
+                outline.append((chapter_id, []))
+            outline[-1][1].append(lesson_id)
+        self.create_quizzes(author, outlines)
+        self.create_cohorts(author, outlines)
+        Course.update_statistics(Course.all_objects.filter(user_created=author))
+        return outlines
+
+    def create_quizzes(self, author, outlines):
+        """Сделать последний урок каждого курса квизом из трех вопросов без ограничения попыток."""
+        deadline = timezone.now() + timedelta(days=365)
+        self.bulk_create(
+            Quiz,
+            (
+                Quiz(
+                    author=author,
+                    title=f"{self.prefix} квиз {course_id}",
+                    description="Итоговый квиз",
+                    duration_minutes=30,
+                    passing_score=2,
+                    status="active",
+                    deadline=deadline,
+                )
+                for course_id in outlines
+            ),
+        )
+        quiz_ids = dict(Quiz.objects.filter(author=author).values_list("title", "id"))
+        self.bulk_create(
+            Question,
+            (
+                Question(
+                    quiz_id=quiz_id,
+                    question_type="radio",
+                    title=f"Вопрос {number}",
+                    order_number=number,
+                    content=[
+                        {"id": answer, "text": f"Ответ {answer}", "is_correct": answer == 1} for answer in (1, 2, 3)
+                    ],
+                )
+                for quiz_id in quiz_ids.values()
+                for number in (1, 2, 3)
+            ),
+        )
+        for chunk in chunked(outlines.items(), self.batch_size):
+            lessons = [
+                Lesson(
+                    id=outline[-1][1][-1],
+                    lesson_type=Lesson.LessonType.QUIZ,
+                    quiz_id=quiz_ids[f"{self.prefix} квиз {course_id}"],
+                )
+                for course_id, outline in chunk
+            ]
+            Lesson.objects.bulk_update(lessons, ["lesson_type", "quiz"])
+
+    def create_cohorts(self, author, outlines):
+        """
+        Создать когорты курсов.
+
+        Первая когорта уже началась и в нее записываются пользователи набора данных,
+        остальные начнутся позже и ограничены по количеству мест.
+        """
+        today = timezone.now().date()
+        self.bulk_create(
+            Cohort,
+            (
+                Cohort(
+                    course_id=course_id,
+                    cohort_number=number,
+                    start_date=today - timedelta(days=30) if number == 1 else today + timedelta(days=30 * number),
+                    end_date=today + timedelta(days=30 * (number + 3)),
+                    teacher=author,
+                    max_students=None if number == 1 else self.random.randint(10, 500),
+                    students_count=0,
+                )
+                for course_id in outlines
+                for number in range(1, self.options["cohorts"] + 1)
+            ),
+        )
+
+    def create_users(self):
+        """Создать пользователей и их профили волонтеров, вернуть id пользователей."""
+        self.bulk_create(
+            User,
+            (
+                User(
+                    username=f"{self.prefix}_{number}",
+                    email=f"{self.prefix}_{number}@example.com",
+                    full_name=f"Волонтер {number}",
+                    password="!",
+                )
+                for number in range(1, self.options["users"] + 1)
+            ),
+        )
+        users = User.objects.filter(username__startswith=f"{self.prefix}_").exclude(username=f"{self.prefix}_author")
+        user_ids = list(users.values_list("id", flat=True))
+        self.bulk_create(Volunteer, (Volunteer(user_id=user_id) for user_id in user_ids))
+        return user_ids
+
+    def create_subscriptions(self, user_ids, outlines):
+        """
+        Подписать пользователей на случайные курсы и создать прогресс.
+
+        В каждом курсе пройдено случайное количество первых уроков, следующий урок начат;
+        прогресс по главам и курсу соответствует прогрессу по урокам.
+        """
+        course_ids = list(outlines)
+        cohorts = dict(Cohort.objects.filter(course_id__in=course_ids, cohort_number=1).values_list("course_id", "id"))
+        per_user = min(self.options["subscriptions"], len(course_ids))
+        counts = {"subscriptions": 0, "lessons": 0}
+        # Пачка пользователей подбирается так, чтобы подписок в ней было не больше batch_size
+        for users_chunk in chunked(user_ids, max(1, self.batch_size // max(per_user, 1))):
+            Subscription.objects.bulk_create(
+                Subscription(user_id=user_id, course_id=course_id, cohort_id=cohorts[course_id])
+                for user_id in users_chunk
+                for course_id in self.random.sample(course_ids, per_user)
+            )
+            subscriptions = list(
+                Subscription.objects.filter(user_id__in=users_chunk).values_list("id", "course_id").order_by("id")
+            )
+            counts["subscriptions"] += len(subscriptions)
+            counts["lessons"] += self.create_progress(subscriptions, outlines)
+        students = (
+            Subscription.objects.filter(cohort=OuterRef("pk"))
+            .order_by()
+            .values("cohort")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        Cohort.objects.filter(id__in=cohorts.values()).update(students_count=Coalesce(Subquery(students), Value(0)))
+        return counts
+
+    def create_progress(self, subscriptions, outlines):
+        """Создать прогресс подписок, вернуть количество записей прогресса по урокам."""
+        lessons, chapters, courses, statuses = [], [], [], {}
+        for subscription_id, course_id in subscriptions:
+            outline = outlines[course_id]
+            total = sum(len(lesson_ids) for _, lesson_ids in outline)
+            finished = self.random.randint(0, total)
+            position = 0
+            finished_chapters = 0
+            for chapter_id, lesson_ids in outline:
+                if position > finished:
+                    break
+                chapter_finished = 0
+                for lesson_id in lesson_ids:
+                    if position > finished:
+                        break
+                    progress = (
+                        BaseProgress.ProgressStatus.FINISHED
+                        if position < finished
+                        else BaseProgress.ProgressStatus.ACTIVE
+                    )
+                    chapter_finished += progress == BaseProgress.ProgressStatus.FINISHED
+                    lessons.append(
+                        LessonProgressStatus(subscription_id=subscription_id, lesson_id=lesson_id, progress=progress)
+                    )
+                    position += 1
+                chapter_done = chapter_finished == len(lesson_ids)
+                finished_chapters += chapter_done
+                chapters.append(
+                    ChapterProgressStatus(
+                        subscription_id=subscription_id,
+                        chapter_id=chapter_id,
+                        progress=BaseProgress.ProgressStatus.FINISHED
+                        if chapter_done
+                        else BaseProgress.ProgressStatus.ACTIVE,
+                        finished_lessons=chapter_finished,
+                    )
+                )
+            course_done = finished == total
+            courses.append(
+                CourseProgressStatus(
+                    subscription_id=subscription_id,
+                    course_id=course_id,
+                    progress=BaseProgress.ProgressStatus.FINISHED
+                    if course_done
+                    else BaseProgress.ProgressStatus.ACTIVE,
+                    finished_chapters=finished_chapters,
+                )
+            )
+            statuses[subscription_id] = (
+                Subscription.Status.COMPLETED if course_done else Subscription.Status.IN_PROGRESS
+            )
+        self.bulk_create(LessonProgressStatus, lessons)
+        self.bulk_create(ChapterProgressStatus, chapters)
+        self.bulk_create(CourseProgressStatus, courses)
+        for status in (Subscription.Status.COMPLETED, Subscription.Status.IN_PROGRESS):
+            ids = [subscription_id for subscription_id, value in statuses.items() if value == status]
+            for chunk in chunked(ids, self.batch_size):
+                Subscription.objects.filter(id__in=chunk).update(status=status)
+        return len(lessons)
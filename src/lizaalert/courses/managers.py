@@ -0,0 +1,78 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Q
+
+from lizaalert.courses.signals import invalidate_course_outline_on_commit, recount_progress_counters
+from lizaalert.settings.managers import SoftDeleteManager, SoftQuerySet
+
+# Поля главы и урока, от которых зависят статистика курса, курс и позиции уроков: {модель: поля}
+COURSE_CONTENT_FIELDS = {
+    "chapter": {"course", "course_id", "deleted_at"},
+    "lesson": {"chapter", "chapter_id", "status", "deleted_at"},
+}
+# Lookup курса главы и урока до и после изменения
+COURSE_LOOKUPS = {"chapter": ("course_id",), "lesson": ("course_id", "chapter__course_id")}
+
+
+class CourseContentQuerySet(SoftQuerySet):
+    """
+    Queryset глав и уроков с пересчетом данных курсов после массового изменения.
+
+    update() не вызывает сигналы сохранения, поэтому, если массово меняются курс главы, глава урока, статус
+    или дата удаления (queryset.update(), queryset.delete(), course.chapters.add(), chapter.lessons.remove()),
+    статистика, позиции уроков, счетчики прогресса и кеши прежних и новых курсов пересчитываются здесь.
+    Изменение порядковых номеров через update() позиции не пересчитывает: для этого есть
+    команда check_lesson_positions --fix.
+    """
+
+    def update(self, **kwargs):
+        model_name = self.model._meta.model_name
+        if not COURSE_CONTENT_FIELDS[model_name].intersection(kwargs):
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            changed = self.model.all_objects.filter(id__in=list(self.values_list("id", flat=True)))
+            course_ids = self._course_ids(changed, model_name)
+            updated = super().update(**kwargs)
+            course_ids |= self._course_ids(changed, model_name)
+            refresh_courses(course_ids)
+        return updated
+
+    @staticmethod
+    def _course_ids(queryset, model_name):
+        return {
+            course_id
+            for lookup in COURSE_LOOKUPS[model_name]
+            for course_id in queryset.values_list(lookup, flat=True)
+            if course_id
+        }
+
+
+class CourseContentManager(SoftDeleteManager):
+    """Менеджер глав и уроков с поддержкой мягкого удаления и пересчетом данных курсов после update()."""
+
+    def get_queryset(self):
+        """Возвращает queryset, исключая удаленные записи."""
+        return CourseContentQuerySet(self.model, using=self._db).filter(deleted_at__isnull=True)
+
+
+def refresh_courses(course_ids):
+    """
+    Пересчитать статистику курсов и позиции их уроков, а после фиксации транзакции - счетчики прогресса и кеши.
+
+    Пересчитываются и уроки, которые еще хранят один из курсов, но уже перенесены из него.
+    """
+    from lizaalert.courses.catalog_cache import CatalogResponseCache
+
+    if not course_ids:
+        return
+    course_model = apps.get_model("courses", "Course")
+    chapter_model = apps.get_model("courses", "Chapter")
+    lesson_model = apps.get_model("courses", "Lesson")
+    course_model.update_statistics(course_model.all_objects.filter(id__in=course_ids))
+    lesson_model.update_positions(
+        lesson_model.all_objects.filter(Q(course_id__in=course_ids) | Q(chapter__course_id__in=course_ids))
+    )
+    chapter_ids = chapter_model.all_objects.filter(course_id__in=course_ids).values_list("id", flat=True)
+    recount_progress_counters(list(chapter_ids), course_ids)
+    invalidate_course_outline_on_commit(*course_ids)
+    transaction.on_commit(CatalogResponseCache.invalidate)
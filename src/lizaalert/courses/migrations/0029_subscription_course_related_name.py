@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-18 15:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0028_auto_20240313_1341'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='subscription',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='subscriptions', to='courses.course'),
+        ),
+    ]
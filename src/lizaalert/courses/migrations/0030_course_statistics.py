@@ -0,0 +1,45 @@
+# Generated by Django 3.2.25 on 2026-10-18 15:39
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_course_statistics(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Lesson = apps.get_model('courses', 'Lesson')
+    lessons = (
+        Lesson.objects.filter(
+            chapter__course=OuterRef('pk'),
+            chapter__deleted_at__isnull=True,
+            deleted_at__isnull=True,
+            status=2,
+        )
+        .order_by()
+        .values('chapter__course')
+    )
+    Course.objects.update(
+        lessons_count=Coalesce(Subquery(lessons.annotate(total=Count('id')).values('total')), Value(0)),
+        course_duration=Coalesce(Subquery(lessons.annotate(total=Sum('duration')).values('total')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0029_subscription_course_related_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='course_duration',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Продолжительность опубликованных уроков'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='lessons_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество опубликованных уроков'),
+        ),
+        migrations.RunPython(populate_course_statistics, migrations.RunPython.noop),
+    ]
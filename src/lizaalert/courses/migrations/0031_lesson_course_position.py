@@ -0,0 +1,40 @@
+# Generated by Django 3.2.25 on 2026-10-18 15:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import F, OuterRef, Subquery
+
+
+def populate_lesson_positions(apps, schema_editor):
+    Chapter = apps.get_model('courses', 'Chapter')
+    Lesson = apps.get_model('courses', 'Lesson')
+    chapters = Chapter.objects.filter(id=OuterRef('chapter_id'))
+    Lesson.objects.update(
+        course_id=Subquery(chapters.values('course_id')),
+        position=Subquery(chapters.values('order_number')) + F('order_number'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0030_course_statistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='course',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lessons', to='courses.course', verbose_name='курс'),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='position',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='позиция урока в курсе'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['course', 'position'], name='lesson_course_position_idx'),
+        ),
+        migrations.RunPython(populate_lesson_positions, migrations.RunPython.noop),
+    ]
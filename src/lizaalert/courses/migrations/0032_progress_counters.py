@@ -0,0 +1,86 @@
+# Generated by Django 3.2.25 on 2026-10-18 15:52
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+PUBLISHED = 2
+FINISHED = 2
+
+
+def populate_progress_counters(apps, schema_editor):
+    Chapter = apps.get_model('courses', 'Chapter')
+    Course = apps.get_model('courses', 'Course')
+    Lesson = apps.get_model('courses', 'Lesson')
+    LessonProgressStatus = apps.get_model('courses', 'LessonProgressStatus')
+    ChapterProgressStatus = apps.get_model('courses', 'ChapterProgressStatus')
+    CourseProgressStatus = apps.get_model('courses', 'CourseProgressStatus')
+
+    lessons = (
+        Lesson.objects.filter(chapter=OuterRef('pk'), deleted_at__isnull=True, status=PUBLISHED)
+        .order_by().values('chapter').annotate(total=Count('id')).values('total')
+    )
+    Chapter.objects.update(lessons_count=Coalesce(Subquery(lessons), Value(0)))
+
+    chapters = (
+        Chapter.objects.filter(course=OuterRef('pk'), deleted_at__isnull=True, lessons_count__gt=0)
+        .order_by().values('course').annotate(total=Count('id')).values('total')
+    )
+    Course.objects.update(chapters_count=Coalesce(Subquery(chapters), Value(0)))
+
+    finished_lessons = (
+        LessonProgressStatus.objects.filter(
+            subscription=OuterRef('subscription'),
+            lesson__chapter=OuterRef('chapter'),
+            lesson__deleted_at__isnull=True,
+            lesson__status=PUBLISHED,
+            deleted_at__isnull=True,
+            progress=FINISHED,
+        )
+        .order_by().values('subscription').annotate(total=Count('lesson', distinct=True)).values('total')
+    )
+    ChapterProgressStatus.objects.update(finished_lessons=Coalesce(Subquery(finished_lessons), Value(0)))
+
+    finished_chapters = (
+        ChapterProgressStatus.objects.filter(
+            subscription=OuterRef('subscription'),
+            chapter__course=OuterRef('course'),
+            chapter__deleted_at__isnull=True,
+            chapter__lessons_count__gt=0,
+            deleted_at__isnull=True,
+            progress=FINISHED,
+        )
+        .order_by().values('subscription').annotate(total=Count('chapter', distinct=True)).values('total')
+    )
+    CourseProgressStatus.objects.update(finished_chapters=Coalesce(Subquery(finished_chapters), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0031_lesson_course_position'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapter',
+            name='lessons_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество опубликованных уроков'),
+        ),
+        migrations.AddField(
+            model_name='chapterprogressstatus',
+            name='finished_lessons',
+            field=models.PositiveIntegerField(default=0, verbose_name='пройдено уроков'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='chapters_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество глав с опубликованными уроками'),
+        ),
+        migrations.AddField(
+            model_name='courseprogressstatus',
+            name='finished_chapters',
+            field=models.PositiveIntegerField(default=0, verbose_name='пройдено глав'),
+        ),
+        migrations.RunPython(populate_progress_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.2.25 on 2026-10-18 15:56
+
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def remove_duplicate_progress(apps, schema_editor):
+    """Оставить по одной записи прогресса на пару (подписка, объект) - последнюю по updated_at."""
+    for model_name, item_field in (
+        ('LessonProgressStatus', 'lesson'),
+        ('ChapterProgressStatus', 'chapter'),
+        ('CourseProgressStatus', 'course'),
+    ):
+        model = apps.get_model('courses', model_name)
+        duplicates = (
+            model.objects.values('subscription_id', f'{item_field}_id')
+            .annotate(total=Count('id'))
+            .filter(total__gt=1)
+            .order_by()
+        )
+        for duplicate in duplicates:
+            records = model.objects.filter(
+                subscription_id=duplicate['subscription_id'], **{f'{item_field}_id': duplicate[f'{item_field}_id']}
+            ).order_by(F('deleted_at').desc(nulls_first=True), '-updated_at', '-id')
+            keep = records.values_list('id', flat=True).first()
+            records.exclude(id=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0032_progress_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_progress, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='chapterprogressstatus',
+            constraint=models.UniqueConstraint(fields=('subscription', 'chapter'), name='unique_chapter_progress'),
+        ),
+        migrations.AddConstraint(
+            model_name='courseprogressstatus',
+            constraint=models.UniqueConstraint(fields=('subscription', 'course'), name='unique_course_progress'),
+        ),
+        migrations.AddConstraint(
+            model_name='lessonprogressstatus',
+            constraint=models.UniqueConstraint(fields=('subscription', 'lesson'), name='unique_lesson_progress'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-18 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0033_unique_progress'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='lesson',
+            name='lesson_course_position_idx',
+        ),
+        migrations.AddIndex(
+            model_name='cohort',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['course', 'start_date'], name='cohort_course_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['course', 'position'], name='lesson_course_position_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['chapter', 'status', 'order_number'], name='lesson_chapter_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lessonprogressstatus',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['subscription', 'progress'], name='lesson_progress_status_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:18
+
+from django.db import migrations
+import django.db.models.manager
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0034_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='chapter',
+            options={'base_manager_name': 'all_objects', 'ordering': ('order_number',), 'verbose_name': 'глава', 'verbose_name_plural': 'глава'},
+        ),
+        migrations.AlterModelOptions(
+            name='lesson',
+            options={'base_manager_name': 'all_objects', 'ordering': ('order_number',), 'verbose_name': 'Урок', 'verbose_name_plural': 'Уроки'},
+        ),
+        migrations.AlterModelManagers(
+            name='chapter',
+            managers=[
+                ('objects', django.db.models.manager.Manager()),
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='lesson',
+            managers=[
+                ('objects', django.db.models.manager.Manager()),
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+    ]
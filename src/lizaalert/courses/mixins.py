@@ -1,6 +1,6 @@
 from django.apps import apps
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Max
 from django.utils import timezone
 
@@ -20,6 +20,7 @@ class TimeStampedModel(models.Model):
     all_objects - менеджер модели без поддержки мягкого удаления
 
     переопределен метод delete для мягкого удаления записи.
+    метод restore восстанавливает мягко удаленную запись.
     переопределен метод repr для отображения статуса удаления записи.
     """
 
@@ -36,6 +37,11 @@ class TimeStampedModel(models.Model):
         self.deleted_at = timezone.now()
         self.save()
 
+    def restore(self):
+        """Восстановить мягко удаленную запись."""
+        self.deleted_at = None
+        self.save()
+
     def __repr__(self):
         base_repr = super().__repr__()
         if self.deleted_at:
@@ -43,6 +49,30 @@ class TimeStampedModel(models.Model):
         return base_repr
 
 
+class DenormalizedFieldsMixin(models.Model):
+    """
+    Абстрактная модель с денормализованными полями.
+
+    denormalized_fields - поля, которые пересчитываются отдельными UPDATE-запросами.
+    При сохранении уже существующей записи эти поля не записываются, чтобы устаревшие значения
+    из экземпляра модели не затирали пересчитанные в базе данных.
+    """
+
+    denormalized_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.denormalized_fields
+            ]
+        super().save(*args, **kwargs)
+
+
 def order_number_mixin(step, parent_field):
     """Order number mixin setter."""
 
@@ -83,7 +113,7 @@ def order_number_mixin(step, parent_field):
             queryset - вызываем объект более высокого уровня
             order_factor - номер порядка, 1000 или 10.
             """
-            old_order_number = type(self).objects.get(id=self.id)
+            old_order_number = type(self).all_objects.filter(id=self.id).values_list("order_number", flat=True).first()
             if old_order_number != self.order_number:
                 objects = queryset.order_by("order_number")
                 for position, object in enumerate(objects):
@@ -98,17 +128,24 @@ def order_number_mixin(step, parent_field):
             queryset - вызываем объект более высокого уровня
             order_factor - номер порядка, 1000 или 10.
             """
+            self._positions_changed = True
             if not self.id:
                 max_order_number = queryset.aggregate(Max("order_number")).get("order_number__max")
                 self.order_number = (max_order_number or 0) + order_factor
                 return self.order_number
 
-            # получаем старый порядковый номер
-            old_order_number = type(self).objects.filter(id=self.id).values("order_number").first()
+            # получаем старые порядковый номер и родителя, в том числе у восстанавливаемой мягко удаленной записи
+            parent_id_field = f"{parent_field}_id"
+            old = (
+                type(self).all_objects.filter(id=self.id).values("order_number", "deleted_at", parent_id_field).first()
+                or {}
+            )
+            # восстановленная запись могла уступить свой номер другой, поэтому очередность переустанавливается
+            is_restored = old.get("deleted_at") is not None and self.deleted_at is None
             # округляем новый порядковый номер до шага очередности
             if self.order_number % order_factor != 0:
                 self.order_number = (self.order_number // order_factor + 1) * order_factor
-            if old_order_number["order_number"] != self.order_number:
+            if old.get("order_number") != self.order_number or is_restored:
                 objects = queryset.exclude(id=self.id).order_by("order_number")
                 objects_to_update = []
                 position = order_factor
@@ -125,21 +162,54 @@ def order_number_mixin(step, parent_field):
                 if self.order_number > position:
                     self.order_number = position
                 queryset.model.objects.bulk_update(objects_to_update, ["order_number"])
+            # сквозные позиции зависят только от порядковых номеров и родителя
+            self._positions_changed = (
+                not old
+                or is_restored
+                or old["order_number"] != self.order_number
+                or old[parent_id_field] != getattr(self, parent_id_field)
+            )
             return self.order_number
 
+        def update_course_positions(self):
+            """
+            Обновить сквозные позиции уроков курса после сохранения главы/урока.
+
+            Переопределяется в моделях главы и урока.
+            """
+
         def save(self, *args, **kwargs):
-            """Change ordering method."""
-            self._set_ordering(self.order_queryset, step)
-            super().save(*args, **kwargs)
+            """
+            Change ordering method.
+
+            Очередность, запись и сквозные позиции сохраняются в одной транзакции, поэтому колбэки
+            transaction.on_commit из сигналов сохранения выполняются уже после пересчета позиций.
+            Позиции уроков курса пересчитываются, только если изменились порядковый номер или родитель
+            записи либо запись восстановлена.
+            """
+            with transaction.atomic():
+                self._set_ordering(self.order_queryset, step)
+                super().save(*args, **kwargs)
+                if self._positions_changed:
+                    self.update_course_positions()
 
     return SaveOrderingMixin
 
 
 def status_update_mixin(parent: str = None, publish_status=None):
-    """Добавить методы finish и activate для обновления статусов модели. При необходимости обновить подписку."""
+    """
+    Добавить методы finish и activate для обновления статусов модели. При необходимости обновить подписку.
+
+    Родительская модель хранит в записи прогресса счетчик пройденных дочерних объектов
+    (progress_counter_field) и сравнивает его с заранее посчитанным количеством опубликованных
+    дочерних объектов (progress_total_field), поэтому завершение не пересчитывает соседние объекты.
+    """
     from lizaalert.courses.models import BaseProgress
 
     class FinishActivateMixin(models.Model):
+        progress_counter_field = None
+        progress_total_field = None
+
         class Meta:
             abstract = True
 
@@ -149,42 +219,78 @@ def status_update_mixin(parent: str = None, publish_status=None):
             return apps.get_model("courses", model_name)
 
         def _update_or_create_progress_status(self, subscription, instance, status):
-            """Обновление статуса прохождения урока, главы, курса, а также статуса подписки."""
+            """
+            Обновление статуса прохождения урока, главы, курса одним upsert-запросом.
+
+            Возвращает True, если запись создана или статус изменился.
+            """
+            return self._get_progress_model().set_progress(subscription, instance, status)
+
+        def _is_counted_in_parent(self):
+            """Учитывается ли объект в счетчике родителя: уроки учитываются, только если опубликованы."""
+            if publish_status:
+                return self.status == getattr(self, publish_status).PUBLISHED
+            return True
+
+        def _increment_finished_children(self, subscription):
+            """
+            Увеличить счетчик пройденных дочерних объектов в прогрессе данного объекта.
+
+            Счетчик увеличивается атомарно одним upsert-запросом, запись прогресса создается при первом
+            пройденном дочернем объекте. Возвращает True, если пройдены все опубликованные дочерние объекты.
+            """
+            self._get_progress_model().increment_counter(subscription, self, self.progress_counter_field)
+            return self._finished_all_children(subscription)
+
+        def _recount_finished_children(self, subscription):
+            """
+            Пересчитать счетчик пройденных дочерних объектов с нуля.
+
+            Используется при повторном завершении уже пройденного дочернего объекта, чтобы восстановить
+            счетчик, если прогресс менялся в обход finish. Возвращает True, если пройдены все дочерние объекты.
+            """
             lookup_field = self.__class__.__name__.lower()
             model = self._get_progress_model()
-            progress_status, created = model.objects.get_or_create(
-                subscription=subscription, **{lookup_field: instance}, defaults={"progress": status}
+            model.ensure_progress(subscription, self)
+            model.update_counters(model.objects.filter(subscription=subscription, **{lookup_field: self}))
+            return self._finished_all_children(subscription)
+
+        def _finished_all_children(self, subscription):
+            """
+            Сравнить счетчик пройденных дочерних объектов с количеством опубликованных дочерних объектов.
+
+            Счетчики пересчитываются сигналами при изменении состава опубликованных дочерних объектов,
+            поэтому объект завершается только при точном совпадении счетчика с количеством.
+            """
+            lookup_field = self.__class__.__name__.lower()
+            counters = (
+                self._get_progress_model()
+                .objects.filter(subscription=subscription, **{lookup_field: self})
+                .values_list(self.progress_counter_field, f"{lookup_field}__{self.progress_total_field}")
+                .first()
             )
-            if not created:
-                setattr(progress_status, "progress", status)
-                progress_status.save()
+            if counters is None:
+                total = type(self).all_objects.filter(id=self.id).values_list(self.progress_total_field, flat=True)
+                return not total.first()
+            finished, total = counters
+            return finished == total
 
         def finish(self, subscription):
             """Присвоить статус завершения."""
-            self._update_or_create_progress_status(
+            changed = self._update_or_create_progress_status(
                 subscription,
                 self,
                 BaseProgress.ProgressStatus.FINISHED,
             )
 
-            if parent:
-                filter_kwargs = {f"{self.__class__.__name__.lower()}__{parent}": getattr(self, parent)}
-                finished_queryset = (
-                    self._get_progress_model()
-                    .objects.filter(
-                        subscription=subscription, progress=BaseProgress.ProgressStatus.FINISHED, **filter_kwargs
-                    )
-                    .values(f"{self.__class__.__name__.lower()}_id")
-                )
-
-                filter_args = {parent: getattr(self, parent)}
-                if publish_status:
-                    filter_args["status"] = getattr(self, publish_status).PUBLISHED
-
-                items = self.__class__.objects.filter(**filter_args).exclude(id__in=finished_queryset).count()
-
-                if items == 0:
-                    getattr(getattr(self, parent), "finish")(subscription)
+            if parent and self._is_counted_in_parent():
+                parent_object = getattr(self, parent)
+                if changed:
+                    finished_all = parent_object._increment_finished_children(subscription)
+                else:
+                    finished_all = parent_object._recount_finished_children(subscription)
+                if finished_all:
+                    parent_object.finish(subscription)
 
         def activate(self, subscription):
             """Присвоить статус активировать."""
@@ -2,13 +2,15 @@ from datetime import datetime
 
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
-from django.db import models, transaction
-from django.db.models import DateField, F, Max, Q, Value
+from django.db import connection, models, transaction
+from django.db.models import Count, DateField, F, Max, OuterRef, Q, Subquery, Sum, Value
 from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.functional import cached_property
 
 from lizaalert.courses.exceptions import AlreadyExistsException, NoSuitableCohort, ProgressNotFinishedException
-from lizaalert.courses.mixins import TimeStampedModel, order_number_mixin, status_update_mixin
+from lizaalert.courses.managers import CourseContentManager, CourseContentQuerySet
+from lizaalert.courses.mixins import DenormalizedFieldsMixin, TimeStampedModel, order_number_mixin, status_update_mixin
 from lizaalert.courses.signals import course_finished
 from lizaalert.courses.utils import check_finished_content
 from lizaalert.quizzes.models import Quiz
@@ -33,9 +35,85 @@ class BaseProgress(models.Model):
         default=0,
     )
 
+    # Поле объекта прохождения (урок, глава, курс), пара (subscription, item_field) уникальна
+    item_field = None
+
     class Meta:
         abstract = True
 
+    @classmethod
+    def _upsert(cls, subscription, item, values, on_conflict):
+        """
+        Вставить запись прогресса одним запросом INSERT ... ON CONFLICT ... RETURNING.
+
+        values - значения полей новой записи, остальные поля заполняются значениями по умолчанию
+        on_conflict - SQL после ON CONFLICT (subscription_id, <item>_id), в нем доступны
+        {table} - имя таблицы и {column[<имя поля>]} - имя колонки поля.
+        Возвращает id вставленной или обновленной записи либо None, если запись не изменилась.
+        """
+        now = timezone.now()
+        values = {"subscription": subscription.id, cls.item_field: item.id, **values}
+        fields = [field for field in cls._meta.concrete_fields if not field.primary_key]
+        params = []
+        for field in fields:
+            if field.name in values:
+                value = values[field.name]
+            elif getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False):
+                value = now
+            else:
+                value = field.get_default()
+            params.append(field.get_db_prep_save(value, connection))
+        quote = connection.ops.quote_name
+        table = quote(cls._meta.db_table)
+        columns = {field.name: quote(field.column) for field in cls._meta.concrete_fields}
+        sql = (
+            f"INSERT INTO {table} ({', '.join(columns[field.name] for field in fields)}) "
+            f"VALUES ({', '.join(['%s'] * len(fields))}) "
+            f"ON CONFLICT ({columns['subscription']}, {columns[cls.item_field]}) "
+            f"{on_conflict.format(table=table, column=columns)} "
+            f"RETURNING {quote(cls._meta.pk.column)}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    @classmethod
+    def set_progress(cls, subscription, item, progress):
+        """
+        Установить статус прохождения одним upsert-запросом.
+
+        Существующая запись обновляется, только если статус отличается.
+        Возвращает True, если запись создана или статус изменился.
+        """
+        return bool(
+            cls._upsert(
+                subscription,
+                item,
+                {"progress": progress},
+                "DO UPDATE SET {column[progress]} = excluded.{column[progress]}, "
+                "{column[updated_at]} = excluded.{column[updated_at]}, {column[deleted_at]} = NULL "
+                "WHERE {table}.{column[progress]} <> excluded.{column[progress]} "
+                "OR {table}.{column[deleted_at]} IS NOT NULL",
+            )
+        )
+
+    @classmethod
+    def increment_counter(cls, subscription, item, counter):
+        """Атомарно увеличить счетчик counter, при отсутствии записи создать ее со статусом ACTIVE."""
+        cls._upsert(
+            subscription,
+            item,
+            {"progress": cls.ProgressStatus.ACTIVE, counter: 1},
+            "DO UPDATE SET {column[%s]} = {table}.{column[%s]} + 1, "
+            "{column[updated_at]} = excluded.{column[updated_at]}" % (counter, counter),
+        )
+
+    @classmethod
+    def ensure_progress(cls, subscription, item):
+        """Создать запись прогресса со статусом ACTIVE, если ее еще нет."""
+        cls._upsert(subscription, item, {"progress": cls.ProgressStatus.ACTIVE}, "DO NOTHING")
+
 
 class FAQ(TimeStampedModel):
     """
@@ -87,6 +165,7 @@ class Knowledge(TimeStampedModel):
 
 
 class Course(
+    DenormalizedFieldsMixin,
     TimeStampedModel,
     status_update_mixin(),
 ):
@@ -124,6 +203,19 @@ class Course(
     division = models.ForeignKey(
         "courses.Division", on_delete=models.PROTECT, verbose_name="Направление курса", null=True, blank=True
     )
+    lessons_count = models.PositiveIntegerField(
+        verbose_name="Количество опубликованных уроков", default=0, editable=False
+    )
+    course_duration = models.PositiveIntegerField(
+        verbose_name="Продолжительность опубликованных уроков", default=0, editable=False
+    )
+    chapters_count = models.PositiveIntegerField(
+        verbose_name="Количество глав с опубликованными уроками", default=0, editable=False
+    )
+
+    denormalized_fields = ("lessons_count", "course_duration", "chapters_count")
+    progress_counter_field = "finished_chapters"
+    progress_total_field = "chapters_count"
 
     class Meta:
         verbose_name = "Курс"
@@ -132,19 +224,52 @@ class Course(
     def __str__(self):
         return f"Course {self.title}"
 
+    @classmethod
+    def update_statistics(cls, queryset=None):
+        """
+        Пересчитать количество опубликованных уроков, глав с ними и продолжительность курсов.
+
+        Пересчет выполняется одним UPDATE для всех курсов из queryset, по умолчанию - для всех курсов,
+        предварительно пересчитывается количество опубликованных уроков в главах этих курсов.
+        Удаленные уроки и уроки удаленных глав не учитываются.
+        Возвращает количество обновленных курсов.
+        """
+        if queryset is None:
+            queryset = cls.all_objects.all()
+        Chapter.update_statistics(Chapter.all_objects.filter(course__in=queryset.values("id")))
+        chapters = (
+            Chapter.objects.filter(course=OuterRef("pk"), lessons_count__gt=0)
+            .order_by()
+            .values("course")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        lessons = (
+            Lesson.objects.filter(
+                chapter__course=OuterRef("pk"),
+                chapter__deleted_at__isnull=True,
+                status=Lesson.LessonStatus.PUBLISHED,
+            )
+            .order_by()
+            .values("chapter__course")
+        )
+        return queryset.update(
+            lessons_count=Coalesce(Subquery(lessons.annotate(total=Count("id")).values("total")), Value(0)),
+            course_duration=Coalesce(Subquery(lessons.annotate(total=Sum("duration")).values("total")), Value(0)),
+            chapters_count=Coalesce(Subquery(chapters), Value(0)),
+        )
+
     def current_lesson(self, user):
         """Return queryset of the current lesson."""
         finished_lessons = LessonProgressStatus.objects.filter(
             subscription__user=user, progress=LessonProgressStatus.ProgressStatus.FINISHED
         ).values_list("lesson_id", flat=True)
 
-        lesson_queryset = Lesson.objects.filter(chapter__course=self, status=Lesson.LessonStatus.PUBLISHED).annotate(
-            ordering=F("chapter__order_number") + F("order_number")
-        )
-        current_lesson_queryset = lesson_queryset.exclude(id__in=finished_lessons).order_by("ordering")[:1]
+        lesson_queryset = Lesson.objects.filter(course=self, status=Lesson.LessonStatus.PUBLISHED)
+        current_lesson_queryset = lesson_queryset.exclude(id__in=finished_lessons).order_by("position")[:1]
 
         if not current_lesson_queryset.exists():
-            return lesson_queryset.order_by("-ordering")[:1]
+            return lesson_queryset.order_by("-position")[:1]
 
         return current_lesson_queryset
 
@@ -156,33 +281,17 @@ class Course(
         return subscription
 
     def finish(self, subscription):
-        """Завершить данный курс."""
-        uncompleted_lessons = (
-            Lesson.objects.filter(
-                chapter__course=self,
-                status=Lesson.LessonStatus.PUBLISHED,
-            )
-            .exclude(
-                id__in=LessonProgressStatus.objects.filter(
-                    subscription=subscription, progress=LessonProgressStatus.ProgressStatus.FINISHED
-                ).values_list("lesson_id", flat=True)
-            )
-            .exists()
-        )
-        if uncompleted_lessons:
+        """Завершить данный курс, если пройдены все главы с опубликованными уроками."""
+        if not self._finished_all_children(subscription):
             raise ProgressNotFinishedException()
         super().finish(subscription)
         subscription.finish()
 
     def activate(self, subscription):
+        """Начать прохождение курса: активировать прогресс и перевести подписку в статус IN_PROGRESS."""
         super().activate(subscription)
-        user = subscription.user
-        progress_status, created = Subscription.objects.get_or_create(
-            user=user, course=self, defaults={"status": Subscription.Status.IN_PROGRESS}
-        )
-        if not created:
-            progress_status.status = Subscription.Status.IN_PROGRESS
-            progress_status.save()
+        subscription.status = Subscription.Status.IN_PROGRESS
+        subscription.save()
 
     def get_achievements(self, course, user):
         """
@@ -193,7 +302,12 @@ class Course(
         course_finished.send(sender=self.__class__, course=course, user=user)
 
 
-class Chapter(TimeStampedModel, order_number_mixin(CHAPTER_STEP, "course"), status_update_mixin(parent="course")):
+class Chapter(
+    DenormalizedFieldsMixin,
+    TimeStampedModel,
+    order_number_mixin(CHAPTER_STEP, "course"),
+    status_update_mixin(parent="course"),
+):
     """
     Модель главы.
 
@@ -205,7 +319,11 @@ class Chapter(TimeStampedModel, order_number_mixin(CHAPTER_STEP, "course"), stat
     created_at* - дата создания записи о главе, автоматическое проставление
     текущего времени
     updated_at* - дата обновления записи о главе, автоматическое проставление
-    текущего времени.
+    текущего времени
+    lessons_count - количество опубликованных уроков главы, пересчитывается в Chapter.update_statistics.
+
+    Менеджеры главы, в том числе базовый, используемый course.chapters.add(), пересчитывают данные курсов
+    после массового изменения глав через update().
     """
 
     title = models.CharField(max_length=120, null=True, blank=True, verbose_name="название главы")
@@ -222,8 +340,19 @@ class Chapter(TimeStampedModel, order_number_mixin(CHAPTER_STEP, "course"), stat
         on_delete=models.PROTECT,
         verbose_name="пользователь, внёсший изменения в главу",
     )
+    lessons_count = models.PositiveIntegerField(
+        verbose_name="Количество опубликованных уроков", default=0, editable=False
+    )
+
+    objects = CourseContentManager()
+    all_objects = CourseContentQuerySet.as_manager()
+
+    denormalized_fields = ("lessons_count",)
+    progress_counter_field = "finished_lessons"
+    progress_total_field = "lessons_count"
 
     class Meta:
+        base_manager_name = "all_objects"
         ordering = ("order_number",)
         verbose_name = "глава"
         verbose_name_plural = "глава"
@@ -231,6 +360,29 @@ class Chapter(TimeStampedModel, order_number_mixin(CHAPTER_STEP, "course"), stat
     def __str__(self):
         return f"Курс {self.course.title}: Глава {self.title}"
 
+    @classmethod
+    def update_statistics(cls, queryset=None):
+        """
+        Пересчитать количество опубликованных уроков глав одним UPDATE.
+
+        queryset - главы для пересчета, по умолчанию все главы. Удаленные уроки не учитываются.
+        Возвращает количество обновленных глав.
+        """
+        if queryset is None:
+            queryset = cls.all_objects.all()
+        lessons = (
+            Lesson.objects.filter(chapter=OuterRef("pk"), status=Lesson.LessonStatus.PUBLISHED)
+            .order_by()
+            .values("chapter")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        return queryset.update(lessons_count=Coalesce(Subquery(lessons), Value(0)))
+
+    def update_course_positions(self):
+        """Пересчитать позиции уроков курса после изменения очередности или курса главы."""
+        Lesson.update_positions(Lesson.all_objects.filter(chapter__course_id=self.course_id))
+
 
 class Lesson(
     TimeStampedModel,
@@ -250,6 +402,10 @@ class Lesson(
     lesson_status* - статус готовности урока (draft, ready, published)
     additional* - дополнительный урок - да/нет
     diploma* - дипломный урок - да/нет
+    course - курс урока, денормализован из главы
+    position - сквозная позиция урока в курсе: порядковый номер главы + порядковый номер урока
+
+    Как и у главы, менеджеры урока пересчитывают данные курсов после массового изменения уроков через update().
     """
 
     class LessonType(models.TextChoices):
@@ -289,35 +445,87 @@ class Lesson(
     status = models.IntegerField(verbose_name="статус урока", choices=LessonStatus.choices, default=LessonStatus.DRAFT)
     additional = models.BooleanField(verbose_name="дополнительный урок", default=False)
     diploma = models.BooleanField(verbose_name="дипломный урок", default=False)
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.SET_NULL,
+        related_name="lessons",
+        verbose_name="курс",
+        null=True,
+        editable=False,
+    )
+    position = models.PositiveIntegerField(verbose_name="позиция урока в курсе", null=True, editable=False)
+    objects = CourseContentManager()
+    all_objects = CourseContentQuerySet.as_manager()
 
     class Meta:
+        base_manager_name = "all_objects"
         ordering = ("order_number",)
         verbose_name = "Урок"
         verbose_name_plural = "Уроки"
+        indexes = (
+            models.Index(
+                fields=("course", "position"),
+                name="lesson_course_position_idx",
+                condition=Q(deleted_at__isnull=True),
+            ),
+            models.Index(
+                fields=("chapter", "status", "order_number"),
+                name="lesson_chapter_status_idx",
+                condition=Q(deleted_at__isnull=True),
+            ),
+        )
 
     def __str__(self):
         return f"Урок {self.id}: {self.title} (Глава {self.chapter_id})"
 
+    @classmethod
+    def update_positions(cls, queryset=None):
+        """
+        Пересчитать курс и сквозную позицию уроков одним UPDATE-запросом.
+
+        queryset - уроки для пересчета, по умолчанию все уроки, включая удаленные.
+        Возвращает количество обновленных уроков.
+        """
+        if queryset is None:
+            queryset = cls.all_objects.all()
+        chapters = Chapter.all_objects.filter(id=OuterRef("chapter_id"))
+        return queryset.update(
+            course_id=Subquery(chapters.values("course_id")),
+            position=Subquery(chapters.values("order_number")) + F("order_number"),
+        )
+
+    def update_course_positions(self):
+        """Пересчитать позиции уроков курса после изменения очередности или главы урока."""
+        lessons = Lesson.all_objects.filter(id=self.id)
+        if self.chapter_id:
+            lessons = Lesson.all_objects.filter(
+                Q(id=self.id)
+                | Q(chapter__course_id=Subquery(Chapter.all_objects.filter(id=self.chapter_id).values("course_id")))
+            )
+        Lesson.update_positions(lessons)
+        self.refresh_from_db(fields=("course", "position"))
+
+    @cached_property
+    def outline(self):
+        """Закешированное оглавление курса урока."""
+        from lizaalert.courses.outline import CourseOutline
+
+        return CourseOutline.get(self.course_id)
+
     @property
     def ordered(self):
-        """Вернуть очередность всех уроков курса с полем ordering."""
-        return (
-            Lesson.objects.filter(chapter__course=self.chapter.course)
-            .annotate(ordering=F("chapter__order_number") + F("order_number"))
-            .order_by("ordering")
-        )
+        """Вернуть очередность всех уроков курса по сквозной позиции."""
+        return Lesson.objects.filter(course_id=self.course_id).order_by("position")
 
     @property
     def next_lesson(self):
         """Вернуть следующий по очереди урок."""
-        ordered_lessons = self.ordered
-        return ordered_lessons.filter(ordering__gt=self.ordering).order_by("ordering")[:1]
+        return self.ordered.filter(position__gt=self.position)[:1]
 
     @property
     def prev_lesson(self):
         """Вернуть предыдущий по очереди урок."""
-        ordered_lessons = self.ordered
-        return ordered_lessons.filter(ordering__lt=self.ordering).order_by("-ordering")[:1]
+        return self.ordered.filter(position__lt=self.position).order_by("-position")[:1]
 
     def finish(self, subscription):
         """Завершить данный урок."""
@@ -349,6 +557,8 @@ class LessonProgressStatus(TimeStampedModel, BaseProgress):
         related_name="lesson_progress",
     )
 
+    item_field = "lesson"
+
     def __str__(self):
         return f"Lesson {self.lesson_id}: {self.subscription_id} Progress: {self.get_progress_display()}"
 
@@ -356,9 +566,17 @@ class LessonProgressStatus(TimeStampedModel, BaseProgress):
         verbose_name = "Прогресс по уроку"
         verbose_name_plural = "Прогресс по урокам"
         ordering = ("subscription",)
+        constraints = (models.UniqueConstraint(fields=("subscription", "lesson"), name="unique_lesson_progress"),)
+        indexes = (
+            models.Index(
+                fields=("subscription", "progress"),
+                name="lesson_progress_status_idx",
+                condition=Q(deleted_at__isnull=True),
+            ),
+        )
 
 
-class ChapterProgressStatus(TimeStampedModel, BaseProgress):
+class ChapterProgressStatus(DenormalizedFieldsMixin, TimeStampedModel, BaseProgress):
     """
     Класс для хранения прогресса студента при прохождении главы. Наследуется от TimeStampedModel.
 
@@ -367,6 +585,7 @@ class ChapterProgressStatus(TimeStampedModel, BaseProgress):
     глава - тип ForeignKey к модели Chapter
     user - тип ForeignKey к модели User
     progress - статус прохождения главы
+    finished_lessons - количество пройденных опубликованных уроков главы
     """
 
     chapter = models.ForeignKey(Chapter, on_delete=models.PROTECT, related_name="chapter_progress")
@@ -376,17 +595,47 @@ class ChapterProgressStatus(TimeStampedModel, BaseProgress):
         verbose_name="Подписка",
         related_name="chapter_progress",
     )
+    finished_lessons = models.PositiveIntegerField(verbose_name="пройдено уроков", default=0)
+
+    denormalized_fields = ("finished_lessons",)
+
+    item_field = "chapter"
 
     def __str__(self):
         return f"Chapter {self.chapter.title}: {self.subscription_id}"
 
+    @classmethod
+    def update_counters(cls, queryset=None):
+        """
+        Пересчитать счетчики пройденных уроков одним UPDATE.
+
+        Учитываются неудаленные опубликованные уроки.
+        """
+        if queryset is None:
+            queryset = cls.all_objects.all()
+        finished = (
+            LessonProgressStatus.objects.filter(
+                subscription=OuterRef("subscription"),
+                lesson__chapter=OuterRef("chapter"),
+                lesson__deleted_at__isnull=True,
+                lesson__status=Lesson.LessonStatus.PUBLISHED,
+                progress=BaseProgress.ProgressStatus.FINISHED,
+            )
+            .order_by()
+            .values("subscription")
+            .annotate(total=Count("lesson", distinct=True))
+            .values("total")
+        )
+        return queryset.update(finished_lessons=Coalesce(Subquery(finished), Value(0)))
+
     class Meta:
         verbose_name = "Прогресс по главе"
         verbose_name_plural = "Прогресс по главам"
         ordering = ("subscription",)
+        constraints = (models.UniqueConstraint(fields=("subscription", "chapter"), name="unique_chapter_progress"),)
 
 
-class CourseProgressStatus(TimeStampedModel, BaseProgress):
+class CourseProgressStatus(DenormalizedFieldsMixin, TimeStampedModel, BaseProgress):
     """
     Класс для хранения прогресса студента при прохождении курса. Наследуется от TimeStampedModel.
 
@@ -395,6 +644,7 @@ class CourseProgressStatus(TimeStampedModel, BaseProgress):
     курс - тип ForeignKey к модели Course
     user - тип ForeignKey к модели User
     progress - статус прохождения курса
+    finished_chapters - количество пройденных глав курса с опубликованными уроками
     """
 
     course = models.ForeignKey(Course, on_delete=models.PROTECT, related_name="course_progress")
@@ -404,14 +654,44 @@ class CourseProgressStatus(TimeStampedModel, BaseProgress):
         verbose_name="Подписка",
         related_name="course_progress",
     )
+    finished_chapters = models.PositiveIntegerField(verbose_name="пройдено глав", default=0)
+
+    denormalized_fields = ("finished_chapters",)
+
+    item_field = "course"
 
     def __str__(self):
         return f"Course {self.course.title}: {self.subscription_id}"
 
+    @classmethod
+    def update_counters(cls, queryset=None):
+        """
+        Пересчитать счетчики пройденных глав одним UPDATE.
+
+        Учитываются неудаленные главы, в которых есть опубликованные уроки.
+        """
+        if queryset is None:
+            queryset = cls.all_objects.all()
+        finished = (
+            ChapterProgressStatus.objects.filter(
+                subscription=OuterRef("subscription"),
+                chapter__course=OuterRef("course"),
+                chapter__deleted_at__isnull=True,
+                chapter__lessons_count__gt=0,
+                progress=BaseProgress.ProgressStatus.FINISHED,
+            )
+            .order_by()
+            .values("subscription")
+            .annotate(total=Count("chapter", distinct=True))
+            .values("total")
+        )
+        return queryset.update(finished_chapters=Coalesce(Subquery(finished), Value(0)))
+
     class Meta:
         verbose_name = "Прогресс по курсу"
         verbose_name_plural = "Прогресс по курсам"
         ordering = ("subscription",)
+        constraints = (models.UniqueConstraint(fields=("subscription", "course"), name="unique_course_progress"),)
 
 
 class CourseFaq(models.Model):
@@ -475,6 +755,9 @@ class Cohort(TimeStampedModel):
         help_text="Не заполняйте это поле, если хотите, чтобы группа была доступна всегда.",
     )
 
+    # Наибольшее количество попыток занять места в одной когорте при параллельной записи
+    max_claim_attempts = 5
+
     class Meta:
 
         constraints = [
@@ -483,6 +766,13 @@ class Cohort(TimeStampedModel):
                 name="unique_course_cohort_number",
             )
         ]
+        indexes = (
+            models.Index(
+                fields=("course", "start_date"),
+                name="cohort_course_start_idx",
+                condition=Q(deleted_at__isnull=True),
+            ),
+        )
         verbose_name = "Когорта"
         verbose_name_plural = "Когорты"
         ordering = ("start_date",)
@@ -500,6 +790,79 @@ class Cohort(TimeStampedModel):
     def __str__(self):
         return f"Курс {self.course_id} - Когорта {self.cohort_number}"
 
+    @classmethod
+    def open_for_enrollment(cls, course):
+        """
+        Когорты курса, открытые для записи, начиная с ближайшей.
+
+        Подходят когорты, которые еще не начались и в которых есть места, и всегда открытые когорты
+        без даты начала и без ограничения количества студентов (они идут последними).
+        """
+        # Дата в далеком будущем для корректной сортировки ближайших когорт
+        far_future_date = datetime(9999, 1, 1).date()
+        return (
+            cls.objects.annotate(
+                sorted_start_date=Coalesce("start_date", Value(far_future_date, output_field=DateField()))
+            )
+            .filter(
+                Q(start_date__gte=timezone.now().date(), students_count__lt=F("max_students"))
+                | Q(start_date=None, max_students=None),
+                course=course,
+            )
+            .order_by("sorted_start_date", "id")
+        )
+
+    @classmethod
+    def claim_seats(cls, course, count):
+        """
+        Занять count мест в открытых когортах курса без блокировки строк когорт.
+
+        Места занимаются условными UPDATE, начиная с ближайшей когорты: счетчик студентов увеличивается,
+        только если в когорте хватает свободных мест. Если места успела занять параллельная запись,
+        UPDATE не изменяет ни одной строки, счетчик перечитывается и занимается оставшееся количество мест,
+        а при их отсутствии проверяется следующая когорта. Когорта, удаленная параллельно, и когорта,
+        в которой места не удалось занять за max_claim_attempts попыток, пропускаются.
+        Возвращает список пар (когорта, количество занятых мест); мест может быть занято меньше, чем запрошено.
+        """
+        allocations = []
+        for cohort in cls.open_for_enrollment(course):
+            for _ in range(cls.max_claim_attempts):
+                if cohort.max_students is None:
+                    seats, has_seats = count, Q(max_students=None)
+                else:
+                    seats = min(count, cohort.max_students - (cohort.students_count or 0))
+                    if seats <= 0:
+                        break
+                    has_seats = Q(students_count__lte=F("max_students") - seats)
+                if cls.objects.filter(has_seats, pk=cohort.pk).update(students_count=F("students_count") + seats):
+                    allocations.append((cohort, seats))
+                    count -= seats
+                    break
+                counters = cls.objects.filter(pk=cohort.pk).values("students_count", "max_students").first()
+                if counters is None:
+                    break
+                cohort.students_count, cohort.max_students = counters["students_count"], counters["max_students"]
+            if not count:
+                break
+        return allocations
+
+    @classmethod
+    def claim_seat(cls, course):
+        """Занять одно место в ближайшей открытой когорте курса, вернуть когорту или None, если мест нет."""
+        allocations = cls.claim_seats(course, 1)
+        return allocations[0][0] if allocations else None
+
+    @classmethod
+    def reclaim_seat(cls, cohort_id):
+        """Снова занять место в когорте, если в ней есть свободные места, вернуть True при успехе."""
+        has_seats = Q(max_students=None) | Q(students_count__lt=F("max_students"))
+        return bool(cls.objects.filter(has_seats, pk=cohort_id).update(students_count=F("students_count") + 1))
+
+    @classmethod
+    def release_seat(cls, cohort_id):
+        """Освободить место в когорте."""
+        return cls.objects.filter(pk=cohort_id, students_count__gt=0).update(students_count=F("students_count") - 1)
+
     @property
     def is_available(self):
         """
@@ -507,8 +870,13 @@ class Cohort(TimeStampedModel):
 
         Если дата начала курса не указана, то курс доступен всегда.
         """
-        if self.start_date:
-            return timezone.now().date() >= self.start_date
+        return self.is_started(self.start_date)
+
+    @staticmethod
+    def is_started(start_date):
+        """Проверить, что когорта с датой начала start_date уже началась (или дата не указана)."""
+        if start_date:
+            return timezone.now().date() >= start_date
         return True
 
 
@@ -529,7 +897,7 @@ class Subscription(TimeStampedModel):
         COMPLETED = "completed", "Курс пройден"
 
     user = models.ForeignKey(User, on_delete=models.PROTECT, related_name="subscriptions")
-    course = models.ForeignKey(Course, on_delete=models.PROTECT, related_name="+")
+    course = models.ForeignKey(Course, on_delete=models.PROTECT, related_name="subscriptions")
     status = models.CharField(
         max_length=20, choices=Status.choices, verbose_name="статус записи на курс", default=Status.ENROLLED
     )
@@ -555,39 +923,46 @@ class Subscription(TimeStampedModel):
 
     def save(self, *args, **kwargs):
         """
-        Найти подходящую когорту для записи на курс.
+        Записать пользователя на курс, заняв место в когорте.
 
-        Ищем когорту с датой начала, которая меньше или равна текущей дате и в которой есть места.
-        Если не найдена, ищем универсальную когорту без даты начала и без максимального количества студентов.
-        Увеличиваем количество студентов в когорте на 1.
-        В случае отсутствия подходящей когорты, вызываем исключение NoSuitableCohort.
-        Во время исполнения функции поддерживается атомарность транзакции и блокируется найденная когорта.
+        Место занимается в ближайшей открытой когорте без блокировок (Cohort.claim_seat): подходят когорты,
+        которые еще не начались и в которых есть места, а после них - универсальные когорты без даты начала
+        и без ограничения количества студентов.
+        В случае отсутствия подходящей когорты вызывается исключение NoSuitableCohort.
+        Место и подписка сохраняются в одной транзакции: если подписку сохранить не удалось, место освобождается.
         """
-        if not self.pk:
-            with transaction.atomic():
-                current_date = timezone.now().date()
-                # Создается дата в далеком будущем для корректной сортировки ближайших когорт
-                far_future_date = datetime(9999, 1, 1).date()
-                cohort = (
-                    Cohort.objects.select_for_update()
-                    .annotate(
-                        sorted_start_date=Coalesce("start_date", Value(far_future_date, output_field=DateField()))
-                    )
-                    .filter(
-                        Q(start_date__gte=current_date, students_count__lt=F("max_students"))
-                        | Q(start_date=None, max_students=None),
-                        course=self.course,
-                    )
-                    .order_by("sorted_start_date")
-                    .first()
-                )
-
-                if cohort:
-                    Cohort.objects.filter(pk=cohort.pk).update(students_count=F("students_count") + 1)
-                    self.cohort = cohort
-                else:
+        if self.pk:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            cohort = Cohort.claim_seat(self.course)
+            if cohort is None:
+                raise NoSuitableCohort()
+            self.cohort = cohort
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        """Отписать пользователя от курса: мягкое удаление подписки освобождает место в когорте."""
+        with transaction.atomic():
+            if self.deleted_at is None and self.cohort_id:
+                Cohort.release_seat(self.cohort_id)
+            super().delete(*args, **kwargs)
+
+    def restore(self):
+        """
+        Восстановить отписку пользователя от курса, снова заняв место в когорте.
+
+        Место занимается в прежней когорте подписки, а если свободных мест в ней не осталось -
+        в ближайшей открытой когорте курса. В случае отсутствия подходящей когорты вызывается исключение
+        NoSuitableCohort.
+        """
+        with transaction.atomic():
+            if self.deleted_at is not None and not (self.cohort_id and Cohort.reclaim_seat(self.cohort_id)):
+                cohort = Cohort.claim_seat(self.course)
+                if cohort is None:
                     raise NoSuitableCohort()
-        super().save(*args, **kwargs)
+                self.cohort = cohort
+            self._seat_reclaimed = True
+            super().restore()
 
     def finish(self):
         """Завершить подписку на курс."""
@@ -0,0 +1,103 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from lizaalert.courses.models import Chapter, Course, Lesson
+
+
+class CourseOutline:
+    """
+    Оглавление курса: упорядоченный по сквозной позиции список уроков.
+
+    Строится одним запросом и хранится в кеше Django, поэтому навигация по урокам,
+    хлебные крошки и текущий урок вычисляются без дополнительных SQL-запросов.
+    Кеш сбрасывается сигналами при сохранении и удалении курса, глав и уроков.
+
+    lessons - кортеж (lesson_id, chapter_id, status) в порядке прохождения курса
+    chapters - словарь {chapter_id: title}.
+    """
+
+    cache_key_template = "courses:outline:{course_id}"
+
+    def __init__(self, course_id, course_title, chapters, lessons):
+        self.course_id = course_id
+        self.course_title = course_title
+        self.chapters = chapters
+        self.lessons = lessons
+        self._indexes = {lesson_id: index for index, (lesson_id, _, _) in enumerate(lessons)}
+
+    @classmethod
+    def cache_key(cls, course_id):
+        return cls.cache_key_template.format(course_id=course_id)
+
+    @classmethod
+    def build(cls, course_id):
+        """Собрать оглавление курса из базы данных."""
+        course_title = Course.all_objects.filter(id=course_id).values_list("title", flat=True).first()
+        chapters = dict(Chapter.all_objects.filter(course_id=course_id).values_list("id", "title"))
+        lessons = tuple(
+            Lesson.objects.filter(course_id=course_id).order_by("position").values_list("id", "chapter_id", "status")
+        )
+        return cls(course_id, course_title, chapters, lessons)
+
+    @classmethod
+    def get(cls, course_id):
+        """Вернуть оглавление курса из кеша, при отсутствии построить и закешировать."""
+        data = cache.get(cls.cache_key(course_id))
+        if data is None:
+            return cls.rebuild(course_id)
+        return cls(course_id, *data)
+
+    @classmethod
+    def rebuild(cls, course_id):
+        """Собрать оглавление курса из базы данных и заменить им закешированное."""
+        outline = cls.build(course_id)
+        cache.set(
+            cls.cache_key(course_id),
+            (outline.course_title, outline.chapters, outline.lessons),
+            settings.COURSE_OUTLINE_CACHE_TIMEOUT,
+        )
+        return outline
+
+    @classmethod
+    def invalidate(cls, *course_ids):
+        """Сбросить закешированные оглавления курсов."""
+        cache.delete_many([cls.cache_key(course_id) for course_id in course_ids if course_id])
+
+    def index(self, lesson_id):
+        """Вернуть порядковый индекс урока в курсе или None, если урока нет в оглавлении."""
+        return self._indexes.get(lesson_id)
+
+    def _neighbour(self, lesson_id, shift):
+        index = self.index(lesson_id)
+        if index is None or not 0 <= index + shift < len(self.lessons):
+            return None
+        lesson_id, chapter_id, _ = self.lessons[index + shift]
+        return {"chapter_id": chapter_id, "lesson_id": lesson_id}
+
+    def next_lesson(self, lesson_id):
+        """Следующий урок в формате BreadcrumbLessonSerializer или None."""
+        return self._neighbour(lesson_id, 1)
+
+    def prev_lesson(self, lesson_id):
+        """Предыдущий урок в формате BreadcrumbLessonSerializer или None."""
+        return self._neighbour(lesson_id, -1)
+
+    def breadcrumbs(self, chapter_id):
+        """Хлебные крошки урока в формате BreadcrumbSchema."""
+        return {
+            "course": {"id": self.course_id, "title": self.course_title},
+            "chapter": {"id": chapter_id, "title": self.chapters.get(chapter_id)},
+        }
+
+    def current_lesson(self, finished_lesson_ids):
+        """
+        Текущий урок: первый непройденный опубликованный урок.
+
+        Если все опубликованные уроки пройдены, возвращается последний из них.
+        Возвращает id урока или None, если в курсе нет опубликованных уроков.
+        """
+        published = [lesson_id for lesson_id, _, status in self.lessons if status == Lesson.LessonStatus.PUBLISHED]
+        for lesson_id in published:
+            if lesson_id not in finished_lesson_ids:
+                return lesson_id
+        return published[-1] if published else None
@@ -1,7 +1,54 @@
-from rest_framework.pagination import PageNumberPagination
+import json
 
+from django.db import connections
+from rest_framework.pagination import CursorPagination
 
-class CourseSetPagination(PageNumberPagination):
+
+class CourseSetPagination(CursorPagination):
+    """
+    Курсорная пагинация каталога курсов.
+
+    Страница выбирается условием по id (WHERE id > курсор) вместо OFFSET, COUNT(*) по запросу
+    каталога не выполняется. Общее количество курсов возвращается в поле count только по запросу
+    (with_count=true): для PostgreSQL это оценка планировщика, для остальных СУБД - точное значение.
+    """
+
+    ordering = "id"
     page_size = 10
     page_size_query_param = "page_size"
-    max_page_size = 10000
+    max_page_size = 100
+    count_query_param = "with_count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param, "").lower() in ("1", "true"):
+            self.count = self.approximate_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    @staticmethod
+    def approximate_count(queryset):
+        """Количество строк queryset: оценка из EXPLAIN для PostgreSQL, COUNT(*) для остальных СУБД."""
+        if connections[queryset.db].vendor != "postgresql":
+            return queryset.count()
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data["count"] = self.count
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"]["count"] = {
+            "type": "integer",
+            "example": 123,
+            "description": f"Приблизительное количество курсов, только при {self.count_query_param}=true",
+        }
+        return response_schema
@@ -1,6 +1,8 @@
 from rest_framework import permissions
 
-from lizaalert.courses.models import Subscription
+from lizaalert.courses.models import LessonProgressStatus
+from lizaalert.courses.outline import CourseOutline
+from lizaalert.users.models import UserRole
 
 
 class IsUserOrReadOnly(permissions.BasePermission):
@@ -13,17 +15,29 @@ class IsUserOrReadOnly(permissions.BasePermission):
 
 
 class CurrentLessonOrProhibited(permissions.BasePermission):
-    """Разрешение на просмотр только текущего/пройденных уроков."""
+    """
+    Разрешение на просмотр только текущего/пройденных уроков.
+
+    Если урока нет в закешированном оглавлении (оглавление собрано до изменения урока),
+    оглавление один раз пересобирается, а урок, которого нет и в нем, недоступен.
+    """
 
     def has_object_permission(self, request, view, obj):
         user = request.user
-        if user.is_authenticated:
-            course = obj.chapter.course
-            current_lesson = course.current_lesson(user).first()
-            obj = obj.ordered.get(id=obj.id)
-            if current_lesson and (current_lesson.ordering >= obj.ordering):
-                return True
-        return False
+        if not user.is_authenticated:
+            return False
+        outline = obj.outline
+        if outline.index(obj.id) is None:
+            outline = obj.outline = CourseOutline.rebuild(obj.course_id)
+            if outline.index(obj.id) is None:
+                return False
+        finished_lessons = LessonProgressStatus.objects.filter(
+            subscription__user=user,
+            lesson__course_id=obj.course_id,
+            progress=LessonProgressStatus.ProgressStatus.FINISHED,
+        ).values_list("lesson_id", flat=True)
+        current_lesson = outline.current_lesson(set(finished_lessons))
+        return bool(current_lesson) and outline.index(current_lesson) >= outline.index(obj.id)
 
 
 class EnrolledAndCourseHasStarted(permissions.BasePermission):
@@ -33,12 +47,20 @@ class EnrolledAndCourseHasStarted(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         user = request.user
-        course = obj.chapter.course
         if user.is_authenticated:
-            try:
-                subscription = Subscription.objects.get(user=user, course=course)
-                if subscription.cohort.is_available:
-                    return True
-            except Exception:
-                return False
+            subscription = request.subscriptions.for_course(obj.course_id)
+            if subscription and subscription.cohort and subscription.cohort.is_available:
+                return True
         return False
+
+
+class IsAdminOrTeacher(permissions.BasePermission):
+    """Доступ только для персонала, администраторов и преподавателей."""
+
+    roles = (UserRole.Role.MAIN_ADMIN, UserRole.Role.ADMIN, UserRole.Role.TEACHER)
+
+    def has_permission(self, request, view):
+        user = request.user
+        if not user.is_authenticated:
+            return False
+        return user.is_staff or UserRole.objects.filter(user=user, role__in=self.roles).exists()
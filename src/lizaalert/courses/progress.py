@@ -0,0 +1,60 @@
+from lizaalert.courses.models import BaseProgress, ChapterProgressStatus, CourseProgressStatus, LessonProgressStatus
+
+
+class ProgressSnapshot:
+    """
+    Снимок прогресса пользователя по курсу.
+
+    Прогресс по урокам, главам и курсу загружается тремя запросами (по одному на модель прогресса)
+    вместо коррелированного подзапроса на каждую главу и каждый урок курса.
+
+    lessons - словарь {lesson_id: progress}
+    chapters - словарь {chapter_id: progress}
+    course - прогресс по курсу.
+    """
+
+    def __init__(self, course_id, lessons=None, chapters=None, course=BaseProgress.ProgressStatus.NOT_STARTED):
+        self.course_id = course_id
+        self.lessons = lessons or {}
+        self.chapters = chapters or {}
+        self.course = course
+
+    @staticmethod
+    def _load(model, field, user, course_id):
+        return dict(
+            model.objects.filter(
+                subscription__user=user, subscription__course_id=course_id, subscription__deleted_at__isnull=True
+            )
+            .order_by()
+            .values_list(field, "progress")
+        )
+
+    @classmethod
+    def load(cls, user, course_id):
+        """Загрузить прогресс пользователя по курсу, для анонимного пользователя вернуть пустой снимок."""
+        if not user.is_authenticated:
+            return cls(course_id)
+        course = cls._load(CourseProgressStatus, "course_id", user, course_id)
+        return cls(
+            course_id,
+            lessons=cls._load(LessonProgressStatus, "lesson_id", user, course_id),
+            chapters=cls._load(ChapterProgressStatus, "chapter_id", user, course_id),
+            course=course.get(course_id, BaseProgress.ProgressStatus.NOT_STARTED),
+        )
+
+    def lesson(self, lesson_id):
+        """Прогресс по уроку."""
+        return self.lessons.get(lesson_id, BaseProgress.ProgressStatus.NOT_STARTED)
+
+    def chapter(self, chapter_id):
+        """Прогресс по главе."""
+        return self.chapters.get(chapter_id, BaseProgress.ProgressStatus.NOT_STARTED)
+
+    def as_dict(self):
+        """Данные для CourseProgressSerializer."""
+        return {
+            "course_id": self.course_id,
+            "user_course_progress": self.course,
+            "chapters": [{"id": chapter_id, "progress": progress} for chapter_id, progress in self.chapters.items()],
+            "lessons": [{"id": lesson_id, "progress": progress} for lesson_id, progress in self.lessons.items()],
+        }
@@ -1,8 +1,20 @@
 from drf_yasg.utils import swagger_serializer_method
 from rest_framework import serializers
 
-from lizaalert.courses.models import FAQ, Chapter, Course, CourseProgressStatus, Knowledge, Lesson, Subscription
+from lizaalert.courses.catalog import CourseCatalogQuery
+from lizaalert.courses.enrollment import BulkEnrollment
+from lizaalert.courses.models import (
+    FAQ,
+    BaseProgress,
+    Chapter,
+    Course,
+    CourseProgressStatus,
+    Knowledge,
+    Lesson,
+    Subscription,
+)
 from lizaalert.courses.utils import BreadcrumbLessonSerializer, BreadcrumbSchema
+from lizaalert.settings.constants import BULK_ENROLLMENT_MAX_USERS
 
 
 class FaqInlineSerializer(serializers.ModelSerializer):
@@ -50,13 +62,7 @@ class CourseCommonFieldsMixin(serializers.ModelSerializer):
 
     @swagger_serializer_method(serializer_or_field=serializers.ChoiceField(choices=Subscription.Status.choices))
     def get_user_status(self, obj):
-        user = self.context.get("request").user
-        if user.is_authenticated:
-            subscription = Subscription.objects.filter(user=user, course=obj).first()
-            if obj.user_status == Subscription.Status.ENROLLED and subscription.cohort.is_available:
-                return Subscription.Status.AVAILABLE
-            return obj.user_status
-        return Subscription.Status.NOT_ENROLLED
+        return CourseCatalogQuery.user_status(obj, self.context.get("request").user)
 
 
 class CourseSerializer(CourseCommonFieldsMixin):
@@ -88,7 +94,7 @@ class LessonInlineSerializer(serializers.ModelSerializer):
     lesson_type = serializers.ReadOnlyField()
     duration = serializers.ReadOnlyField()
     title = serializers.ReadOnlyField()
-    user_lesson_progress = serializers.IntegerField(default=0)
+    user_lesson_progress = serializers.SerializerMethodField()
 
     class Meta:
         model = Lesson
@@ -101,12 +107,17 @@ class LessonInlineSerializer(serializers.ModelSerializer):
             "user_lesson_progress",
         )
 
+    @swagger_serializer_method(serializer_or_field=serializers.IntegerField())
+    def get_user_lesson_progress(self, obj):
+        progress = self.context.get("progress")
+        return progress.lesson(obj.id) if progress else BaseProgress.ProgressStatus.NOT_STARTED
+
 
 class ChapterInlineSerializer(serializers.ModelSerializer):
     """Сериалайзер класс для вложенного списка частей курса."""
 
     lessons = LessonInlineSerializer(many=True)
-    user_chapter_progress = serializers.IntegerField(default=0)
+    user_chapter_progress = serializers.SerializerMethodField()
 
     class Meta:
         model = Chapter
@@ -118,6 +129,11 @@ class ChapterInlineSerializer(serializers.ModelSerializer):
             "lessons",
         )
 
+    @swagger_serializer_method(serializer_or_field=serializers.IntegerField())
+    def get_user_chapter_progress(self, obj):
+        progress = self.context.get("progress")
+        return progress.chapter(obj.id) if progress else BaseProgress.ProgressStatus.NOT_STARTED
+
 
 class CourseDetailSerializer(CourseCommonFieldsMixin):
     chapters = ChapterInlineSerializer(many=True)
@@ -182,22 +198,18 @@ class LessonSerializer(serializers.ModelSerializer):
 
     @swagger_serializer_method(serializer_or_field=BreadcrumbSchema)
     def get_breadcrumbs(self, obj):
-        breadcrumb_serializer = BreadcrumbSchema({"course": obj.chapter.course, "chapter": obj.chapter})
+        breadcrumb_serializer = BreadcrumbSchema(obj.outline.breadcrumbs(obj.chapter_id))
         return breadcrumb_serializer.data
 
     @swagger_serializer_method(serializer_or_field=BreadcrumbLessonSerializer)
     def get_next_lesson(self, obj):
-        current_lesson = BreadcrumbLessonSerializer(
-            {"chapter_id": obj.next_chapter_id, "lesson_id": obj.next_lesson_id}
-        )
-        return current_lesson.data
+        next_lesson = obj.outline.next_lesson(obj.id) or {"chapter_id": None, "lesson_id": None}
+        return BreadcrumbLessonSerializer(next_lesson).data
 
     @swagger_serializer_method(serializer_or_field=BreadcrumbLessonSerializer)
     def get_prev_lesson(self, obj):
-        current_lesson = BreadcrumbLessonSerializer(
-            {"chapter_id": obj.prev_chapter_id, "lesson_id": obj.prev_lesson_id}
-        )
-        return current_lesson.data
+        prev_lesson = obj.outline.prev_lesson(obj.id) or {"chapter_id": None, "lesson_id": None}
+        return BreadcrumbLessonSerializer(prev_lesson).data
 
 
 class OptionSerializer(serializers.Serializer):
@@ -276,3 +288,55 @@ class MessageResponseSerializer(serializers.Serializer):
 
     class Meta:
         fields = ("message",)
+
+
+class ProgressItemSerializer(serializers.Serializer):
+    """Сериалайзер прогресса по главе или уроку."""
+
+    id = serializers.IntegerField()
+    progress = serializers.ChoiceField(choices=BaseProgress.ProgressStatus.choices)
+
+
+class CourseProgressSerializer(serializers.Serializer):
+    """
+    Сериалайзер снимка прогресса пользователя по курсу.
+
+    Главы и уроки, которых нет в списках, пользователь еще не начинал.
+    """
+
+    course_id = serializers.IntegerField()
+    user_course_progress = serializers.ChoiceField(choices=BaseProgress.ProgressStatus.choices)
+    chapters = ProgressItemSerializer(many=True)
+    lessons = ProgressItemSerializer(many=True)
+
+
+class CatalogCacheStatsSerializer(serializers.Serializer):
+    """Сериалайзер счетчиков кеша каталога курсов."""
+
+    hits = serializers.IntegerField()
+    misses = serializers.IntegerField()
+
+
+class BulkEnrollmentSerializer(serializers.Serializer):
+    """Сериалайзер списка пользователей для массовой записи на курс."""
+
+    user_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list)
+    emails = serializers.ListField(child=serializers.EmailField(), required=False, default=list)
+
+    def validate(self, attrs):
+        if not attrs["user_ids"] and not attrs["emails"]:
+            raise serializers.ValidationError("Передайте список user_ids или emails.")
+        if len(attrs["user_ids"]) + len(attrs["emails"]) > BULK_ENROLLMENT_MAX_USERS:
+            raise serializers.ValidationError(
+                f"За один запрос можно записать не более {BULK_ENROLLMENT_MAX_USERS} пользователей."
+            )
+        return attrs
+
+
+class BulkEnrollmentResultSerializer(serializers.Serializer):
+    """Сериалайзер результата массовой записи на курс для одного пользователя."""
+
+    user = serializers.CharField(help_text="id или email пользователя из запроса")
+    user_id = serializers.IntegerField(allow_null=True)
+    status = serializers.ChoiceField(choices=BulkEnrollment.Status.choices)
+    cohort_id = serializers.IntegerField(allow_null=True)
@@ -1,4 +1,7 @@
+from django.apps import apps
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import Signal, receiver
 
 from lizaalert.users.utils import (
@@ -30,3 +33,192 @@ def handle_course_finished(sender, **kwargs):
     increment_completed_courses_count(user)
     assign_achievements_for_course(user, course_id)
     assign_achievements_for_completion(user, course_id)
+
+
+# Поля урока и главы, которые запоминаются до сохранения: {ключ: поле или lookup в запросе}
+PREVIOUS_STATE_FIELDS = {
+    "lesson": {
+        "course_id": "chapter__course_id",
+        "chapter_id": "chapter_id",
+        "status": "status",
+        "deleted_at": "deleted_at",
+    },
+    "chapter": {"course_id": "course_id", "deleted_at": "deleted_at"},
+}
+# Поля, изменение которых меняет состав опубликованных дочерних объектов главы и курса
+PROGRESS_FIELDS = {"lesson": ("chapter_id", "status", "deleted_at"), "chapter": ("course_id", "deleted_at")}
+
+
+@receiver(pre_save, sender="courses.Lesson")
+@receiver(pre_save, sender="courses.Chapter")
+def remember_previous_state(sender, instance, **kwargs):
+    """
+    Запомнить курс, главу урока, статус и дату удаления урока или главы до сохранения.
+
+    После переноса урока или главы статистика и счетчики прогресса пересчитываются и для прежних курса и главы,
+    а счетчики прогресса - только если изменился состав опубликованных уроков и глав.
+    """
+    fields = PREVIOUS_STATE_FIELDS[sender._meta.model_name]
+    row = sender.all_objects.filter(id=instance.id).values_list(*fields.values()).first() if instance.id else None
+    instance._previous_state = dict(zip(fields, row)) if row else None
+    previous = instance._previous_state or {}
+    instance._previous_course_id = previous.get("course_id")
+    instance._previous_chapter_id = previous.get("chapter_id")
+
+
+def progress_children_changed(instance, deleted=False):
+    """Изменил ли сохраненный или удаленный урок или глава состав опубликованных дочерних объектов родителя."""
+    previous = getattr(instance, "_previous_state", None)
+    if deleted or previous is None:
+        return True
+    return any(previous[field] != getattr(instance, field) for field in PROGRESS_FIELDS[instance._meta.model_name])
+
+
+def recount_progress_counters(chapter_ids=(), course_ids=()):
+    """
+    Пересчитать счетчики пройденных уроков и глав в прогрессе всех подписчиков глав и курсов.
+
+    Счетчики при прохождении только увеличиваются, поэтому после публикации, снятия с публикации, удаления
+    или переноса урока или главы они пересчитываются с нуля, и завершение главы или курса сравнивает
+    их с актуальным количеством опубликованных дочерних объектов. Пересчет затрагивает прогресс всех
+    подписчиков, поэтому выполняется после фиксации транзакции, не удерживая блокировки сохранения.
+    """
+    chapter_progress_model = apps.get_model("courses", "ChapterProgressStatus")
+    course_progress_model = apps.get_model("courses", "CourseProgressStatus")
+    chapter_ids = [chapter_id for chapter_id in chapter_ids if chapter_id]
+    course_ids = [course_id for course_id in course_ids if course_id]
+
+    def recount():
+        chapter_progress_model.update_counters(chapter_progress_model.all_objects.filter(chapter_id__in=chapter_ids))
+        course_progress_model.update_counters(course_progress_model.all_objects.filter(course_id__in=course_ids))
+
+    transaction.on_commit(recount)
+
+
+@receiver((post_save, post_delete), sender="courses.Lesson")
+def update_course_statistics_on_lesson_change(sender, instance, signal, **kwargs):
+    """
+    Пересчитать статистику прежнего и нового курса урока при его изменении.
+
+    Счетчики прогресса прежних и новых главы и курса пересчитываются, если урок опубликован, снят с публикации,
+    удален или перенесен. Срабатывает и при мягком удалении, так как TimeStampedModel.delete сохраняет запись.
+    """
+    course_model = apps.get_model("courses", "Course")
+    chapter_model = apps.get_model("courses", "Chapter")
+    new_course_id = chapter_model.all_objects.filter(id=instance.chapter_id).values_list("course_id", flat=True).first()
+    course_ids = (new_course_id, getattr(instance, "_previous_course_id", None))
+    course_model.update_statistics(course_model.all_objects.filter(id__in=course_ids))
+    if progress_children_changed(instance, deleted=signal is post_delete):
+        recount_progress_counters((instance.chapter_id, getattr(instance, "_previous_chapter_id", None)), course_ids)
+
+
+@receiver((post_save, post_delete), sender="courses.Chapter")
+def update_course_statistics_on_chapter_change(sender, instance, signal, **kwargs):
+    """
+    Пересчитать статистику прежнего и нового курса главы при ее изменении или удалении.
+
+    Счетчики прогресса курсов пересчитываются, если глава удалена, восстановлена или перенесена.
+    """
+    course_model = apps.get_model("courses", "Course")
+    course_ids = (instance.course_id, getattr(instance, "_previous_course_id", None))
+    course_model.update_statistics(course_model.all_objects.filter(id__in=course_ids))
+    if progress_children_changed(instance, deleted=signal is post_delete):
+        recount_progress_counters(course_ids=course_ids)
+
+
+def invalidate_course_outline_on_commit(*course_ids):
+    """Сбросить закешированные оглавления и снимки курсов после фиксации текущей транзакции."""
+    from lizaalert.courses.outline import CourseOutline
+    from lizaalert.courses.snapshot import CourseSnapshot
+
+    def invalidate():
+        CourseOutline.invalidate(*course_ids)
+        CourseSnapshot.invalidate(*course_ids)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver((post_save, post_delete), sender="courses.Course")
+def invalidate_course_outline_on_course_change(sender, instance, **kwargs):
+    """Сбросить закешированные оглавление и снимок курса при изменении курса."""
+    from lizaalert.courses.outline import CourseOutline
+    from lizaalert.courses.snapshot import CourseSnapshot
+
+    CourseOutline.invalidate(instance.id)
+    CourseSnapshot.invalidate(instance.id)
+
+
+@receiver((post_save, post_delete), sender="courses.Chapter")
+def invalidate_course_outline_on_chapter_change(sender, instance, **kwargs):
+    """
+    Сбросить закешированные оглавление и снимок курса при изменении главы.
+
+    Уроки главы еще хранят прежний курс, поэтому при переносе главы сбрасываются и данные старого курса.
+    Кеш сбрасывается после фиксации транзакции, в которой пересчитаны позиции уроков: иначе параллельный
+    запрос успел бы закешировать оглавление со старыми позициями.
+    """
+    lesson_model = apps.get_model("courses", "Lesson")
+    old_course_ids = lesson_model.all_objects.filter(chapter_id=instance.id).values_list("course_id", flat=True)
+    invalidate_course_outline_on_commit(instance.course_id, *set(old_course_ids))
+
+
+@receiver((post_save, post_delete), sender="courses.Lesson")
+def invalidate_course_outline_on_lesson_change(sender, instance, **kwargs):
+    """
+    Сбросить закешированные оглавление и снимок прежнего и нового курса урока при его изменении.
+
+    Как и для главы, кеш сбрасывается после фиксации транзакции с пересчитанными позициями уроков.
+    """
+    chapter_model = apps.get_model("courses", "Chapter")
+    new_course_id = chapter_model.all_objects.filter(id=instance.chapter_id).values_list("course_id", flat=True).first()
+    invalidate_course_outline_on_commit(getattr(instance, "_previous_course_id", instance.course_id), new_course_id)
+
+
+@receiver((post_save, post_delete), sender="courses.FAQ")
+@receiver((post_save, post_delete), sender="courses.Knowledge")
+def invalidate_course_snapshots_on_faq_or_knowledge_change(sender, instance, **kwargs):
+    """Сбросить снимки всех курсов, в которые входит измененный вопрос FAQ или умение."""
+    from lizaalert.courses.snapshot import CourseSnapshot
+
+    link_model, field = (
+        (apps.get_model("courses", "CourseFaq"), "faq")
+        if sender._meta.model_name == "faq"
+        else (apps.get_model("courses", "CourseKnowledge"), "knowledge")
+    )
+    CourseSnapshot.invalidate(*link_model.objects.filter(**{field: instance.id}).values_list("course_id", flat=True))
+
+
+@receiver((post_save, post_delete), sender="courses.CourseFaq")
+@receiver((post_save, post_delete), sender="courses.CourseKnowledge")
+def invalidate_course_snapshot_on_link_change(sender, instance, **kwargs):
+    """Сбросить снимок курса при добавлении или удалении вопроса FAQ или умения курса."""
+    from lizaalert.courses.snapshot import CourseSnapshot
+
+    CourseSnapshot.invalidate(instance.course_id)
+
+
+@receiver((post_save, post_delete), sender="courses.Course")
+@receiver((post_save, post_delete), sender="courses.Chapter")
+@receiver((post_save, post_delete), sender="courses.Lesson")
+@receiver((post_save, post_delete), sender="courses.Cohort")
+@receiver((post_save, post_delete), sender="courses.FAQ")
+@receiver((post_save, post_delete), sender="courses.Knowledge")
+@receiver((post_save, post_delete), sender="courses.CourseFaq")
+@receiver((post_save, post_delete), sender="courses.CourseKnowledge")
+def invalidate_catalog_cache(sender, **kwargs):
+    """Сбросить кеш каталога курсов для неаутентифицированных пользователей при изменении его данных."""
+    from lizaalert.courses.catalog_cache import CatalogResponseCache
+
+    CatalogResponseCache.invalidate()
+
+
+@receiver(post_save, sender="courses.Subscription")
+def invalidate_catalog_cache_on_enrollment(sender, instance, created, **kwargs):
+    """
+    Сбросить кеш каталога при записи на курс и отписке от него.
+
+    Subscription.save, Subscription.delete и Subscription.restore меняют students_count когорты через update()
+    без сигналов, а заполненная когорта может скрыть курс из каталога, освобожденное место - снова показать его.
+    """
+    if created or instance.deleted_at is not None or getattr(instance, "_seat_reclaimed", False):
+        invalidate_catalog_cache(sender)
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from lizaalert.courses.catalog import CourseCatalogQuery
+from lizaalert.courses.fast_serializers import FastCourseDetailSerializer
+from lizaalert.courses.models import Course
+
+
+class CourseSnapshot:
+    """
+    Снимок содержимого курса для детального просмотра.
+
+    Часть ответа, не зависящая от пользователя (описание, FAQ, умения, главы и уроки), собирается
+    один раз и хранится в кеше Django. При запросе на снимок накладываются только поля пользователя
+    (FastCourseDetailSerializer). Снимок сбрасывается сигналами при изменении курса, глав, уроков,
+    FAQ и умений и пересобирается при следующем запросе.
+
+    version входит в ключ кеша: при изменении формата снимка версия увеличивается,
+    и снимки, собранные прежним кодом, перестают читаться.
+    """
+
+    version = 1
+    cache_key_template = "courses:snapshot:v{version}:{course_id}"
+
+    @classmethod
+    def cache_key(cls, course_id):
+        return cls.cache_key_template.format(version=cls.version, course_id=course_id)
+
+    @classmethod
+    def build(cls, course_id):
+        """Собрать снимок курса из базы данных, для отсутствующего курса вернуть None."""
+        course = (
+            Course.objects.select_related("level")
+            .prefetch_related("faq", "knowledge", *CourseCatalogQuery.chapters_prefetch())
+            .filter(id=course_id)
+            .first()
+        )
+        return FastCourseDetailSerializer.content(course) if course else None
+
+    @classmethod
+    def get(cls, course_id):
+        """Вернуть снимок курса из кеша, при отсутствии собрать и закешировать."""
+        key = cls.cache_key(course_id)
+        snapshot = cache.get(key)
+        if snapshot is None:
+            snapshot = cls.build(course_id)
+            if snapshot is not None:
+                cache.set(key, snapshot, settings.COURSE_OUTLINE_CACHE_TIMEOUT)
+        return snapshot
+
+    @classmethod
+    def invalidate(cls, *course_ids):
+        """Сбросить закешированные снимки курсов."""
+        cache.delete_many([cls.cache_key(course_id) for course_id in course_ids if course_id])
@@ -0,0 +1,44 @@
+from django.utils.deprecation import MiddlewareMixin
+
+from lizaalert.courses.models import Subscription
+
+
+class SubscriptionResolver:
+    """
+    Подписки текущего пользователя в рамках одного запроса.
+
+    При первом обращении одним запросом загружаются все действующие подписки пользователя вместе
+    с когортами (select_related), после чего разрешения, представления и сериализаторы берут
+    подписку из памяти. Пользователь определяется в момент первого обращения, поэтому учитывается
+    аутентификация DRF, выполняемая уже после middleware.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self._subscriptions = None
+
+    def _load(self):
+        user = getattr(self.request, "user", None)
+        if user is None or not user.is_authenticated:
+            return {}
+        subscriptions = Subscription.objects.filter(user=user).select_related("cohort").order_by()
+        return {subscription.course_id: subscription for subscription in subscriptions}
+
+    def for_course(self, course_id):
+        """Вернуть подписку пользователя на курс или None."""
+        if self._subscriptions is None:
+            self._subscriptions = self._load()
+        return self._subscriptions.get(course_id)
+
+
+class SubscriptionResolverMiddleware(MiddlewareMixin):
+    """
+    Middleware, добавляющее в запрос request.subscriptions (SubscriptionResolver).
+
+    Работает и в синхронной, и в асинхронной (ASGI) цепочке middleware: MiddlewareMixin вызывает
+    следующий обработчик в его режиме, а подписки загружаются лениво, уже в синхронном коде.
+    """
+
+    def __call__(self, request):
+        request.subscriptions = SubscriptionResolver(request)
+        return super().__call__(request)
@@ -1,30 +1,52 @@
 from django.db import transaction
-from django.db.models import Count, F, IntegerField, OuterRef, Prefetch, Q, Subquery, Sum, Value
-from django.db.models.functions import Cast, Coalesce
+from django.db.models import OuterRef
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 
+from lizaalert.courses.catalog import CourseCatalogQuery
+from lizaalert.courses.catalog_cache import CatalogResponseCache
+from lizaalert.courses.conditional import ConditionalGetMixin, load_tree_state
+from lizaalert.courses.enrollment import BulkEnrollment
 from lizaalert.courses.exceptions import SubscriptionDoesNotExist
+from lizaalert.courses.fast_serializers import (
+    FastCourseDetailSerializer,
+    FastCourseSerializer,
+    FastLessonSerializer,
+    FastSerializerMixin,
+)
 from lizaalert.courses.filters import CourseFilter
 from lizaalert.courses.models import (
+    FAQ,
     Chapter,
     ChapterProgressStatus,
+    Cohort,
     Course,
     CourseProgressStatus,
+    Knowledge,
     Lesson,
     LessonProgressStatus,
     Subscription,
 )
 from lizaalert.courses.pagination import CourseSetPagination
-from lizaalert.courses.permissions import CurrentLessonOrProhibited, EnrolledAndCourseHasStarted, IsUserOrReadOnly
+from lizaalert.courses.permissions import (
+    CurrentLessonOrProhibited,
+    EnrolledAndCourseHasStarted,
+    IsAdminOrTeacher,
+    IsUserOrReadOnly,
+)
+from lizaalert.courses.progress import ProgressSnapshot
 from lizaalert.courses.serializers import (
+    BulkEnrollmentResultSerializer,
+    BulkEnrollmentSerializer,
+    CatalogCacheStatsSerializer,
     CourseDetailSerializer,
+    CourseProgressSerializer,
     CourseSerializer,
     CurrentLessonSerializer,
     FilterSerializer,
@@ -32,11 +54,12 @@ from lizaalert.courses.serializers import (
     MessageResponseSerializer,
     UserStatusEnrollmentSerializer,
 )
+from lizaalert.courses.snapshot import CourseSnapshot
 from lizaalert.courses.utils import get_object
 from lizaalert.users.models import Level
 
 
-class CourseViewSet(viewsets.ReadOnlyModelViewSet):
+class CourseViewSet(ConditionalGetMixin, FastSerializerMixin, viewsets.ReadOnlyModelViewSet):
     """
     Endpoint для работы с курсами.
 
@@ -53,6 +76,7 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = CourseFilter
     filterset_fields = ("level", "course_format")
     pagination_class = CourseSetPagination
+    fast_serializer_classes = {"list": FastCourseSerializer, "retrieve": FastCourseDetailSerializer}
 
     @swagger_auto_schema(
         operation_description="""
@@ -66,132 +90,35 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
         Возвращает:
             QuerySet: QuerySet для курсов.
 
-        base_annotations содержит аннотации для запроса, которые не зависят от пользователя:
+        Запрос собирается в CourseCatalogQuery, каждый курс встречается в выдаче один раз.
+
+        Поля, которые не зависят от пользователя, заранее посчитаны в модели курса:
 
         - course_duration - суммарная продолжительность всех уроков в курсе;
         - lessons_count - количество уроков в курсе.
 
-        user_annotations содержит аннотации для запроса, которые зависят от пользователя:
+        Аннотации, которые зависят от пользователя:
 
         - user_status - статус пользователя по отношению к курсу (записался на курс, проходит курс и т.д.);
         - user_course_progress - прогресс пользователя в курсе;
-        - current_lesson - текущий урок пользователя;
-        - current_chapter - текущая глава пользователя.
+        - start_date - дата начала когорты пользователя;
+        - current_lesson - текущий урок пользователя (только для детального просмотра);
+        - current_chapter - текущая глава пользователя (только для детального просмотра).
         """
     )
     def get_queryset(self):
-        user = self.request.user
-        course_id = self.kwargs.get("pk")
-        course = None
-        if course_id:
-            course = get_object(Course, id=course_id)
-        lesson_status = Lesson.LessonStatus.PUBLISHED
-        base_annotations = {
-            "course_duration": Sum(
-                "chapters__lessons__duration",
-                filter=Q(chapters__lessons__status=lesson_status),
-            ),
-            "lessons_count": Count(
-                "chapters__lessons",
-                filter=Q(chapters__lessons__status=lesson_status),
-            ),
-        }
-        qo_courses_with_always_available_cohort = Q(
-            status=Course.CourseStatus.PUBLISHED, cohorts__start_date=None, cohorts__max_students=None
-        )
-        qo_courses_with_available_cohort = Q(
-            status=Course.CourseStatus.PUBLISHED,
-            cohorts__start_date__gte=timezone.now().date(),
-            cohorts__students_count__lt=F("cohorts__max_students"),
-        )
-
-        if user.is_authenticated:
-            if course:
-                current_lesson = course.current_lesson(user)
-
-            else:
-                current_lesson = (
-                    Lesson.objects.filter(chapter__course=course, status=Lesson.LessonStatus.PUBLISHED)
-                    .annotate(ordering=F("chapter__order_number") + F("order_number"))
-                    .order_by("ordering")
-                )
-            # Аннотируем прогресс пользователя по главе
-            chapters_with_progress = Chapter.objects.annotate(
-                user_chapter_progress=Coalesce(
-                    Cast(
-                        Subquery(
-                            ChapterProgressStatus.objects.filter(chapter=OuterRef("id"), subscription__user=user)
-                            .order_by("-updated_at")
-                            .values("progress")[:1]
-                        ),
-                        IntegerField(),
-                    ),
-                    Value(0),
-                )
-            )
-            # Аннотируем прогресс пользователя по уроку
-            lessons_with_progress = Lesson.objects.annotate(
-                user_lesson_progress=Coalesce(
-                    Cast(
-                        Subquery(
-                            LessonProgressStatus.objects.filter(lesson=OuterRef("id"), subscription__user=user)
-                            .order_by("-updated_at")
-                            .values("progress")[:1]
-                        ),
-                        IntegerField(),
-                    ),
-                    Value(0),
-                )
-            )
-            subscription_info = Subscription.objects.filter(course_id=OuterRef("id"), user=user)
-
-            users_annotations = {
-                "user_status": Coalesce(
-                    Subquery(subscription_info.values("status")),
-                    Value("not_enrolled"),
-                ),
-                "user_course_progress": Coalesce(
-                    Cast(
-                        Subquery(
-                            CourseProgressStatus.objects.filter(course=OuterRef("id"), subscription__user=user)
-                            .order_by("-updated_at")
-                            .values("progress")[:1]
-                        ),
-                        IntegerField(),
-                    ),
-                    Value(0),
-                ),
-                "current_lesson": current_lesson.values("id")[:1],
-                "current_chapter": current_lesson.values("chapter_id")[:1],
-                "start_date": subscription_info.values("cohort__start_date")[:1],
-            }
-
-            return (
-                Course.objects.prefetch_related(
-                    "cohorts",
-                    Prefetch("chapters", queryset=chapters_with_progress),
-                    Prefetch("chapters__lessons", queryset=lessons_with_progress),
-                )
-                .filter(
-                    qo_courses_with_always_available_cohort
-                    | qo_courses_with_available_cohort
-                    | Q(
-                        status__in=(Course.CourseStatus.PUBLISHED, Course.CourseStatus.HIDDEN),
-                        id__in=Subquery(
-                            Subscription.objects.filter(user=user, course_id=OuterRef("id")).values("course")
-                        ),
-                    )
-                )
-                .annotate(**base_annotations, **users_annotations)
-                .order_by("id")
-            )
-
-        return (
-            Course.objects.prefetch_related("cohorts")
-            .filter(qo_courses_with_always_available_cohort | qo_courses_with_available_cohort)
-            .annotate(**base_annotations)
-            .order_by("id")
-        )
+        # Детальный просмотр строит queryset дважды (состояние для ETag и ответ), а сборка запроса
+        # сама обращается к БД (курс, текущий урок), поэтому собранный queryset сохраняется на время запроса
+        if getattr(self, "_catalog_queryset", None) is None:
+            course_id = self.kwargs.get("pk")
+            course = None
+            if course_id:
+                course = get_object(Course, id=course_id)
+            # Содержимое курса для детального просмотра берется из снимка курса (CourseSnapshot)
+            self._catalog_queryset = CourseCatalogQuery(
+                self.request.user, course=course, with_content=self.action != "retrieve"
+            ).build()
+        return self._catalog_queryset.all()
 
     def get_serializer_class(self):
         if self.action in (
@@ -202,8 +129,79 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
             return None
         if self.action == "retrieve":
             return CourseDetailSerializer
+        if self.action == "progress":
+            return CourseProgressSerializer
+        if self.action == "catalog_cache":
+            return CatalogCacheStatsSerializer
+        if self.action == "bulk_enroll":
+            return BulkEnrollmentSerializer
         return CourseSerializer
 
+    def get_serializer_context(self):
+        """
+        Добавить в контекст данные для детального просмотра курса.
+
+        progress - снимок прогресса пользователя по главам и урокам, snapshot - закешированное содержимое курса.
+        """
+        context = super().get_serializer_context()
+        if self.action == "retrieve":
+            context["progress"] = ProgressSnapshot.load(self.request.user, self.kwargs.get("pk"))
+            context["snapshot"] = CourseSnapshot.get(self.kwargs.get("pk"))
+        return context
+
+    def _cached_response(self, handler, request, *args, **kwargs):
+        """Отдать ответ каталога анонимному пользователю из кеша, при промахе закешировать успешный ответ."""
+        if not CatalogResponseCache.is_cacheable(request):
+            return handler(request, *args, **kwargs)
+        response_cache = CatalogResponseCache(request, self.action, kwargs.get("pk"))
+        data = response_cache.get()
+        if data is not None:
+            return Response(data)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response_cache.set(response.data)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        retrieve = super().retrieve
+        return self.conditional_response(
+            kwargs.get("pk"), lambda: self._cached_response(retrieve, request, *args, **kwargs)
+        )
+
+    def get_conditional_state(self, pk):
+        """
+        Состояние курса для ETag: курс, главы, уроки, когорты, FAQ и умения, подписка и прогресс пользователя.
+
+        Запрос строится от queryset каталога, поэтому курс, не видимый пользователю, условного ответа не получает.
+        В состояние входит текущая дата, так как от нее зависит доступность когорт.
+        Анонимному пользователю курс отдается из кеша каталога без запросов к БД, для него условный ответ не строится.
+        """
+        user = self.request.user
+        if not user.is_authenticated:
+            return None
+        related = {
+            "course": Course.all_objects.filter(pk=OuterRef("pk")),
+            "chapters": Chapter.all_objects.filter(course=OuterRef("pk")),
+            "lessons": Lesson.all_objects.filter(course=OuterRef("pk")),
+            "cohorts": Cohort.all_objects.filter(course=OuterRef("pk")),
+            "faq": FAQ.all_objects.filter(coursefaq__course=OuterRef("pk")),
+            "knowledge": Knowledge.all_objects.filter(courseknowledge__course=OuterRef("pk")),
+            "subscription": Subscription.all_objects.filter(user=user, course=OuterRef("pk")),
+        }
+        for name, model in (
+            ("course_progress", CourseProgressStatus),
+            ("chapter_progress", ChapterProgressStatus),
+            ("lesson_progress", LessonProgressStatus),
+        ):
+            related[name] = model.all_objects.filter(subscription__user=user, subscription__course=OuterRef("pk"))
+        state = load_tree_state(self.get_queryset().filter(pk=pk), **related)
+        if state is None:
+            return None
+        return (timezone.now().date(), *state.values())
+
     def _get_current_lesson(self, **kwargs):
         """Вспомогательный метод для получения текущего урока и главы пользователя для курса."""
         user = self.request.user
@@ -241,6 +239,34 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = UserStatusEnrollmentSerializer(current_lesson, context={"subscription": subscription})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @swagger_auto_schema(
+        request_body=BulkEnrollmentSerializer,
+        responses={
+            status.HTTP_200_OK: BulkEnrollmentResultSerializer(many=True),
+        },
+    )
+    @action(
+        detail=True,
+        methods=["post"],
+        url_path="bulk-enroll",
+        permission_classes=(IsAuthenticated, IsAdminOrTeacher),
+    )
+    def bulk_enroll(self, request, **kwargs):
+        """
+        Записать группу пользователей на курс.
+
+        Принимает списки user_ids и emails, места в когортах занимаются в одной транзакции.
+        Возвращает результат для каждого пользователя: enrolled, already_enrolled, not_found или no_seats.
+
+        Примечание:
+            Это действие доступно администраторам и преподавателям.
+        """
+        course = get_object(Course, **kwargs)
+        serializer = BulkEnrollmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = BulkEnrollment(course, **serializer.validated_data).run()
+        return Response(BulkEnrollmentResultSerializer(results, many=True).data, status=status.HTTP_200_OK)
+
     @swagger_auto_schema(
         responses={
             status.HTTP_204_NO_CONTENT: "Пользователь успешно отписан от курса.",
@@ -287,6 +313,45 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = CurrentLessonSerializer(current_lesson)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @swagger_auto_schema(
+        responses={
+            status.HTTP_200_OK: CatalogCacheStatsSerializer,
+        }
+    )
+    @action(detail=False, methods=["get"], permission_classes=(IsAdminUser,))
+    def catalog_cache(self, request, **kwargs):
+        """
+        Получить счетчики попаданий и промахов кеша каталога для неаутентифицированных пользователей.
+
+        Примечание:
+            Это действие доступно только администраторам.
+        """
+        serializer = CatalogCacheStatsSerializer(CatalogResponseCache.stats())
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        responses={
+            status.HTTP_200_OK: CourseProgressSerializer,
+        }
+    )
+    @action(detail=True, methods=["get"], permission_classes=(IsAuthenticated,))
+    def progress(self, request, **kwargs):
+        """
+        Получить прогресс пользователя по курсу, его главам и урокам.
+
+        Позволяет обновить прогресс без повторной загрузки всего курса.
+        Главы и уроки, которых нет в ответе, пользователь еще не начинал.
+
+        Возвращает:
+                    200: Ответ с сериализованными данными прогресса пользователя.
+                    404: Курс не найден или пользователь не подписан на курс.
+        """
+        course = get_object(Course, **kwargs)
+        get_object(Subscription, course=course, user=request.user)
+        snapshot = ProgressSnapshot.load(request.user, course.id)
+        serializer = CourseProgressSerializer(snapshot.as_dict())
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
     @swagger_auto_schema(
         responses={
             status.HTTP_200_OK: "Курс успешно завершен.",
@@ -309,7 +374,7 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.initial_data, status=status.HTTP_200_OK)
 
 
-class LessonViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+class LessonViewSet(ConditionalGetMixin, FastSerializerMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
     """
     Класс представления для работы с уроками.
 
@@ -341,48 +406,29 @@ class LessonViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
         CurrentLessonOrProhibited,
         EnrolledAndCourseHasStarted,
     ]
+    fast_serializer_classes = {"retrieve": FastLessonSerializer}
 
     def get_queryset(self):
         """
         Create custom queryset for lessons.
 
-        user_lesson_progress - returns the progress (int: id) of current user with the current lesson
-        next_lesson_id - returns the int id of the next lesson in current course
-        prev_lesson_id - returns the int id of the previous lesson in current course.
+        Next/previous lessons and breadcrumbs are taken from the cached course outline (Lesson.outline),
+        user_lesson_progress is set in retrieve.
         """
-        user = self.request.user
-        lesson_id = self.kwargs.get("pk")
-        lesson = get_object(Lesson, id=lesson_id)
-        lesson_with_ordering = lesson.ordered.get(id=lesson_id)
-        if user.is_authenticated:
-            try:
-                subscription = Subscription.objects.get(course=lesson.chapter.course, user=user)
-            except Subscription.DoesNotExist:
-                raise SubscriptionDoesNotExist()
-        base_annotations = {
-            "next_lesson_id": lesson_with_ordering.next_lesson.values("id"),
-            "prev_lesson_id": lesson_with_ordering.prev_lesson.values("id"),
-            "next_chapter_id": lesson_with_ordering.next_lesson.values("chapter_id"),
-            "prev_chapter_id": lesson_with_ordering.prev_lesson.values("chapter_id"),
-        }
-        if user.is_authenticated:
-            user_annotations = {
-                "user_lesson_progress": Coalesce(
-                    Cast(
-                        Subquery(
-                            LessonProgressStatus.objects.filter(lesson=OuterRef("id"), subscription=subscription)
-                            .order_by("-updated_at")
-                            .values("progress")[:1]
-                        ),
-                        IntegerField(),
-                    ),
-                    Value(0),
-                )
-            }
-            return Lesson.objects.select_related("chapter", "chapter__course").annotate(
-                **base_annotations, **user_annotations
-            )
-        return Lesson.objects.select_related("chapter", "chapter__course").annotate(**base_annotations)
+        return Lesson.objects.select_related("chapter", "chapter__course")
+
+    def get_object(self):
+        """
+        Получить урок и проверить разрешения.
+
+        Для аутентифицированного пользователя без подписки на курс урока вызывается SubscriptionDoesNotExist.
+        Подписка берется из request.subscriptions и переиспользуется разрешениями и retrieve.
+        """
+        lesson = get_object(self.get_queryset(), id=self.kwargs.get("pk"))
+        if self.request.user.is_authenticated and not self.request.subscriptions.for_course(lesson.course_id):
+            raise SubscriptionDoesNotExist()
+        self.check_object_permissions(self.request, lesson)
+        return lesson
 
     def get_serializer_class(self):
         """Возвращает класс сериализатора в зависимости от текущего действия."""
@@ -401,18 +447,41 @@ class LessonViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
         """
         lesson = self.get_object()
         user = self.request.user
-        course = lesson.chapter.course
         if user.is_authenticated:
-            try:
-                subscription = Subscription.objects.get(course=course, user=user)
-            except Subscription.DoesNotExist:
-                raise SubscriptionDoesNotExist()
-            any_progress = LessonProgressStatus.objects.filter(subscription=subscription, lesson=lesson).exists()
-            if not any_progress:
+            subscription = request.subscriptions.for_course(lesson.course_id)
+            progress = (
+                LessonProgressStatus.objects.filter(subscription=subscription, lesson=lesson)
+                .order_by()
+                .values_list("progress", flat=True)
+                .first()
+            )
+            if progress is None:
                 lesson.activate(subscription)
-        if subscription and subscription.status == Subscription.Status.ENROLLED:
-            course.activate(subscription)  # Активируем начало прохождения курса, если были записаны на курс
-        return super().retrieve(request, *args, **kwargs)
+                progress = LessonProgressStatus.ProgressStatus.ACTIVE
+            lesson.user_lesson_progress = progress
+            if subscription.status == Subscription.Status.ENROLLED:
+                # Активируем начало прохождения курса, если были записаны на курс
+                lesson.chapter.course.activate(subscription)
+        return self.conditional_response(lesson, lambda: Response(self.get_serializer(lesson).data))
+
+    def get_conditional_state(self, lesson):
+        """
+        Состояние урока для ETag.
+
+        Навигация и хлебные крошки зависят от всех глав и уроков курса, поэтому в состояние входят
+        их наибольшие даты изменения и количество, а также курс и прогресс пользователя по уроку.
+        """
+        state = load_tree_state(
+            Lesson.all_objects.filter(pk=lesson.pk),
+            chapters=Chapter.all_objects.filter(course_id=lesson.course_id),
+            lessons=Lesson.all_objects.filter(course_id=lesson.course_id),
+        )
+        return (
+            lesson.updated_at,
+            lesson.chapter.course.updated_at,
+            getattr(lesson, "user_lesson_progress", None),
+            *state.values(),
+        )
 
     @transaction.atomic
     @action(
@@ -2,9 +2,11 @@ import json
 
 from django import forms
 from django.contrib import admin
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast, NullIf
 from pydantic import ValidationError as PydanticValidationError
 
-from lizaalert.quizzes.models import Question, Quiz, UserAnswer
+from lizaalert.quizzes.models import Question, QuestionStatistics, Quiz, QuizStatistics, UserAnswer
 from lizaalert.quizzes.validators import ValidateAnswersModel
 from lizaalert.settings.admin_setup import BaseAdmin
 
@@ -40,6 +42,62 @@ class QuestionAdmin(BaseAdmin):
 
 @admin.register(UserAnswer)
 class UserAnswerAdmin(BaseAdmin):
-    list_display = ("id", "user", "quiz")
-    readonly_fields = ("user", "quiz")
+    list_display = ("id", "user", "quiz", "status", "start_date", "expires_at")
+    list_filter = ("status",)
+    readonly_fields = ("user", "quiz", "status", "expires_at")
     search_fields = ("user__username", "quiz__title")
+
+
+class ReadOnlyStatisticsAdmin(admin.ModelAdmin):
+    """Статистика заполняется командой aggregate_quiz_statistics и в админке только просматривается."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(QuizStatistics)
+class QuizStatisticsAdmin(ReadOnlyStatisticsAdmin):
+    list_display = ("quiz", "attempts", "submitted", "passed", "get_pass_rate", "get_average_solve_time", "updated_at")
+    search_fields = ("quiz__title",)
+    list_select_related = ("quiz",)
+
+    @admin.display(description="Доля сданных попыток", ordering="passed")
+    def get_pass_rate(self, obj):
+        return f"{obj.pass_rate:.0%}" if obj.pass_rate is not None else "-"
+
+    @admin.display(description="Среднее время решения, мин")
+    def get_average_solve_time(self, obj):
+        return f"{obj.average_solve_seconds / 60:.1f}" if obj.average_solve_seconds is not None else "-"
+
+
+@admin.register(QuestionStatistics)
+class QuestionStatisticsAdmin(ReadOnlyStatisticsAdmin):
+    """Статистика вопросов, по умолчанию сначала вопросы с наименьшей долей правильных ответов."""
+
+    list_display = ("get_question", "get_quiz", "attempts", "correct", "get_correct_rate", "updated_at")
+    list_filter = ("question__quiz",)
+    search_fields = ("question__title", "question__quiz__title")
+    list_select_related = ("question__quiz",)
+
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(correct_ratio=Cast("correct", FloatField()) / NullIf("attempts", 0))
+            .order_by(F("correct_ratio").asc(nulls_last=True), "id")
+        )
+
+    @admin.display(description="Вопрос", ordering="question__title")
+    def get_question(self, obj):
+        return obj.question.title
+
+    @admin.display(description="Квиз", ordering="question__quiz")
+    def get_quiz(self, obj):
+        return obj.question.quiz
+
+    @admin.display(description="Доля правильных ответов", ordering="correct_ratio")
+    def get_correct_rate(self, obj):
+        return f"{obj.correct_rate:.0%}" if obj.correct_rate is not None else "-"
@@ -0,0 +1,116 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from lizaalert.quizzes.models import AggregationWatermark, Question, QuestionStatistics, QuizStatistics, UserAnswer
+
+
+class QuizStatisticsAggregator:
+    """
+    Инкрементальная агрегация статистики квизов и вопросов.
+
+    Закрытые попытки (отправленные и истекшие) читаются пачками в порядке (updated_at, id) начиная с позиции
+    AggregationWatermark и добавляются к счетчикам QuizStatistics и QuestionStatistics. Счетчики и позиция
+    обновляются в одной транзакции, поэтому каждая попытка учитывается ровно один раз. Закрытые попытки
+    больше не изменяются, а попытки, закрытые позже lag, откладываются до следующего запуска, чтобы
+    не пропустить попытки из транзакций, завершившихся после чтения пачки.
+    """
+
+    name = "quizzes.statistics"
+    closed_statuses = (UserAnswer.Status.SUBMITTED, UserAnswer.Status.EXPIRED)
+
+    def __init__(self, batch_size=1000, lag=timedelta(minutes=1)):
+        self.batch_size = batch_size
+        self.lag = lag
+
+    def pending(self, watermark, until):
+        """Закрытые попытки после позиции агрегации и до until в порядке (updated_at, id)."""
+        attempts = UserAnswer.objects.filter(status__in=self.closed_statuses, updated_at__lt=until)
+        if watermark.position is not None:
+            attempts = attempts.filter(
+                Q(updated_at__gt=watermark.position) | Q(updated_at=watermark.position, id__gt=watermark.last_id)
+            )
+        return attempts.order_by("updated_at", "id").values_list(
+            "id", "quiz_id", "status", "final_result", "start_date", "end_date", "result", "updated_at"
+        )
+
+    def run(self):
+        """Учесть все закрытые попытки, вернуть их количество."""
+        until = timezone.now() - self.lag
+        total = 0
+        while True:
+            folded = self.fold_batch(until)
+            total += folded
+            if folded < self.batch_size:
+                return total
+
+    def fold_batch(self, until):
+        with transaction.atomic():
+            watermark, _ = AggregationWatermark.objects.select_for_update().get_or_create(name=self.name)
+            attempts = list(self.pending(watermark, until)[: self.batch_size])
+            if not attempts:
+                return 0
+            quizzes, questions = defaultdict(Counter), defaultdict(Counter)
+            for _, quiz_id, status, final_result, start_date, end_date, result, _ in attempts:
+                counters = quizzes[quiz_id]
+                counters["attempts"] += 1
+                counters["passed"] += final_result == "True"
+                if status != UserAnswer.Status.SUBMITTED:
+                    continue
+                counters["submitted"] += 1
+                if start_date and end_date:
+                    counters["solve_seconds"] += max(int((end_date - start_date).total_seconds()), 0)
+                for item in result or ():
+                    questions[item["question_id"]]["attempts"] += 1
+                    questions[item["question_id"]]["correct"] += bool(item["is_correct"])
+            existing = set(Question.all_objects.filter(id__in=questions).values_list("id", flat=True))
+            self.add(QuizStatistics, "quiz_id", quizzes)
+            self.add(QuestionStatistics, "question_id", {key: questions[key] for key in existing})
+            *_, (last_id, *_, last_updated_at) = attempts
+            watermark.position, watermark.last_id = last_updated_at, last_id
+            watermark.save()
+        return len(attempts)
+
+    @staticmethod
+    def add(model, key_field, deltas):
+        """Прибавить значения счетчиков к записям статистики, создав недостающие записи."""
+        model.objects.bulk_create((model(**{key_field: key}) for key in deltas), ignore_conflicts=True)
+        now = timezone.now()
+        for key, counters in deltas.items():
+            model.objects.filter(**{key_field: key}).update(
+                updated_at=now, **{field: F(field) + value for field, value in counters.items()}
+            )
+
+    @staticmethod
+    def report(quiz):
+        """Статистика квиза и его вопросов в формате QuizStatisticsSerializer."""
+        statistics = getattr(quiz, "statistics", None) or QuizStatistics(quiz=quiz)
+        watermark = AggregationWatermark.objects.filter(name=QuizStatisticsAggregator.name).first()
+        questions = []
+        for question in Question.objects.filter(quiz=quiz).select_related("statistics"):
+            question_statistics = getattr(question, "statistics", None) or QuestionStatistics(question=question)
+            questions.append(
+                {
+                    "question_id": question.id,
+                    "title": question.title,
+                    "order_number": question.order_number,
+                    "attempts": question_statistics.attempts,
+                    "correct": question_statistics.correct,
+                    "correct_rate": question_statistics.correct_rate,
+                }
+            )
+        return {
+            "quiz_id": quiz.id,
+            "title": quiz.title,
+            "passing_score": quiz.passing_score,
+            "attempts": statistics.attempts,
+            "submitted": statistics.submitted,
+            "passed": statistics.passed,
+            "pass_rate": statistics.pass_rate,
+            "average_solve_seconds": statistics.average_solve_seconds,
+            "aggregated_until": watermark.position if watermark else None,
+            "questions": questions,
+        }
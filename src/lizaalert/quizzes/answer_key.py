@@ -0,0 +1,133 @@
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from lizaalert.quizzes.models import Question, Quiz
+
+
+def normalize_text(value):
+    """Текстовый ответ в каноническом виде: без учета регистра и лишних пробелов."""
+    return " ".join(str(value).split()).casefold()
+
+
+class CompiledQuestion(NamedTuple):
+    """
+    Скомпилированный ключ вопроса.
+
+    correct_ids - множество id правильных вариантов, accepted_texts - нормализованные тексты
+    правильных вариантов (для вопросов с текстовым ответом).
+    """
+
+    question_type: str
+    correct_ids: frozenset
+    accepted_texts: frozenset
+
+    @classmethod
+    def compile(cls, question_type, content):
+        correct = [answer for answer in content or () if answer.get("is_correct")]
+        return cls(
+            question_type,
+            frozenset(answer["id"] for answer in correct),
+            frozenset(normalize_text(answer["text"]) for answer in correct if question_type == "text_answer"),
+        )
+
+    @property
+    def correct_answer_id(self):
+        return sorted(self.correct_ids)
+
+    def check(self, answer_ids):
+        """
+        Проверить ответ пользователя.
+
+        checkbox, radio - множество выбранных вариантов совпадает с множеством правильных.
+        text_answer - передан ровно один ответ, и он совпадает с текстом одного из правильных вариантов
+        без учета регистра и лишних пробелов; вопрос без правильных вариантов не засчитывается.
+        """
+        if self.question_type == "text_answer":
+            return len(answer_ids) == 1 and normalize_text(answer_ids[0]) in self.accepted_texts
+        return frozenset(answer_ids) == self.correct_ids
+
+
+class AnswerKey:
+    """
+    Скомпилированный ключ ответов квиза.
+
+    Варианты ответов вопросов разбираются один раз, поэтому проверка ответов пользователя сводится
+    к сравнению множеств без запросов к вопросам. Ключ хранится в кеше Django и в памяти процесса.
+
+    Версия ключа - время изменения квиза (Quiz.updated_at), которое сигналы обновляют при изменении вопросов.
+    Квиз уже загружен запросом, проверяющим ответы, поэтому версия читается из базы данных без лишних запросов
+    и одинакова во всех воркерах: ключи прежней версии больше не читаются ни из кеша, ни из памяти процесса.
+    revision - время последнего изменения вопросов, из которых собран ключ.
+    """
+
+    format_version = 1
+    key_prefix = f"quizzes:answer_key:v{format_version}"
+    max_compiled = 1024
+    _compiled = {}
+
+    def __init__(self, quiz_id, version, revision, questions):
+        self.quiz_id = quiz_id
+        self.version = version
+        self.revision = revision
+        self.questions = questions
+
+    @classmethod
+    def cache_key(cls, quiz_id, version):
+        return f"{cls.key_prefix}:{quiz_id}:{version}"
+
+    @staticmethod
+    def current_version(quiz):
+        return quiz.updated_at.isoformat()
+
+    @classmethod
+    def build(cls, quiz_id, version):
+        """Собрать ключ квиза из базы данных одним запросом."""
+        questions, revision = {}, None
+        rows = Question.objects.filter(quiz_id=quiz_id).values_list("id", "question_type", "content", "updated_at")
+        for question_id, question_type, content, updated_at in rows:
+            questions[question_id] = CompiledQuestion.compile(question_type, content)
+            revision = max(revision or updated_at, updated_at)
+        return cls(quiz_id, version, revision, questions)
+
+    @classmethod
+    def get(cls, quiz):
+        """Вернуть актуальный ключ квиза из памяти процесса или кеша, при отсутствии собрать и закешировать."""
+        quiz_id, version = quiz.id, cls.current_version(quiz)
+        answer_key = cls._compiled.get(quiz_id)
+        if answer_key is not None and answer_key.version == version:
+            return answer_key
+        key = cls.cache_key(quiz_id, version)
+        data = cache.get(key)
+        if data is None:
+            answer_key = cls.build(quiz_id, version)
+            cache.set(key, (answer_key.revision, answer_key.questions), settings.QUIZ_ANSWER_KEY_CACHE_TIMEOUT)
+        else:
+            answer_key = cls(quiz_id, version, *data)
+        if len(cls._compiled) >= cls.max_compiled:
+            cls._compiled.clear()
+        cls._compiled[quiz_id] = answer_key
+        return answer_key
+
+    @classmethod
+    def invalidate(cls, *quiz_ids):
+        """Сбросить ключи квизов сменой версии: обновить время изменения квизов одним UPDATE."""
+        Quiz.all_objects.filter(id__in=[quiz_id for quiz_id in quiz_ids if quiz_id]).update(updated_at=timezone.now())
+
+    def grade(self, user_answers):
+        """Проверить ответы пользователя, вернуть результат по каждому ответу и количество правильных ответов."""
+        result, correct_count = [], 0
+        for user_answer in user_answers:
+            question_id = user_answer["question_id"]
+            question = self.questions.get(question_id)
+            if question is None:
+                result.append({"question_id": question_id, "correct_answer_id": [], "is_correct": False})
+                continue
+            is_correct = question.check(user_answer["answer_id"])
+            correct_count += is_correct
+            result.append(
+                {"question_id": question_id, "correct_answer_id": question.correct_answer_id, "is_correct": is_correct}
+            )
+        return result, correct_count
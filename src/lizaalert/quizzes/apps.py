@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class QuizzesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "lizaalert.quizzes"
+
+    def ready(self):
+        from lizaalert.quizzes import signals  # noqa
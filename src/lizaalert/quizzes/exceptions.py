@@ -0,0 +1,38 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class QuizException(APIException):
+    """Базовый класс для исключений, связанных с квизами."""
+
+    status_code = status.HTTP_400_BAD_REQUEST
+
+
+class TestNotStartedException(QuizException):
+    """Исключение, которое возникает, когда пытаемся обработать тест, который еще не начат."""
+
+    default_detail = "Тест еще не начат."
+
+
+class TimeExpiredException(QuizException):
+    """Исключение, которое возникает, когда время для прохождения теста истекло."""
+
+    default_detail = "Время вышло. Вы не успели."
+
+
+class CountExpiredException(QuizException):
+    """Исключение, которое возникает, когда заканчивается количество попыток для теста."""
+
+    default_detail = "Закончилось количество попыток."
+
+
+class DeadlineExpiredException(QuizException):
+    """Исключение, которое возникает при попытке начать тест после срока выполнения."""
+
+    default_detail = "Срок выполнения теста истек."
+
+
+class AttemptClosedException(QuizException):
+    """Исключение, которое возникает при отправке ответов в завершенную попытку."""
+
+    default_detail = "Ответы на эту попытку уже отправлены, начните новую попытку."
@@ -0,0 +1,30 @@
+from lizaalert.courses.fast_serializers import FastSerializer, as_bool, as_datetime, as_int, as_str
+
+
+class FastQuizWithQuestionsSerializer(FastSerializer):
+    """Облегченный аналог QuizWithQuestionsSerializer."""
+
+    @staticmethod
+    def questions(quiz):
+        return [
+            {
+                "id": question.id,
+                "title": as_str(question.title),
+                "content": [{"id": int(item["id"]), "text": str(item["text"])} for item in question.content],
+                "question_type": as_str(question.question_type),
+            }
+            for question in quiz.questions.all()
+        ]
+
+    def to_representation(self, quiz):
+        return {
+            "id": quiz.id,
+            "title": as_str(quiz.title),
+            "description": as_str(quiz.description),
+            "status": as_str(quiz.status),
+            "passing_score": as_int(quiz.passing_score),
+            "retries": as_int(quiz.retries),
+            "in_progress": as_bool(quiz.in_progress),
+            "deadline": as_datetime(quiz.deadline),
+            "questions": self.questions(quiz),
+        }
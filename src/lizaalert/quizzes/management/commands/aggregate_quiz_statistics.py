@@ -0,0 +1,36 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from lizaalert.quizzes.analytics import QuizStatisticsAggregator
+
+
+class Command(BaseCommand):
+    help = (
+        "Учесть закрытые попытки прохождения квизов в статистике квизов и вопросов: количество попыток, "
+        "доля правильных ответов, доля сданных попыток и среднее время решения. Попытки учитываются "
+        "инкрементально от сохраненной позиции по updated_at. С --loop команда повторяет агрегацию "
+        "каждые --interval секунд."
+    )
+
+    def handle(self, *args, **options):
+        aggregator = QuizStatisticsAggregator(options["batch_size"], timedelta(seconds=options["lag"]))
+        try:
+            while True:
+                folded = aggregator.run()
+                if folded or not options["loop"]:
+                    self.stdout.write(self.style.SUCCESS(f"Учтено попыток: {folded}"))
+                if not options["loop"]:
+                    return
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Остановлено")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Количество попыток в одной транзакции")
+        parser.add_argument(
+            "--lag", type=float, default=60, help="Учитывать попытки, закрытые не позже указанного числа секунд назад"
+        )
+        parser.add_argument("--loop", action="store_true", help="Повторять агрегацию до остановки процесса")
+        parser.add_argument("--interval", type=float, default=300, help="Пауза между запусками в режиме --loop, секунд")
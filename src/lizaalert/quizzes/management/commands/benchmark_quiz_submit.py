@@ -0,0 +1,104 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from lizaalert.courses.management.commands.benchmark_endpoints import percentile
+from lizaalert.courses.management.commands.benchmark_serializers import Command as BenchmarkSerializersCommand
+from lizaalert.courses.models import Lesson
+from lizaalert.quizzes.models import Question, Quiz
+from lizaalert.settings.instrumentation import QueryRecorder
+
+
+class Command(BaseCommand):
+    help = (
+        "Замер отправки ответов на квиз с большим количеством вопросов (по умолчанию 100). "
+        "Данные создаются в транзакции и откатываются после замеров. С --max-p95 и --max-queries "
+        "команда завершается с ошибкой, если целевые показатели не достигнуты."
+    )
+
+    def handle(self, *args, **options):
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]), transaction.atomic():
+            try:
+                durations, queries = self.run_benchmark(options["questions"], options["repeat"])
+            finally:
+                transaction.set_rollback(True)
+        p50, p95 = percentile(durations, 50), percentile(durations, 95)
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Отправка ответов на квиз из {options['questions']} вопросов"))
+        self.stdout.write(f"  p50 {p50:.2f} мс, p95 {p95:.2f} мс, запросов к БД {max(queries)}")
+        errors = []
+        if options["max_p95"] is not None and p95 > options["max_p95"]:
+            errors.append(f"p95 {p95:.2f} мс больше {options['max_p95']} мс")
+        if options["max_queries"] is not None and max(queries) > options["max_queries"]:
+            errors.append(f"запросов к БД {max(queries)} больше {options['max_queries']}")
+        if errors:
+            raise CommandError("Целевые показатели не достигнуты: " + ", ".join(errors))
+
+    def add_arguments(self, parser):
+        parser.add_argument("--questions", type=int, default=100, help="Количество вопросов в квизе")
+        parser.add_argument("--repeat", type=int, default=50, help="Количество отправок ответов")
+        parser.add_argument("--max-p95", type=float, help="Целевое значение p95 времени ответа, мс")
+        parser.add_argument("--max-queries", type=int, help="Целевое количество запросов к БД на отправку")
+
+    @staticmethod
+    def create_quiz(questions_count):
+        """Создать урок с квизом: вопросы с одним и несколькими правильными вариантами и с текстовым ответом."""
+        course = BenchmarkSerializersCommand.create_course(1, 1)
+        quiz = Quiz.objects.create(
+            title="Квиз для замеров",
+            description="Квиз для замеров",
+            status="active",
+            deadline=timezone.now() + timedelta(days=1),
+            duration_minutes=24 * 60,
+            passing_score=questions_count // 2,
+        )
+        question_types = ("radio", "checkbox", "text_answer")
+        Question.objects.bulk_create(
+            Question(
+                quiz=quiz,
+                question_type=question_types[number % len(question_types)],
+                title=f"Вопрос {number}",
+                order_number=number,
+                content=[
+                    {"id": variant, "text": f"Ответ {variant}", "is_correct": variant == 1 or variant == number % 4}
+                    for variant in range(1, 5)
+                ],
+            )
+            for number in range(1, questions_count + 1)
+        )
+        Lesson.objects.filter(course=course).update(lesson_type=Lesson.LessonType.QUIZ, quiz=quiz)
+        return course.user_created, Lesson.objects.filter(course=course).first(), quiz
+
+    def run_benchmark(self, questions_count, repeat):
+        user, lesson, quiz = self.create_quiz(questions_count)
+        client = APIClient(raise_request_exception=False)
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+        answers = [
+            {"question_id": question_id, "answer_id": [1] if question_type != "text_answer" else ["ответ 1"]}
+            for question_id, question_type in quiz.questions.values_list("id", "question_type")
+        ]
+        url = reverse("quiz-answer", kwargs={"lesson_id": lesson.id})
+        durations, queries = [], []
+        for _ in range(repeat + 1):
+            # Начало попытки - подготовка замера, в замер не входит
+            response = client.post(reverse("run-quiz", kwargs={"lesson_id": lesson.id}), format="json")
+            if response.status_code >= 400:
+                raise CommandError(f"Не удалось начать квиз: {response.status_code} {response.data}")
+            recorder = QueryRecorder()
+            with recorder.record():
+                start = time.perf_counter()
+                response = client.post(url, answers, format="json")
+                duration = (time.perf_counter() - start) * 1000
+            if response.status_code != 200:
+                raise CommandError(f"Ошибка отправки ответов: {response.status_code} {response.data}")
+            durations.append(duration)
+            queries.append(len(recorder.queries))
+        # Первая отправка компилирует ключ ответов квиза и в результаты не входит
+        return durations[1:], queries[1:]
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from lizaalert.quizzes.models import UserAnswer
+
+
+class Command(BaseCommand):
+    help = (
+        "Закрыть попытки прохождения квизов, время которых истекло: статус expired, результат - не сдано. "
+        "Попытки закрываются пачками, одним UPDATE на пачку. С --loop команда работает как планировщик "
+        "и повторяет проверку каждые --interval секунд."
+    )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                closed = UserAnswer.expire_overdue(options["batch_size"])
+                if closed or not options["loop"]:
+                    self.stdout.write(self.style.SUCCESS(f"Закрыто истекших попыток: {closed}"))
+                if not options["loop"]:
+                    return
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Остановлено")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Количество попыток в одном UPDATE")
+        parser.add_argument("--loop", action="store_true", help="Повторять проверку до остановки процесса")
+        parser.add_argument("--interval", type=float, default=60, help="Пауза между проверками в режиме --loop, секунд")
@@ -0,0 +1,87 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:40
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+import django.db.models.deletion
+
+
+def backfill_attempts(apps, schema_editor):
+    """
+    Заполнить статусы попыток и указатели на последние попытки.
+
+    Попытки с временем завершения считаются отправленными, незавершенные попытки, кроме последних, - истекшими.
+    Для незавершенных последних попыток вычисляется время окончания.
+    """
+    UserAnswer = apps.get_model('quizzes', 'UserAnswer')
+    LatestAttempt = apps.get_model('quizzes', 'LatestAttempt')
+    latest = UserAnswer.objects.values('user_id', 'quiz_id').annotate(last_id=Max('id')).order_by()
+    LatestAttempt.objects.bulk_create(
+        LatestAttempt(user_id=row['user_id'], quiz_id=row['quiz_id'], attempt_id=row['last_id']) for row in latest
+    )
+    UserAnswer.objects.filter(end_date__isnull=False).update(status='submitted')
+    open_attempts = UserAnswer.objects.filter(status='started')
+    open_attempts.exclude(id__in=LatestAttempt.objects.values('attempt_id')).update(status='expired')
+    attempts = list(open_attempts.filter(start_date__isnull=False).select_related('quiz'))
+    for attempt in attempts:
+        # Как Quiz.attempt_expires_at: при duration_minutes = 0 попытка истекает сразу после начала
+        quiz = attempt.quiz
+        attempt.expires_at = min(attempt.start_date + timedelta(minutes=quiz.duration_minutes), quiz.deadline)
+    UserAnswer.objects.bulk_update(attempts, ('expires_at',), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('quizzes', '0004_auto_20240119_1504'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'verbose_name': 'Последняя попытка',
+                'verbose_name_plural': 'Последние попытки',
+            },
+        ),
+        migrations.AddField(
+            model_name='useranswer',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Время окончания попытки'),
+        ),
+        migrations.AddField(
+            model_name='useranswer',
+            name='status',
+            field=models.CharField(choices=[('started', 'Начата'), ('submitted', 'Ответы отправлены'), ('expired', 'Время истекло')], default='started', max_length=20, verbose_name='Статус попытки'),
+        ),
+        migrations.AddIndex(
+            model_name='useranswer',
+            index=models.Index(fields=['user', 'quiz', '-id'], name='useranswer_user_quiz_idx'),
+        ),
+        migrations.AddField(
+            model_name='latestattempt',
+            name='attempt',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pointer', to='quizzes.useranswer', verbose_name='Последняя попытка'),
+        ),
+        migrations.AddField(
+            model_name='latestattempt',
+            name='quiz',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quizzes.quiz', verbose_name='Квиз'),
+        ),
+        migrations.AddField(
+            model_name='latestattempt',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddConstraint(
+            model_name='latestattempt',
+            constraint=models.UniqueConstraint(fields=('user', 'quiz'), name='unique_latest_attempt'),
+        ),
+        migrations.RunPython(backfill_attempts, migrations.RunPython.noop),
+    ]
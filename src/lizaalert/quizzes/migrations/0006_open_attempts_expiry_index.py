@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0005_attempt_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='useranswer',
+            index=models.Index(condition=models.Q(('status', 'started')), fields=['expires_at'], name='useranswer_open_expires_idx'),
+        ),
+    ]
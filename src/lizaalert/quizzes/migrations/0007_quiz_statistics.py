@@ -0,0 +1,58 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0006_open_attempts_expiry_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AggregationWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Агрегация')),
+                ('position', models.DateTimeField(blank=True, null=True, verbose_name='Время изменения последней учтенной записи')),
+                ('last_id', models.PositiveBigIntegerField(default=0, verbose_name='Id последней учтенной записи')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Время обновления')),
+            ],
+            options={
+                'verbose_name': 'Позиция агрегации',
+                'verbose_name_plural': 'Позиции агрегации',
+            },
+        ),
+        migrations.CreateModel(
+            name='QuizStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Закрытых попыток')),
+                ('submitted', models.PositiveIntegerField(default=0, verbose_name='Отправленных попыток')),
+                ('passed', models.PositiveIntegerField(default=0, verbose_name='Сданных попыток')),
+                ('solve_seconds', models.PositiveBigIntegerField(default=0, verbose_name='Суммарное время решения, секунд')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Время обновления')),
+                ('quiz', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='statistics', to='quizzes.quiz', verbose_name='Квиз')),
+            ],
+            options={
+                'verbose_name': 'Статистика квиза',
+                'verbose_name_plural': 'Статистика квизов',
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Ответов')),
+                ('correct', models.PositiveIntegerField(default=0, verbose_name='Правильных ответов')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Время обновления')),
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='statistics', to='quizzes.question', verbose_name='Вопрос')),
+            ],
+            options={
+                'verbose_name': 'Статистика вопроса',
+                'verbose_name_plural': 'Статистика вопросов',
+            },
+        ),
+    ]
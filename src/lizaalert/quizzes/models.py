@@ -1,7 +1,16 @@
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
 
 from lizaalert.courses.mixins import TimeStampedModel
+from lizaalert.quizzes.exceptions import (
+    AttemptClosedException,
+    CountExpiredException,
+    DeadlineExpiredException,
+    TimeExpiredException,
+)
 from lizaalert.quizzes.managers import QuestionManager
 
 User = get_user_model()
@@ -31,6 +40,15 @@ class Quiz(TimeStampedModel):
     def __str__(self):
         return self.title
 
+    def attempt_expires_at(self, start_date):
+        """
+        Время окончания попытки, начатой в start_date.
+
+        Попытка длится duration_minutes, но не дольше срока выполнения квиза. Как и при проверке времени решения
+        до появления expires_at, при duration_minutes = 0 попытка истекает сразу после начала.
+        """
+        return min(start_date + timedelta(minutes=self.duration_minutes), self.deadline)
+
 
 class Question(TimeStampedModel):
     QUESTION_TYPES = [
@@ -52,6 +70,19 @@ class Question(TimeStampedModel):
 
 
 class UserAnswer(TimeStampedModel):
+    """
+    Попытка прохождения квиза пользователем.
+
+    Попытка начинается в статусе started и закрывается отправкой ответов (submitted) или по истечении
+    времени (expired). Последняя попытка пользователя по квизу доступна через LatestAttempt, поэтому
+    проверки попыток и сроков не просматривают историю попыток.
+    """
+
+    class Status(models.TextChoices):
+        STARTED = "started", "Начата"
+        SUBMITTED = "submitted", "Ответы отправлены"
+        EXPIRED = "expired", "Время истекло"
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE)
     answers = models.JSONField("Ответы пользователя", null=True, blank=True)
@@ -61,7 +92,215 @@ class UserAnswer(TimeStampedModel):
     final_result = models.CharField("Окончательный результат", max_length=255, null=True, blank=True)
     start_date = models.DateTimeField("Время начала выполнения", null=True, blank=True)
     end_date = models.DateTimeField("Время завершения выполнения", null=True, blank=True)
+    status = models.CharField("Статус попытки", max_length=20, choices=Status.choices, default=Status.STARTED)
+    expires_at = models.DateTimeField("Время окончания попытки", null=True, blank=True)
 
     class Meta:
         verbose_name = "Ответ пользователя"
         verbose_name_plural = "Ответы пользователей"
+        indexes = (
+            models.Index(fields=("user", "quiz", "-id"), name="useranswer_user_quiz_idx"),
+            models.Index(
+                fields=("expires_at",), name="useranswer_open_expires_idx", condition=models.Q(status="started")
+            ),
+        )
+
+    @classmethod
+    def start(cls, user, quiz):
+        """
+        Начать новую попытку прохождения квиза.
+
+        Число попыток проверяется по последней попытке (retries = 0 - без ограничения), начать попытку после
+        срока выполнения квиза нельзя. Незавершенная предыдущая попытка закрывается как истекшая.
+        Если параллельная первая попытка успела создать указатель LatestAttempt, запуск повторяется один раз
+        уже с блокировкой созданного указателя.
+        """
+        now = timezone.now()
+        if now > quiz.deadline:
+            raise DeadlineExpiredException()
+        try:
+            return cls._start(user, quiz, now)
+        except IntegrityError:
+            return cls._start(user, quiz, now)
+
+    @classmethod
+    def _start(cls, user, quiz, now):
+        with transaction.atomic():
+            pointer = (
+                LatestAttempt.objects.select_for_update().select_related("attempt").filter(user=user, quiz=quiz).first()
+            )
+            retry_count = 1 if quiz.retries else 0
+            if pointer is not None:
+                previous = pointer.attempt
+                if quiz.retries != 0 and previous.retry_count >= quiz.retries:
+                    raise CountExpiredException("Попытки закончились")
+                retry_count = previous.retry_count + 1
+                if previous.status == cls.Status.STARTED:
+                    cls.close_expired(cls.objects.filter(id=previous.id), now, now)
+            attempt = cls.objects.create(
+                user=user,
+                quiz=quiz,
+                start_date=now,
+                retry_count=retry_count,
+                expires_at=quiz.attempt_expires_at(now),
+            )
+            if pointer is None:
+                LatestAttempt.objects.create(user=user, quiz=quiz, attempt=attempt)
+            else:
+                LatestAttempt.objects.filter(id=pointer.id).update(attempt=attempt)
+        return attempt
+
+    @classmethod
+    def close_expired(cls, attempts, now, end_date):
+        """
+        Закрыть незавершенные попытки из attempts как истекшие одним UPDATE.
+
+        Окончательный результат попытки - не сдано, end_date - время завершения (значение или выражение).
+        Возвращает количество закрытых попыток.
+        """
+        return attempts.filter(status=cls.Status.STARTED).update(
+            status=cls.Status.EXPIRED, final_result=False, end_date=end_date, updated_at=now
+        )
+
+    @classmethod
+    def expire_overdue(cls, batch_size=1000):
+        """
+        Закрыть все попытки, время которых истекло, пачками по batch_size.
+
+        Каждая пачка закрывается одним UPDATE с подзапросом, временем завершения считается expires_at.
+        Возвращает количество закрытых попыток.
+        """
+        now = timezone.now()
+        overdue = cls.objects.filter(status=cls.Status.STARTED, expires_at__lt=now).order_by("expires_at")
+        total = 0
+        while True:
+            closed = cls.close_expired(
+                cls.objects.filter(id__in=overdue.values("id")[:batch_size]), now, models.F("expires_at")
+            )
+            total += closed
+            if closed < batch_size:
+                return total
+
+    def submit(self, answers):
+        """
+        Отправить ответы в попытку и проверить их.
+
+        Попытка закрывается одним условным UPDATE, поэтому ответы не записываются в попытку, закрытую параллельно.
+        """
+        from lizaalert.quizzes.utils import compare_answers
+
+        now = timezone.now()
+        if self.status != self.Status.STARTED:
+            raise AttemptClosedException()
+        if self.expires_at is not None and now > self.expires_at:
+            self.close_expired(UserAnswer.objects.filter(id=self.id), now, self.expires_at)
+            self.status, self.final_result, self.end_date = self.Status.EXPIRED, False, self.expires_at
+            raise TimeExpiredException("Время истекло")
+        self.answers = answers
+        self.result, self.score = compare_answers(answers, self.quiz)
+        self.final_result = self.quiz.passing_score <= self.score
+        self.status = self.Status.SUBMITTED
+        self.end_date = self.updated_at = now
+        updated = UserAnswer.objects.filter(id=self.id, status=self.Status.STARTED).update(
+            answers=self.answers,
+            result=self.result,
+            score=self.score,
+            final_result=self.final_result,
+            status=self.status,
+            end_date=now,
+            updated_at=now,
+        )
+        if not updated:
+            raise AttemptClosedException()
+
+
+class LatestAttempt(models.Model):
+    """Указатель на последнюю попытку пользователя по квизу."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Пользователь")
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, verbose_name="Квиз")
+    attempt = models.OneToOneField(
+        UserAnswer, on_delete=models.CASCADE, related_name="pointer", verbose_name="Последняя попытка"
+    )
+
+    class Meta:
+        verbose_name = "Последняя попытка"
+        verbose_name_plural = "Последние попытки"
+        constraints = (models.UniqueConstraint(fields=("user", "quiz"), name="unique_latest_attempt"),)
+
+
+class QuizStatistics(models.Model):
+    """
+    Накопленная статистика квиза по закрытым попыткам.
+
+    Счетчики увеличиваются командой aggregate_quiz_statistics (QuizStatisticsAggregator), каждая закрытая
+    попытка учитывается один раз. attempts - отправленные и истекшие попытки, submitted - отправленные,
+    solve_seconds - суммарное время решения отправленных попыток.
+    """
+
+    quiz = models.OneToOneField(Quiz, on_delete=models.CASCADE, related_name="statistics", verbose_name="Квиз")
+    attempts = models.PositiveIntegerField("Закрытых попыток", default=0)
+    submitted = models.PositiveIntegerField("Отправленных попыток", default=0)
+    passed = models.PositiveIntegerField("Сданных попыток", default=0)
+    solve_seconds = models.PositiveBigIntegerField("Суммарное время решения, секунд", default=0)
+    updated_at = models.DateTimeField("Время обновления", auto_now=True)
+
+    class Meta:
+        verbose_name = "Статистика квиза"
+        verbose_name_plural = "Статистика квизов"
+
+    def __str__(self):
+        return f"Статистика квиза {self.quiz_id}"
+
+    @property
+    def pass_rate(self):
+        """Доля сданных попыток среди закрытых или None, если попыток нет."""
+        return self.passed / self.attempts if self.attempts else None
+
+    @property
+    def average_solve_seconds(self):
+        """Среднее время решения отправленной попытки в секундах или None, если попыток нет."""
+        return self.solve_seconds / self.submitted if self.submitted else None
+
+
+class QuestionStatistics(models.Model):
+    """Накопленная статистика ответов на вопрос в отправленных попытках (см. QuizStatistics)."""
+
+    question = models.OneToOneField(
+        Question, on_delete=models.CASCADE, related_name="statistics", verbose_name="Вопрос"
+    )
+    attempts = models.PositiveIntegerField("Ответов", default=0)
+    correct = models.PositiveIntegerField("Правильных ответов", default=0)
+    updated_at = models.DateTimeField("Время обновления", auto_now=True)
+
+    class Meta:
+        verbose_name = "Статистика вопроса"
+        verbose_name_plural = "Статистика вопросов"
+
+    def __str__(self):
+        return f"Статистика вопроса {self.question_id}"
+
+    @property
+    def correct_rate(self):
+        """Доля правильных ответов или None, если ответов нет."""
+        return self.correct / self.attempts if self.attempts else None
+
+
+class AggregationWatermark(models.Model):
+    """
+    Позиция инкрементальной агрегации: последняя учтенная запись в порядке (updated_at, id).
+
+    name - название агрегации.
+    """
+
+    name = models.CharField("Агрегация", max_length=100, unique=True)
+    position = models.DateTimeField("Время изменения последней учтенной записи", null=True, blank=True)
+    last_id = models.PositiveBigIntegerField("Id последней учтенной записи", default=0)
+    updated_at = models.DateTimeField("Время обновления", auto_now=True)
+
+    class Meta:
+        verbose_name = "Позиция агрегации"
+        verbose_name_plural = "Позиции агрегации"
+
+    def __str__(self):
+        return self.name
@@ -82,3 +82,25 @@ class UserAnswerSerializer(serializers.ModelSerializer):
         max_retries = instance.quiz.retries
         current_retries = instance.retry_count
         return max(0, max_retries - current_retries)
+
+
+class QuestionStatisticsSerializer(serializers.Serializer):
+    question_id = serializers.IntegerField()
+    title = serializers.CharField()
+    order_number = serializers.IntegerField()
+    attempts = serializers.IntegerField()
+    correct = serializers.IntegerField()
+    correct_rate = serializers.FloatField(allow_null=True)
+
+
+class QuizStatisticsSerializer(serializers.Serializer):
+    quiz_id = serializers.IntegerField()
+    title = serializers.CharField()
+    passing_score = serializers.IntegerField()
+    attempts = serializers.IntegerField()
+    submitted = serializers.IntegerField()
+    passed = serializers.IntegerField()
+    pass_rate = serializers.FloatField(allow_null=True)
+    average_solve_seconds = serializers.FloatField(allow_null=True)
+    aggregated_until = serializers.DateTimeField(allow_null=True)
+    questions = QuestionStatisticsSerializer(many=True)
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+
+@receiver(pre_save, sender="quizzes.Question")
+def remember_previous_quiz(sender, instance, **kwargs):
+    """Запомнить квиз вопроса до сохранения, чтобы при переносе вопроса сбросить ключ и прежнего квиза."""
+    instance._previous_quiz_id = (
+        sender.all_objects.filter(id=instance.id).values_list("quiz_id", flat=True).first() if instance.id else None
+    )
+
+
+@receiver((post_save, post_delete), sender="quizzes.Question")
+def invalidate_answer_key_on_question_change(sender, instance, **kwargs):
+    """Сбросить скомпилированные ключи ответов прежнего и нового квиза при изменении, переносе или удалении вопроса."""
+    from lizaalert.quizzes.answer_key import AnswerKey
+
+    AnswerKey.invalidate(instance.quiz_id, getattr(instance, "_previous_quiz_id", None))
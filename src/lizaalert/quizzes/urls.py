@@ -1,9 +1,10 @@
 from django.urls import path
 
-from lizaalert.quizzes.views import QuizDetailAnswerView, QuizDetailView, RunQuizView
+from lizaalert.quizzes.views import QuizDetailAnswerView, QuizDetailView, QuizStatisticsView, RunQuizView
 
 urlpatterns = [
     path("lessons/<int:lesson_id>/quiz/", QuizDetailView.as_view(), name="quiz"),
     path("lessons/<int:lesson_id>/quiz/run/", RunQuizView.as_view(), name="run-quiz"),
     path("lessons/<int:lesson_id>/quiz/answer/", QuizDetailAnswerView.as_view(), name="quiz-answer"),
+    path("lessons/<int:lesson_id>/quiz/statistics/", QuizStatisticsView.as_view(), name="quiz-statistics"),
 ]
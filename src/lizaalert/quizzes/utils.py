@@ -1,8 +1,9 @@
 from typing import Any, Dict, List, Tuple
 
-from django.shortcuts import get_list_or_404
+from django.http import Http404
 
-from lizaalert.quizzes.models import Question, Quiz
+from lizaalert.quizzes.answer_key import AnswerKey
+from lizaalert.quizzes.models import Quiz
 
 
 def compare_answers(
@@ -11,9 +12,12 @@ def compare_answers(
     """
     Сравнивает ответы пользователя на вопросы с правильными ответами для теста.
 
+    Проверка выполняется по скомпилированному ключу ответов квиза (AnswerKey) без запросов к вопросам.
+
     :param user_answers: Список словарей с ответами пользователя. Каждый словарь содержит
                         "question_id" (идентификатор вопроса)
-                        и "answer_id" (список идентификаторов ответов пользователя).
+                        и "answer_id" (список идентификаторов ответов пользователя,
+                        для вопроса с текстовым ответом - список из одной строки).
     :param quiz: Тест, для которого проводится сравнение ответов.
 
     :return: Кортеж, содержащий список словарей с информацией о каждом вопросе и количеством правильных ответов.
@@ -21,27 +25,7 @@ def compare_answers(
              правильных ответов) и "is_correct" (булево значение, показывающее, правильные ли ответы пользователя).
              Второй элемент кортежа - количество правильных ответов.
     """
-    correct_count = 0
-    all_questions = {q.id: q for q in get_list_or_404(Question, quiz=quiz)}
-    result = []
-
-    for user_answer in user_answers:
-        question_id = user_answer["question_id"]
-        user_answer_ids = user_answer["answer_id"]
-
-        question = all_questions.get(question_id)
-        if question:
-            if question.question_type in ["checkbox", "radio"]:
-                correct_answer_ids = [answer["id"] for answer in question.content if answer["is_correct"]]
-                is_correct = sorted(user_answer_ids) == sorted(correct_answer_ids)
-
-                if is_correct:
-                    correct_count += 1
-
-                result.append(
-                    {"question_id": question_id, "correct_answer_id": correct_answer_ids, "is_correct": is_correct}
-                )
-        else:
-            result.append({"question_id": question_id, "correct_answer_id": [], "is_correct": False})
-
-    return result, correct_count
+    answer_key = AnswerKey.get(quiz)
+    if not answer_key.questions:
+        raise Http404("No Question matches the given query.")
+    return answer_key.grade(user_answers)
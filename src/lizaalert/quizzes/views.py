@@ -1,44 +1,24 @@
-from datetime import datetime
 from typing import List
 
-from django.utils import timezone
+from django.shortcuts import get_object_or_404
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
+from pydantic import ValidationError as PydanticValidationError
 from rest_framework import generics, status
-from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.response import Response
 
+from lizaalert.courses.conditional import ConditionalGetMixin, load_tree_state
 from lizaalert.courses.models import Lesson
-from lizaalert.quizzes.models import Question, Quiz, UserAnswer
-from lizaalert.quizzes.serializers import QuizWithQuestionsSerializer, UserAnswerSerializer
-from lizaalert.quizzes.utils import compare_answers
+from lizaalert.courses.permissions import IsAdminOrTeacher
+from lizaalert.quizzes.analytics import QuizStatisticsAggregator
+from lizaalert.quizzes.exceptions import QuizException, TestNotStartedException
+from lizaalert.quizzes.fast_serializers import FastQuizWithQuestionsSerializer
+from lizaalert.quizzes.models import LatestAttempt, Question, Quiz, UserAnswer
+from lizaalert.quizzes.serializers import QuizStatisticsSerializer, QuizWithQuestionsSerializer, UserAnswerSerializer
+from lizaalert.quizzes.validators import ValidateIUserAnswersModel
 
 
-class QuizException(APIException):
-    """Базовый класс для исключений, связанных с квизами."""
-
-    status_code = status.HTTP_400_BAD_REQUEST
-
-
-class TestNotStartedException(QuizException):
-    """Исключение, которое возникает, когда пытаемся обработать тест, который еще не начат."""
-
-    default_detail = "Тест еще не начат."
-
-
-class TimeExpiredException(QuizException):
-    """Исключение, которое возникает, когда время для прохождения теста истекло."""
-
-    default_detail = "Время вышло. Вы не успели."
-
-
-class CountExpiredException(QuizException):
-    """Исключение, которое возникает, когда заканчивается количество попыток для теста."""
-
-    default_detail = "Закончилось количество попыток."
-
-
-class QuizDetailView(generics.RetrieveAPIView):
+class QuizDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     """
     Отображение деталей квиза.
 
@@ -61,15 +41,33 @@ class QuizDetailView(generics.RetrieveAPIView):
         lesson_id = self.kwargs.get("lesson_id")
         return Question.objects.filter(quiz__lesson_id=lesson_id)
 
+    def retrieve(self, request, *args, **kwargs):
+        quiz = self.get_object()
+        return self.conditional_response(quiz, lambda: Response(self.get_quiz_serializer(quiz).data))
+
+    def get_quiz_serializer(self, quiz):
+        """Облегченный сериализатор квиза, для урока без квиза - QuizWithQuestionsSerializer, как и раньше."""
+        if quiz is None:
+            return self.get_serializer(quiz)
+        return FastQuizWithQuestionsSerializer(quiz, context=self.get_serializer_context())
+
+    def get_conditional_state(self, quiz):
+        """Состояние квиза для ETag: квиз и его вопросы."""
+        if quiz is None:
+            return None
+        state = load_tree_state(Quiz.all_objects.filter(pk=quiz.pk), questions=Question.all_objects.filter(quiz=quiz))
+        return (quiz.updated_at, *state.values())
+
 
 class RunQuizView(generics.CreateAPIView):
     """
     Обрабатывает начало прохождения квиза для пользователя.
 
-    Создает новую запись UserAnswer для каждого запроса.
+    Создает новую попытку UserAnswer, незавершенная предыдущая попытка закрывается как истекшая.
 
     Возвращает:
-    - 201 Created, всегда создается новая запись UserAnswer.
+    - 201 Created, создана новая попытка;
+    - 400 Bad Request, если попытки закончились или срок выполнения квиза истек.
     """
 
     serializer_class = UserAnswerSerializer
@@ -83,34 +81,12 @@ class RunQuizView(generics.CreateAPIView):
     )
     def post(self, request, *args, **kwargs) -> Response:
         """Создает новую запись UserAnswer и начинает прохождение квиза."""
-        lesson_id = self.kwargs.get("lesson_id")
-        user = self.request.user
-        quiz = Quiz.objects.get(lesson__id=lesson_id)
-        user_answer = UserAnswer.objects.filter(user=user, quiz=quiz).order_by("-id").first()
-        retry_count = 0
-        if user_answer:
-            try:
-                if quiz.retries != 0 and user_answer.retry_count >= quiz.retries:
-                    raise CountExpiredException("Попытки закончились")
-            except CountExpiredException as e:
-                return Response({"message": e.detail}, status=e.status_code)
-            retry_count = user_answer.retry_count = user_answer.retry_count + 1
-        else:
-            if quiz.retries != 0:
-                retry_count = 1
-
-        start_date = datetime.now()
-
-        data = {"user": user.id, "quiz": quiz.id, "start_date": start_date, "retry_count": retry_count}
-
-        serializer = self.get_serializer(data=data)
+        quiz = Quiz.objects.get(lesson__id=self.kwargs.get("lesson_id"))
         try:
-            serializer.is_valid(raise_exception=True)
-        except ValidationError as e:
-            return Response({"error": e.detail}, status=status.HTTP_400_BAD_REQUEST)
-        serializer.save()
-
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+            user_answer = UserAnswer.start(self.request.user, quiz)
+        except QuizException as e:
+            return Response({"message": e.detail}, status=e.status_code)
+        return Response(self.get_serializer(user_answer).data, status=status.HTTP_201_CREATED)
 
 
 class QuizDetailAnswerView(generics.CreateAPIView, generics.RetrieveAPIView):
@@ -145,54 +121,56 @@ class QuizDetailAnswerView(generics.CreateAPIView, generics.RetrieveAPIView):
         return self.retrieve(request, *args, **kwargs)
 
     def get_object(self) -> UserAnswer:
-        """Получает объект UserAnswer для текущего пользователя и квиза."""
-        user = self.request.user
-        lesson_id = self.kwargs.get("lesson_id")
-        user_answer = (
-            UserAnswer.objects.filter(user=user, quiz_id__in=Lesson.objects.filter(id=lesson_id).values("quiz_id"))
-            .order_by("-id")
+        """Получает последнюю попытку текущего пользователя по квизу урока вместе с квизом."""
+        return self.get_latest_attempt()
+
+    def get_latest_attempt(self):
+        pointer = (
+            LatestAttempt.objects.select_related("attempt__quiz")
+            .filter(user=self.request.user, quiz__lesson=self.kwargs.get("lesson_id"))
             .first()
         )
-        return user_answer
+        return pointer.attempt if pointer else None
 
     @swagger_auto_schema(request_body=post_body_list, responses={200: UserAnswerSerializer()})
     def post(self, request, *args, **kwargs) -> Response:
-        """Обновляет ответы пользователя и вычисляет результаты теста."""
-        data = request.data
-
-        user = self.request.user
-
-        lesson_id = self.kwargs.get("lesson_id")
-        quiz = Quiz.objects.get(lesson=lesson_id)
+        """
+        Обновляет ответы пользователя и вычисляет результаты теста.
 
+        Ответы проверяются pydantic-моделью один раз, последняя попытка пользователя загружается вместе
+        с квизом одним запросом по указателю LatestAttempt, проверка выполняется по ключу ответов квиза,
+        результат записывается одним UPDATE.
+        """
         try:
-            user_answer = (
-                UserAnswer.objects.filter(user=user, quiz_id__in=Lesson.objects.filter(id=lesson_id).values("quiz_id"))
-                .order_by("-id")
-                .first()
+            answers = ValidateIUserAnswersModel(answers=request.data, result=None).model_dump(mode="json")["answers"]
+        except PydanticValidationError as e:
+            return Response(
+                {"answers": e.errors(include_url=False, include_context=False)}, status=status.HTTP_400_BAD_REQUEST
             )
-            user_answer.end_date = timezone.now()
-            solution_time = user_answer.end_date - user_answer.start_date
-            solution_time_minutes = solution_time.total_seconds() / 60
-
-            try:
-                if solution_time_minutes > quiz.duration_minutes:
-                    raise TimeExpiredException("Время истекло")
-            except TimeExpiredException as e:
-                return Response({"message": e.detail}, status=e.status_code)
-
-            serializer = UserAnswerSerializer(user_answer, data={"answers": data}, partial=True)
-            if serializer.is_valid():
-                user_answer.result, user_answer.score = compare_answers(data, quiz)
-            if quiz.passing_score > user_answer.score:
-                user_answer.final_result = False
-            else:
-                user_answer.final_result = True
-        except TestNotStartedException as e:
+        user_answer = self.get_latest_attempt()
+        try:
+            if user_answer is None:
+                raise TestNotStartedException()
+            user_answer.submit(answers)
+        except QuizException as e:
             return Response({"message": e.detail}, status=e.status_code)
-        serializer = UserAnswerSerializer(user_answer, data={"answers": data}, partial=True)
+        return Response(UserAnswerSerializer(user_answer).data, status=status.HTTP_200_OK)
+
+
+class QuizStatisticsView(generics.RetrieveAPIView):
+    """
+    Статистика квиза урока для преподавателей.
+
+    Возвращает количество закрытых и сданных попыток, долю сданных попыток, среднее время решения
+    и долю правильных ответов по каждому вопросу. Данные обновляются командой aggregate_quiz_statistics,
+    aggregated_until - время закрытия последней учтенной попытки.
+    """
+
+    serializer_class = QuizStatisticsSerializer
+    permission_classes = (IsAdminOrTeacher,)
+
+    def get_object(self):
+        return get_object_or_404(Quiz.objects.select_related("statistics"), lesson__id=self.kwargs.get("lesson_id"))
 
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    def retrieve(self, request, *args, **kwargs):
+        return Response(self.get_serializer(QuizStatisticsAggregator.report(self.get_object())).data)
@@ -1,6 +1,7 @@
 from django.contrib import admin, messages
 from django.contrib.admin.actions import delete_selected
 from django.utils.translation import ngettext
+from rest_framework.exceptions import APIException
 
 
 class ShowDeletedObjectsFilter(admin.SimpleListFilter):
@@ -52,8 +53,9 @@ class BaseAdmin(admin.ModelAdmin):
 
     @admin.action(description="Удалить выбранные объекты")
     def soft_delete_selected(self, request, queryset):
-        qs = self.model.objects.filter(pk__in=queryset.values_list("pk", flat=True))
-        qs.delete()
+        """Мягкое удаление выбранных объектов по одному, чтобы срабатывали сигналы сохранения моделей."""
+        for obj in self.model.objects.filter(pk__in=queryset.values_list("pk", flat=True)):
+            obj.delete()
 
     @admin.display(description="Доступен")
     def is_deleted(self, obj):
@@ -64,8 +66,20 @@ class BaseAdmin(admin.ModelAdmin):
 
     @admin.action(description="Восстановить выбранные объекты")
     def soft_restore(self, request, queryset):
-        """Восстановление удаленных объектов."""
-        updated = queryset.update(deleted_at=None)
+        """
+        Восстановление удаленных объектов по одному, чтобы срабатывали сигналы сохранения моделей.
+
+        Объекты, которые восстановить не удалось (например, подписку без свободных мест в когортах),
+        пропускаются с предупреждением.
+        """
+        updated = 0
+        for obj in queryset.filter(deleted_at__isnull=False):
+            try:
+                obj.restore()
+            except APIException as error:
+                self.message_user(request, f"{obj}: {error.detail}", messages.WARNING)
+                continue
+            updated += 1
         self.message_user(
             request,
             ngettext(
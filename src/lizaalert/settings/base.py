@@ -74,6 +74,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "lizaalert.settings.instrumentation.QueryInstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -82,6 +83,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "lizaalert.courses.subscriptions.SubscriptionResolverMiddleware",
 ]
 
 ROOT_URLCONF = "lizaalert.settings.urls"
@@ -121,6 +123,24 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": env.str("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": env.str("CACHE_LOCATION", ""),
+    }
+}
+
+# Время жизни закешированных оглавления и снимка содержимого курса, секунд
+COURSE_OUTLINE_CACHE_TIMEOUT = env.int("COURSE_OUTLINE_CACHE_TIMEOUT", 60 * 60)
+# Наибольшее время жизни закешированного ответа каталога для неаутентифицированных пользователей, секунд
+COURSE_CATALOG_CACHE_TIMEOUT = env.int("COURSE_CATALOG_CACHE_TIMEOUT", 60 * 15)
+
+# Время жизни скомпилированного ключа ответов квиза в кеше, секунд
+QUIZ_ANSWER_KEY_CACHE_TIMEOUT = env.int("QUIZ_ANSWER_KEY_CACHE_TIMEOUT", 60 * 60 * 24)
+
+# Учет SQL-запросов по представлениям: заголовок Server-Timing и лог lizaalert.queries
+QUERY_INSTRUMENTATION = env.bool("QUERY_INSTRUMENTATION", False)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation" ".UserAttributeSimilarityValidator",
@@ -168,6 +188,10 @@ DJOSER = {
 
 YANDEX_INFO_URL = "https://login.yandex.ru/info?format=json"
 
+# Исходящие HTTP-запросы (Яндекс ID): таймаут, секунд, и размер пула соединений на хост
+OUTBOUND_HTTP_TIMEOUT = env.float("OUTBOUND_HTTP_TIMEOUT", 5)
+OUTBOUND_HTTP_POOL_SIZE = env.int("OUTBOUND_HTTP_POOL_SIZE", 10)
+
 # https://djoser.readthedocs.io/en/latest/authentication_backends.html#json-web-token-authentication
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
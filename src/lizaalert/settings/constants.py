@@ -8,6 +8,9 @@ CHAPTER_STEP = 1000
 # Default webinar length
 DEFAULT_WEBINAR_LENGTH = 60
 
+# Max users in one bulk enrollment request
+BULK_ENROLLMENT_MAX_USERS = 1000
+
 
 # Subscription statuses to allow access to the course
 def get_access_statuses():
@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils.deprecation import MiddlewareMixin
+
+logger = logging.getLogger("lizaalert.queries")
+
+_in_list_re = re.compile(r"\bIN \((?:%s, )*%s\)", re.IGNORECASE)
+_number_re = re.compile(r"\b\d+\b")
+_whitespace_re = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """
+    Отпечаток SQL-запроса.
+
+    Параметры в запросах Django уже вынесены в %s, дополнительно схлопываются списки IN разной длины
+    и числовые литералы (LIMIT, OFFSET). Одинаковые отпечатки в рамках одного запроса к API - признак N+1.
+    """
+    normalized = _whitespace_re.sub(" ", sql.strip())
+    normalized = _in_list_re.sub("IN (...)", normalized)
+    normalized = _number_re.sub("?", normalized)
+    return hashlib.md5(normalized.encode()).hexdigest()[:12]
+
+
+@dataclass
+class QueryStats:
+    """Статистика SQL-запросов, выполненных при обработке одного запроса к API."""
+
+    view: str
+    queries: list = field(default_factory=list)
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        """Суммарное время SQL-запросов в миллисекундах."""
+        return sum(duration for _, duration in self.queries) * 1000
+
+    @property
+    def duplicates(self):
+        """Повторяющиеся запросы: {отпечаток: {"count": количество, "sql": пример запроса}}."""
+        counter = Counter(fingerprint(sql) for sql, _ in self.queries)
+        samples = {}
+        for sql, _ in self.queries:
+            samples.setdefault(fingerprint(sql), sql)
+        return {key: {"count": count, "sql": samples[key]} for key, count in counter.items() if count > 1}
+
+    def server_timing(self):
+        return f'db;dur={self.duration:.1f};desc="{self.count} queries"'
+
+    def as_dict(self):
+        return {
+            "view": self.view,
+            "queries": self.count,
+            "duration_ms": round(self.duration, 1),
+            "duplicates": {key: value["count"] for key, value in self.duplicates.items()},
+        }
+
+
+class QueryRecorder:
+    """Сбор SQL-запросов всех подключений к базе данных через connection.execute_wrapper."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @contextmanager
+    def record(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+
+def view_name(request):
+    """
+    Имя представления для статистики: ViewSet.action для ViewSet, View.method для остальных представлений.
+
+    Для запросов, не дошедших до представления (404 при разборе url), возвращается путь запроса.
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return request.path
+    func = match.func
+    view_class = getattr(func, "cls", None) or getattr(func, "view_class", None)
+    if view_class is None:
+        return match.view_name or func.__name__
+    actions = getattr(func, "actions", None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f"{view_class.__name__}.{action}"
+
+
+class QueryInstrumentationMiddleware(MiddlewareMixin):
+    """
+    Учет SQL-запросов по представлениям.
+
+    Включается настройкой QUERY_INSTRUMENTATION. Для каждого запроса к API считает количество SQL-запросов,
+    их суммарное время и повторяющиеся запросы, добавляет в ответ заголовок Server-Timing
+    и пишет структурированную запись в лог lizaalert.queries (WARNING, если есть повторы).
+    Статистика также доступна тестам как response.query_stats.
+
+    Работает и в синхронной, и в асинхронной (ASGI) цепочке middleware, поэтому Django не переводит
+    асинхронные представления в синхронный режим. Под ASGI SQL-запросы выполняются в синхронном потоке
+    запроса, поэтому и учет запросов включается в этом потоке.
+    """
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not settings.QUERY_INSTRUMENTATION:
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        with recorder.record():
+            response = self.get_response(request)
+        return self.add_stats(request, response, recorder)
+
+    async def __acall__(self, request):
+        if not settings.QUERY_INSTRUMENTATION:
+            return await self.get_response(request)
+        recorder, stack = QueryRecorder(), ExitStack()
+        await sync_to_async(stack.enter_context)(recorder.record())
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.add_stats(request, response, recorder)
+
+    def add_stats(self, request, response, recorder):
+        stats = QueryStats(view=view_name(request), queries=recorder.queries)
+        response["Server-Timing"] = stats.server_timing()
+        response.query_stats = stats
+        self.log(request, response, stats)
+        return response
+
+    @staticmethod
+    def log(request, response, stats):
+        level = logging.WARNING if stats.duplicates else logging.INFO
+        data = {**stats.as_dict(), "method": request.method, "path": request.path, "status": response.status_code}
+        logger.log(
+            level,
+            "%(view)s: %(queries)s SQL-запросов за %(duration_ms)s мс",
+            data,
+            extra={"query_stats": data},
+        )
@@ -1,4 +1,9 @@
+import logging
+
 from lizaalert.settings.base import *  # noqa
+from lizaalert.settings.base import env
+
+logger = logging.getLogger(__name__)
 
 # Setup support for proxy headers
 USE_X_FORWARDED_HOST = True
@@ -21,3 +26,18 @@ CSRF_TRUSTED_ORIGINS = [
     "localhost:3000",
     "localhost:80",
 ]
+
+# Оглавления, снимки курсов и каталог сбрасываются сигналами в кеше: кеш в памяти процесса сбрасывается
+# только в воркере, сохранившем изменения, поэтому по умолчанию используется общий для воркеров memcached
+# из docker-compose.production.yml
+CACHES = {
+    "default": {
+        "BACKEND": env.str("CACHE_BACKEND", "django.core.cache.backends.memcached.PyMemcacheCache"),
+        "LOCATION": env.str("CACHE_LOCATION", "memcached:11211"),
+    }
+}
+if CACHES["default"]["BACKEND"] == "django.core.cache.backends.locmem.LocMemCache":
+    logger.warning(
+        "LocMemCache не разделяется между воркерами: воркеры, не сохранявшие изменения, будут отдавать "
+        "устаревшие оглавления, снимки курсов и каталог. Укажите общий кеш в CACHE_BACKEND и CACHE_LOCATION."
+    )
@@ -310,7 +310,7 @@ class Volunteer(models.Model):
 
     @property
     def level_confirmed(self):
-        return self.volunteer_levels.filter(confirmed=True).order_by("-updated_at").first()
+        return self.volunteer_levels.select_related("level").filter(confirmed=True).order_by("-updated_at").first()
 
     def __str__(self):
         return f"{self.user.username}"
@@ -36,12 +36,12 @@ class VolunteerAPIview(APIView):
 
     @swagger_auto_schema(
         operation_description="Отображает профиль пользователя",
-        responses={200: VolunteerSerializer(), 204: "", 404: Error404Serializer()},
+        responses={200: VolunteerSerializer(), 404: Error404Serializer()},
     )
     def get(self, request):
         """Получить профиль пользователя."""
-        volunteer = get_object_or_404(Volunteer, user=request.user)
-        queryset = Volunteer.objects.annotate(
+        # Пользователь, регион и отряд загружаются вместе с профилем, без отдельных запросов из сериализатора
+        queryset = Volunteer.objects.select_related("user", "location", "department").annotate(
             count_pass_course=Subquery(
                 Subscription.objects.filter(
                     course__course_volunteers__volunteer=OuterRef("pk"),
@@ -52,11 +52,10 @@ class VolunteerAPIview(APIView):
                 .annotate(count_pass_course=Count("pk"))
                 .values("count_pass_course")[:1]
             )
-        ).filter(pk=volunteer.pk)
-        serializer = VolunteerSerializer(queryset, context={"request": request}, many=True)
-        if queryset:
-            return Response(serializer.data[0])
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        )
+        volunteer = get_object_or_404(queryset, user=request.user)
+        serializer = VolunteerSerializer(volunteer, context={"request": request})
+        return Response(serializer.data)
 
     @swagger_auto_schema(
         operation_description="Внесение изменений в профиль пользователя",
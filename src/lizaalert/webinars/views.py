@@ -1,13 +1,15 @@
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status, viewsets
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
+from lizaalert.courses.conditional import ConditionalGetMixin
 from lizaalert.webinars.exceptions import NoSuitableWebinar
 from lizaalert.webinars.models import Webinar
 from lizaalert.webinars.serializers import ErrorSerializer, WebinarSerializer
 
 
-class WebinarViewSet(viewsets.ReadOnlyModelViewSet):
+class WebinarViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """
     Отображение вебинара.
 
@@ -42,4 +44,9 @@ class WebinarViewSet(viewsets.ReadOnlyModelViewSet):
         }
     )
     def retrieve(self, request, *args, **kwargs):
-        return super().retrieve(request, *args, **kwargs)
+        webinar = self.get_object()
+        return self.conditional_response(webinar, lambda: Response(self.get_serializer(webinar).data))
+
+    def get_conditional_state(self, webinar):
+        """Состояние вебинара для ETag, статус зависит от текущего времени."""
+        return webinar.updated_at, webinar.status
@@ -1,5 +1,17 @@
+import pytest
+from django.core.cache import cache
+
 pytest_plugins = [
     "tests.user_fixtures.user_fixtures",
     "tests.user_fixtures.course_fixtures",
     "tests.user_fixtures.role_fixtures",
+    "tests.query_budget",
 ]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Очистить кеш между тестами: id записей в базе данных переиспользуются после отката транзакции."""
+    cache.clear()
+    yield
+    cache.clear()
@@ -0,0 +1,53 @@
+"""
+Плагин pytest для бюджетов SQL-запросов.
+
+Фикстура query_budget включает QueryInstrumentationMiddleware и проверяет, что ответ представления
+уложился в заданное количество SQL-запросов. В конце прогона выводится сводка по проверенным представлениям.
+"""
+import pytest
+
+query_stats_key = pytest.StashKey[dict]()
+
+
+class QueryBudget:
+    """Проверка бюджета: query_budget(response, max_queries)."""
+
+    def __init__(self, collected):
+        self.collected = collected
+
+    def __call__(self, response, max_queries):
+        stats = getattr(response, "query_stats", None)
+        assert stats is not None, "Ответ не прошел через QueryInstrumentationMiddleware"
+        self.collected[stats.view] = (stats, max_queries)
+        if stats.count > max_queries:
+            pytest.fail(self.report(stats, max_queries), pytrace=False)
+        return stats
+
+    @staticmethod
+    def report(stats, max_queries):
+        lines = [f"{stats.view}: {stats.count} SQL-запросов при бюджете {max_queries}"]
+        lines += [f"  {number}. {sql}" for number, (sql, _) in enumerate(stats.queries, start=1)]
+        for key, duplicate in stats.duplicates.items():
+            lines.append(f"  Повтор {key} x{duplicate['count']}: {duplicate['sql']}")
+        return "\n".join(lines)
+
+
+def pytest_configure(config):
+    config.stash[query_stats_key] = {}
+
+
+@pytest.fixture
+def query_budget(settings, pytestconfig):
+    settings.QUERY_INSTRUMENTATION = True
+    return QueryBudget(pytestconfig.stash[query_stats_key])
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    collected = config.stash.get(query_stats_key, {})
+    if not collected:
+        return
+    terminalreporter.section("SQL-запросы по представлениям")
+    for view, (stats, max_queries) in sorted(collected.items()):
+        terminalreporter.write_line(
+            f"{view}: {stats.count}/{max_queries} запросов, {stats.duration:.1f} мс, повторов: {len(stats.duplicates)}"
+        )
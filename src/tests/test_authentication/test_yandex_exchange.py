@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.http import HttpResponse
+from django.urls import reverse
+from rest_framework import status
+
+from lizaalert.authentication.http import get_session
+from lizaalert.courses.subscriptions import SubscriptionResolverMiddleware
+from lizaalert.settings.instrumentation import QueryInstrumentationMiddleware
+from tests.test_authentication.yandex_stub import YandexStubServer
+
+User = get_user_model()
+
+YANDEX_USER = {"id": "2039480239", "login": "yandex_user"}
+
+
+@pytest.fixture
+def yandex_stub(settings):
+    with YandexStubServer(users={"valid_token": YANDEX_USER}, slow_tokens={"slow_token"}) as server:
+        settings.YANDEX_INFO_URL = server.info_url
+        settings.OUTBOUND_HTTP_TIMEOUT = 0.2
+        yield server
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("url_name", ("token_exchange", "token_exchange_async"))
+class TestYandexTokenExchange:
+    def test_valid_token(self, client, yandex_stub, url_name):
+        """Тест обмена токена через заглушку Яндекс ID: пользователь создан, токены выданы."""
+        response = client.post(reverse(url_name), data={"oauth_token": "valid_token"}, content_type="application/json")
+        assert response.status_code == status.HTTP_201_CREATED
+        assert {"access", "refresh"} <= set(response.json())
+        assert User.objects.filter(id=2039480239, username="yandex_user").exists()
+        assert yandex_stub.requests == ["/info?format=json"]
+
+    def test_invalid_token(self, client, yandex_stub, url_name):
+        """Тест отказа Яндекс ID: 401 с кодом ответа Яндекса."""
+        response = client.post(reverse(url_name), data={"oauth_token": "wrong"}, content_type="application/json")
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert response.json() == {"yandex_response_status": status.HTTP_401_UNAUTHORIZED}
+        assert not User.objects.exists()
+
+    def test_upstream_timeout(self, client, yandex_stub, url_name):
+        """Тест медленного ответа Яндекс ID: запрос прерывается по таймауту, ответ 502."""
+        response = client.post(reverse(url_name), data={"oauth_token": "slow_token"}, content_type="application/json")
+        assert response.status_code == status.HTTP_502_BAD_GATEWAY
+        assert response.json() == {"yandex_response_status": status.HTTP_504_GATEWAY_TIMEOUT}
+
+
+def test_shared_session_pool(settings):
+    """Тест, что исходящие запросы используют одну сессию с пулом соединений."""
+    session = get_session()
+    assert get_session() is session
+    assert session.get_adapter("https://login.yandex.ru/")._pool_maxsize == settings.OUTBOUND_HTTP_POOL_SIZE
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_token_exchange_through_asgi_handler(settings, yandex_stub):
+    """
+    Тест асинхронного обмена токена через ASGIHandler.
+
+    Собственные middleware проекта поддерживают асинхронную цепочку и не переводятся в синхронный режим,
+    учет SQL-запросов под ASGI видит запросы, выполненные представлением в синхронном потоке.
+    """
+    settings.QUERY_INSTRUMENTATION = True
+
+    async def get_response(request):
+        return HttpResponse()
+
+    for middleware in (QueryInstrumentationMiddleware, SubscriptionResolverMiddleware):
+        assert asyncio.iscoroutinefunction(middleware(get_response))
+
+    body = json.dumps({"oauth_token": "valid_token"}).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": reverse("token_exchange_async"),
+        "query_string": b"",
+        "headers": [(b"host", b"testserver"), (b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 10000),
+        "server": ("testserver", 80),
+    }
+
+    async def post():
+        communicator = ApplicationCommunicator(ASGIHandler(), scope)
+        await communicator.send_input({"type": "http.request", "body": body})
+        start = await communicator.receive_output(timeout=5)
+        content = await communicator.receive_output(timeout=5)
+        return start, content
+
+    start, content = async_to_sync(post)()
+    assert start["status"] == status.HTTP_201_CREATED
+    assert {"access", "refresh"} <= set(json.loads(content["body"]))
+    headers = dict(start["headers"])
+    assert b"queries" in headers[b"Server-Timing"]
+    assert not headers[b"Server-Timing"].endswith(b'"0 queries"')
+    assert User.objects.filter(id=2039480239, username="yandex_user").exists()
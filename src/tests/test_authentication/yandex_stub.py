@@ -0,0 +1,62 @@
+import json
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class YandexInfoHandler(BaseHTTPRequestHandler):
+    """Ответы эндпоинта https://login.yandex.ru/info по заголовку Authorization."""
+
+    def do_GET(self):  # noqa: N802
+        users = self.server.users
+        token = self.headers.get("Authorization", "").removeprefix("OAuth ")
+        self.server.requests.append(self.path)
+        if token in self.server.slow_tokens:
+            time.sleep(self.server.delay)
+        if token in users:
+            body, code = users[token], HTTPStatus.OK
+        else:
+            body, code = {"error": "invalid_token"}, HTTPStatus.UNAUTHORIZED
+        content = json.dumps(body).encode()
+        try:
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        except ConnectionError:
+            # Клиент закрыл соединение по таймауту
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class YandexStubServer(ThreadingHTTPServer):
+    """
+    Локальная заглушка Яндекс ID для тестов.
+
+    users - данные пользователей по OAuth-токену, на токены из slow_tokens ответ задерживается на delay секунд.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, users=None, slow_tokens=(), delay=1):
+        super().__init__(("127.0.0.1", 0), YandexInfoHandler)
+        self.users = users or {}
+        self.slow_tokens = set(slow_tokens)
+        self.delay = delay
+        self.requests = []
+
+    @property
+    def info_url(self):
+        return f"http://127.0.0.1:{self.server_port}/info?format=json"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
@@ -1,16 +1,53 @@
 import datetime
-from unittest.mock import Mock
+import importlib
+import json
+import sys
+import threading
+from io import StringIO
+from unittest.mock import Mock, patch
 
 import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Sum
 from django.dispatch import receiver
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
-
-from lizaalert.courses.exceptions import ProgressNotFinishedException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from lizaalert.courses.catalog import CourseCatalogQuery
+from lizaalert.courses.catalog_cache import CatalogResponseCache
+from lizaalert.courses.enrollment import BulkEnrollment
+from lizaalert.courses.exceptions import NoSuitableCohort, ProgressNotFinishedException
+from lizaalert.courses.fast_serializers import FastCourseDetailSerializer, FastCourseSerializer, FastLessonSerializer
 from lizaalert.courses.mixins import order_number_mixin
-from lizaalert.courses.models import BaseProgress, Chapter, Course, Lesson, LessonProgressStatus
+from lizaalert.courses.models import (
+    BaseProgress,
+    Chapter,
+    ChapterProgressStatus,
+    Cohort,
+    Course,
+    CourseProgressStatus,
+    Lesson,
+    LessonProgressStatus,
+)
+from lizaalert.courses.outline import CourseOutline
+from lizaalert.courses.pagination import CourseSetPagination
+from lizaalert.courses.permissions import CurrentLessonOrProhibited
+from lizaalert.courses.progress import ProgressSnapshot
+from lizaalert.courses.serializers import CourseDetailSerializer, CourseSerializer, LessonSerializer
 from lizaalert.courses.signals import course_finished
+from lizaalert.courses.snapshot import CourseSnapshot
 from lizaalert.homeworks.models import ProgressionStatus
+from lizaalert.quizzes.fast_serializers import FastQuizWithQuestionsSerializer
+from lizaalert.quizzes.models import Question, Quiz
+from lizaalert.quizzes.serializers import QuizWithQuestionsSerializer
 from lizaalert.settings.constants import CHAPTER_STEP, LESSON_STEP
 from tests.factories.courses import (
     ChapterFactory,
@@ -33,7 +70,7 @@ from tests.factories.courses import (
     UnpublishedLessonFactory,
 )
 from tests.factories.homeworks import HomeworkFactory
-from tests.factories.users import LevelFactory
+from tests.factories.users import LevelFactory, UserFactory
 
 
 @pytest.mark.django_db(transaction=True)
@@ -118,12 +155,12 @@ class TestCourse:
     def test_course_unavailable(self, anonymous_client, user_client):
         """Проверяем, что курс с недоступной когортой не попадает в выдачу."""
         CourseWithAvailableCohortFactory()
-        response = user_client.get(self.url)
+        response = user_client.get(self.url, {"with_count": "true"})
         courses_count = response.json()["count"]
         CourseWithUnavailableCohortFactory()
-        response_anonymous = anonymous_client.get(self.url)
+        response_anonymous = anonymous_client.get(self.url, {"with_count": "true"})
         assert response_anonymous.json()["count"] == courses_count
-        response_user = user_client.get(self.url)
+        response_user = user_client.get(self.url, {"with_count": "true"})
         assert response_user.json()["count"] == courses_count
 
     def test_course_unavailable_with_subscription(self, anonymous_client, user, user_client):
@@ -134,15 +171,15 @@ class TestCourse:
         неаутентифицированному пользователю, но попадает аутентифицированному.
         """
         course = CourseWithAvailableCohortFactory()
-        response = anonymous_client.get(self.url)
+        response = anonymous_client.get(self.url, {"with_count": "true"})
         courses_count = response.json()["count"]
         subscription = SubscriptionFactory(user=user, course=course)
         cohort = subscription.cohort
         cohort.start_date = datetime.date.today() - datetime.timedelta(days=1)
         cohort.save()
-        response_anonymous = anonymous_client.get(self.url)
+        response_anonymous = anonymous_client.get(self.url, {"with_count": "true"})
         assert response_anonymous.json()["count"] == courses_count - 1
-        response_user = user_client.get(self.url)
+        response_user = user_client.get(self.url, {"with_count": "true"})
         assert response_user.json()["count"] == courses_count
 
     def test_course_status_anonymous(self, anonymous_client):
@@ -614,6 +651,7 @@ class TestCourse:
         2. Проходим первый урок, проверяем, что пользователю доступен второй урок.
         3. Проверяем, что пользователю недоступен иной урок.
         4. Проверяем, что пользователю доступен пройденный урок.
+        5. Урок, которого нет в устаревшем оглавлении, проверяется по пересобранному оглавлению.
         """
         chapter = ChapterWith3Lessons()
         _ = CohortAlwaysAvailableFactory(course=chapter.course)
@@ -636,6 +674,19 @@ class TestCourse:
         response = user_client.get(url)
         assert response.status_code == status.HTTP_200_OK
 
+        # Урока нет в устаревшем закешированном оглавлении: оглавление пересобирается
+        outline = CourseOutline.build(chapter.course_id)
+        stale_lessons = tuple(item for item in outline.lessons if item[0] != lessons[0].id)
+        cache.set(CourseOutline.cache_key(chapter.course_id), (outline.course_title, outline.chapters, stale_lessons))
+        assert user_client.get(url).status_code == status.HTTP_200_OK
+        assert CourseOutline.get(chapter.course_id).index(lessons[0].id) is not None
+
+        # Урок, которого нет и в пересобранном оглавлении, недоступен
+        deleted_lesson = lessons[1]
+        deleted_lesson.delete()
+        request = Mock(user=user)
+        assert not CurrentLessonOrProhibited().has_object_permission(request, None, deleted_lesson)
+
     def test_update_subsctiptions_status(self, user, user_client):
         """
         Тест изменения статуса подписки на курс.
@@ -817,6 +868,195 @@ class TestCourse:
         assert nearest_cohort.students_count == initial_student_count_nearest_cohort + 1
         assert further_cohort.students_count == initial_student_count_further_cohort
 
+    def test_cohort_seat_falls_through_on_contention(self, user):
+        """
+        Тест записи без блокировок при конкуренции за последнее место.
+
+        Если последнее место в ближайшей когорте заняли параллельно, условный UPDATE не срабатывает
+        и место занимается в следующей когорте без переполнения.
+        """
+        course = CourseWith2Chapters()
+        nearest_cohort = CohortFactory(
+            course=course,
+            students_count=0,
+            max_students=1,
+            start_date=datetime.date.today() + datetime.timedelta(days=5),
+        )
+        further_cohort = CohortFactory(
+            course=course,
+            students_count=0,
+            max_students=5,
+            start_date=datetime.date.today() + datetime.timedelta(days=9),
+        )
+        open_for_enrollment = Cohort.open_for_enrollment
+
+        def stale_cohorts(course):
+            cohorts = list(open_for_enrollment(course))
+            # Параллельная запись занимает последнее место после выбора когорт
+            Cohort.objects.filter(pk=nearest_cohort.pk).update(students_count=1)
+            return cohorts
+
+        with patch.object(Cohort, "open_for_enrollment", side_effect=stale_cohorts):
+            subscription = Subscription.objects.create(user=user, course=course)
+        nearest_cohort.refresh_from_db()
+        further_cohort.refresh_from_db()
+        assert subscription.cohort == further_cohort
+        assert nearest_cohort.students_count == 1
+        assert further_cohort.students_count == 1
+
+    def test_claim_seats_skips_concurrently_deleted_cohorts(self, user):
+        """
+        Тест, что запись не зацикливается и не падает на когортах, удаленных после их выбора.
+
+        Мягко удаленная когорта без ограничения мест и полностью удаленная когорта пропускаются,
+        место занимается в следующей когорте.
+        """
+        course = CourseFactory()
+        soft_deleted = CohortAlwaysAvailableFactory(course=course, students_count=0)
+        hard_deleted = CohortFactory(course=course, students_count=0, max_students=5)
+        remaining = CohortFactory(course=course, students_count=0, max_students=5)
+
+        def stale_cohorts(course):
+            cohorts = [Cohort.objects.get(pk=cohort.pk) for cohort in (soft_deleted, hard_deleted, remaining)]
+            # Параллельно когорты удаляются после выбора
+            soft_deleted.delete()
+            Cohort.all_objects.filter(pk=hard_deleted.pk).delete()
+            return cohorts
+
+        with patch.object(Cohort, "open_for_enrollment", side_effect=stale_cohorts):
+            assert Cohort.claim_seats(course, 2) == [(remaining, 2)]
+        remaining.refresh_from_db()
+        assert remaining.students_count == 2
+
+    def test_unroll_releases_cohort_seat(self, user_client, user):
+        """Тест, что отписка от курса освобождает место в когорте, а запись в заполненную когорту невозможна."""
+        cohort = CohortFactory(students_count=0, max_students=1)
+        enroll_url = reverse("courses-enroll", kwargs={"pk": cohort.course_id})
+        unroll_url = reverse("courses-unroll", kwargs={"pk": cohort.course_id})
+        assert user_client.post(enroll_url).status_code == status.HTTP_201_CREATED
+        cohort.refresh_from_db()
+        assert cohort.students_count == 1
+        assert Cohort.claim_seat(cohort.course) is None
+
+        assert user_client.post(unroll_url).status_code == status.HTTP_204_NO_CONTENT
+        cohort.refresh_from_db()
+        assert cohort.students_count == 0
+        assert user_client.post(unroll_url).status_code == status.HTTP_404_NOT_FOUND
+        cohort.refresh_from_db()
+        assert cohort.students_count == 0
+
+    @pytest.mark.skipif(connection.vendor != "postgresql", reason="Параллельная запись проверяется на PostgreSQL.")
+    def test_concurrent_enrollment_does_not_overbook(self):
+        """Тест параллельной записи: мест занято не больше, чем есть в когортах, счетчики совпадают с подписками."""
+        course = CourseWith2Chapters()
+        cohorts = [
+            CohortFactory(
+                course=course,
+                students_count=0,
+                max_students=10,
+                start_date=datetime.date.today() + datetime.timedelta(days=days),
+            )
+            for days in (5, 10)
+        ]
+        users = [UserFactory(username=f"stress_{number}") for number in range(40)]
+
+        def enroll(users):
+            try:
+                for user in users:
+                    try:
+                        Subscription.objects.create(user=user, course=course)
+                    except NoSuitableCohort:
+                        pass
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=enroll, args=(users[number::8],)) for number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for cohort in cohorts:
+            cohort.refresh_from_db()
+            assert cohort.students_count == 10
+            assert Subscription.objects.filter(cohort=cohort).count() == 10
+        assert Subscription.objects.filter(course=course).count() == 20
+
+    def test_bulk_enroll(self, user_client, user, user_2, user_admin_teacher_role, anonymous_client):
+        """
+        Тест массовой записи на курс.
+
+        Места занимаются в ближайшей когорте, затем в следующей; уже записанные, не найденные пользователи
+        и пользователи, которым не хватило мест, возвращаются в результатах, счетчики когорт совпадают с подписками.
+        Отмененная подписка восстанавливается.
+        """
+        course = CourseFactory()
+        nearest_cohort = CohortFactory(
+            course=course,
+            students_count=0,
+            max_students=2,
+            start_date=datetime.date.today() + datetime.timedelta(days=5),
+        )
+        further_cohort = CohortFactory(
+            course=course,
+            students_count=0,
+            max_students=1,
+            start_date=datetime.date.today() + datetime.timedelta(days=9),
+        )
+        Subscription.objects.create(user=user, course=course)
+        unrolled = Subscription.objects.create(user=user_2, course=course)
+        unrolled.delete()
+        volunteers = [UserFactory(username=f"bulk_{number}", email=f"bulk_{number}@example.com") for number in range(3)]
+        url = reverse("courses-bulk-enroll", kwargs={"pk": course.id})
+        data = {
+            "user_ids": [user.id, user_2.id, volunteers[0].id, 999999],
+            "emails": ["BULK_1@example.com", volunteers[2].email, volunteers[0].email],
+        }
+        response = user_client.post(url, data, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        results = [(result["user"], result["status"], result["cohort_id"]) for result in response.json()]
+        assert results == [
+            (str(user.id), BulkEnrollment.Status.ALREADY_ENROLLED, nearest_cohort.id),
+            (str(user_2.id), BulkEnrollment.Status.ENROLLED, nearest_cohort.id),
+            (str(volunteers[0].id), BulkEnrollment.Status.ENROLLED, further_cohort.id),
+            ("999999", BulkEnrollment.Status.NOT_FOUND, None),
+            ("BULK_1@example.com", BulkEnrollment.Status.NO_SEATS, None),
+            (volunteers[2].email, BulkEnrollment.Status.NO_SEATS, None),
+            (volunteers[0].email, BulkEnrollment.Status.ENROLLED, further_cohort.id),
+        ]
+        for cohort in (nearest_cohort, further_cohort):
+            cohort.refresh_from_db()
+            assert cohort.students_count == cohort.max_students
+            assert cohort.students_count == Subscription.objects.filter(cohort=cohort).count()
+        assert Subscription.objects.get(user=user_2, course=course).id == unrolled.id
+
+        assert user_client.post(url, {}, format="json").status_code == status.HTTP_400_BAD_REQUEST
+        volunteer_client = APIClient()
+        volunteer_client.force_authenticate(volunteers[1])
+        assert volunteer_client.post(url, data, format="json").status_code == status.HTTP_403_FORBIDDEN
+        assert anonymous_client.post(url, data, format="json").status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_bulk_enroll_admin_action(self, admin_client):
+        """Тест действия админки: промежуточная форма и запись пользователей на выбранный курс."""
+        course = CourseFactory()
+        _ = CohortAlwaysAvailableFactory(course=course)
+        volunteers = [UserFactory(username=f"bulk_{number}", email=f"bulk_{number}@example.com") for number in range(2)]
+        url = reverse("admin:courses_course_changelist")
+        data = {"action": "bulk_enroll", "_selected_action": [course.id]}
+        response = admin_client.post(url, data)
+        assert response.status_code == status.HTTP_200_OK
+        assert "users" in response.context["form"].fields
+
+        response = admin_client.post(url, {**data, "apply": "yes", "users": "not-an-email"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.context["form"].errors
+
+        users = f"{volunteers[0].id}, {volunteers[1].email}"
+        response = admin_client.post(url, {**data, "apply": "yes", "users": users})
+        assert response.status_code == status.HTTP_302_FOUND
+        assert set(Subscription.objects.filter(course=course).values_list("user_id", flat=True)) == {
+            volunteer.id for volunteer in volunteers
+        }
+
     def test_unpublished_objects_cant_be_accessed(self, user_client, user):
         """
         Тест, что непубликованные объекты вернут соответствующую ошибку.
@@ -903,3 +1143,798 @@ class TestCourse:
         # Проверяем появления маркировки (deleted) у удаленных объектов в методе __repr__
         deleted_course = Course.all_objects.get(id=course.id)
         assert deleted_course.__repr__() == course.__repr__() + " (deleted)"
+
+    def test_soft_restore_admin_action(self, admin_client, user):
+        """
+        Тест действия админки восстановления мягко удаленных объектов.
+
+        1. Восстановленные урок и глава снова учитываются в статистике и позициях курса.
+        2. Восстановленная подписка снова занимает место в когорте.
+        3. Подписка без свободных мест в когортах не восстанавливается.
+        """
+        course = CourseWith2Chapters()
+        chapter = Chapter.objects.filter(course=course).order_by("order_number").first()
+        lesson = Lesson.objects.filter(chapter=chapter).order_by("order_number").first()
+        course.refresh_from_db()
+        lessons_count = course.lessons_count
+
+        # 1. Восстановленные урок и глава снова учитываются в статистике и позициях курса.
+        lesson.delete()
+        chapter.delete()
+        for model, obj in (("chapter", chapter), ("lesson", lesson)):
+            url = reverse(f"admin:courses_{model}_changelist")
+            response = admin_client.post(url, {"action": "soft_restore", "_selected_action": [obj.id]})
+            assert response.status_code == status.HTTP_302_FOUND
+        course.refresh_from_db()
+        assert course.lessons_count == lessons_count
+        lesson.refresh_from_db()
+        assert lesson.deleted_at is None
+        assert lesson.position == chapter.order_number + lesson.order_number
+
+        # 2. Восстановленная подписка снова занимает место в когорте.
+        cohort = CohortFactory(students_count=0, max_students=1)
+        subscription = Subscription.objects.create(user=user, course=cohort.course)
+        subscription.delete()
+        cohort.refresh_from_db()
+        assert cohort.students_count == 0
+        url = reverse("admin:courses_subscription_changelist")
+        data = {"action": "soft_restore", "_selected_action": [subscription.id]}
+        assert admin_client.post(url, data).status_code == status.HTTP_302_FOUND
+        subscription.refresh_from_db()
+        cohort.refresh_from_db()
+        assert subscription.deleted_at is None
+        assert cohort.students_count == 1
+
+        # 3. Подписка без свободных мест в когортах не восстанавливается.
+        subscription.delete()
+        Cohort.objects.filter(id=cohort.id).update(students_count=1)
+        assert admin_client.post(url, data).status_code == status.HTTP_302_FOUND
+        subscription.refresh_from_db()
+        assert subscription.deleted_at is not None
+
+    def test_catalog_lists_course_once_with_several_cohorts(self, anonymous_client):
+        """
+        Тест, что курс с несколькими доступными когортами попадает в каталог один раз.
+
+        Количество уроков не должно умножаться на количество подходящих когорт.
+        """
+        course = CourseWith2Chapters()
+        _ = CohortAlwaysAvailableFactory(course=course)
+        _ = CohortFactory(course=course)
+        response = anonymous_client.get(self.url)
+        results = [result for result in response.json()["results"] if result["id"] == course.id]
+        assert response.status_code == status.HTTP_200_OK
+        assert len(results) == 1
+        assert results[0]["lessons_count"] == 8
+
+    def test_catalog_query_count_does_not_depend_on_courses_number(self, anonymous_client):
+        """Тест, что количество запросов каталога не растет вместе с количеством курсов на странице."""
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as context:
+                response = anonymous_client.get(self.url, {"page_size": 100})
+            assert response.status_code == status.HTTP_200_OK
+            return len(context.captured_queries)
+
+        _ = CourseWithAvailableCohortFactory.create_batch(2)
+        queries_count = count_queries()
+        _ = CourseWithAvailableCohortFactory.create_batch(5)
+        assert count_queries() == queries_count
+
+    def test_user_status_query_count_does_not_depend_on_courses_number(self, user_client, user):
+        """Тест, что статус пользователя в каталоге вычисляется без запросов на каждый курс."""
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as context:
+                response = user_client.get(self.url, {"page_size": 100})
+            assert response.status_code == status.HTTP_200_OK
+            return len(context.captured_queries), response.json()["results"]
+
+        def subscribe(cohort_factory, count):
+            for _ in range(count):
+                cohort = cohort_factory(course=CourseFactory(status=Course.CourseStatus.PUBLISHED))
+                _ = SubscriptionFactory(user=user, course=cohort.course, cohort=cohort)
+
+        subscribe(CohortTodayFactory, 1)
+        subscribe(CohortFactory, 1)
+        queries_count, _ = count_queries()
+        subscribe(CohortTodayFactory, 3)
+        subscribe(CohortFactory, 3)
+        new_queries_count, courses = count_queries()
+        assert new_queries_count == queries_count
+        statuses = [course["user_status"] for course in courses]
+        assert statuses.count(Subscription.Status.AVAILABLE) == 4
+        assert statuses.count(Subscription.Status.ENROLLED) == 4
+
+    def test_catalog_cursor_pagination(self, anonymous_client):
+        """Тест курсорной пагинации каталога: обход страниц с фильтром, без COUNT(*) и с ограничением размера."""
+        level = LevelFactory(name="novice")
+        courses = CourseWithAvailableCohortFactory.create_batch(5, level=level)
+        _ = CourseWithAvailableCohortFactory.create_batch(2, level=LevelFactory(name="professional"))
+        with CaptureQueriesContext(connection) as context:
+            response = anonymous_client.get(self.url, {"level": level.id, "page_size": 2})
+        assert not any("COUNT(" in query["sql"] for query in context.captured_queries)
+        assert "count" not in response.json()
+        course_ids = []
+        while response.json()["next"]:
+            course_ids += [course["id"] for course in response.json()["results"]]
+            response = anonymous_client.get(response.json()["next"])
+        course_ids += [course["id"] for course in response.json()["results"]]
+        assert course_ids == sorted(course.id for course in courses)
+        response = anonymous_client.get(self.url, {"level": level.id, "with_count": "true"})
+        assert response.json()["count"] == len(courses)
+        _ = CourseWithAvailableCohortFactory.create_batch(100)
+        response = anonymous_client.get(self.url, {"page_size": 1000})
+        assert len(response.json()["results"]) == CourseSetPagination.max_page_size
+
+    def test_anonymous_catalog_cache(self, anonymous_client, user_client, user, django_assert_num_queries):
+        """
+        Тест кеша каталога для неаутентифицированных пользователей.
+
+        Повторный запрос с теми же (в том числе переставленными) параметрами отдается из кеша без запросов к БД,
+        изменение когорты сбрасывает кеш, счетчики доступны только администратору.
+        """
+        course = CourseWithAvailableCohortFactory()
+        detail_url = reverse("courses-detail", kwargs={"pk": course.id})
+        levels = f"{course.level_id},{course.level_id + 100}"
+        response = anonymous_client.get(self.url, {"level": levels})
+        assert [result["id"] for result in response.json()["results"]] == [course.id]
+        anonymous_client.get(detail_url)
+        with django_assert_num_queries(0):
+            cached_response = anonymous_client.get(self.url, {"level": f"{course.level_id + 100},{course.level_id}"})
+            cached_detail = anonymous_client.get(detail_url)
+        assert cached_response.json() == response.json()
+        assert cached_detail.json()["id"] == course.id
+        course_2 = CourseWithAvailableCohortFactory(level=course.level)
+        response = anonymous_client.get(self.url, {"level": levels})
+        assert [result["id"] for result in response.json()["results"]] == [course.id, course_2.id]
+        cohort = course_2.cohorts.get()
+        cohort.start_date = datetime.date.today() - datetime.timedelta(days=1)
+        cohort.save()
+        response = anonymous_client.get(self.url, {"level": levels})
+        assert [result["id"] for result in response.json()["results"]] == [course.id]
+
+        stats_url = reverse("courses-catalog-cache")
+        assert user_client.get(stats_url).status_code == status.HTTP_403_FORBIDDEN
+        user.is_staff = True
+        user.save()
+        assert user_client.get(stats_url).json() == {"hits": 2, "misses": 4}
+
+    def test_anonymous_catalog_cache_timeout(self, settings):
+        """Тест, что запись кеша каталога живет не дольше ближайшей смены доступности когорт."""
+        settings.COURSE_CATALOG_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+        assert CatalogResponseCache.timeout() == settings.COURSE_CATALOG_CACHE_TIMEOUT
+        _ = CohortFactory(start_date=datetime.date.today() + datetime.timedelta(days=2))
+        assert 2 * 24 * 60 * 60 < CatalogResponseCache.timeout() <= 3 * 24 * 60 * 60
+        _ = CohortTodayFactory()
+        assert 0 < CatalogResponseCache.timeout() <= 24 * 60 * 60
+
+    def test_production_settings_use_shared_cache(self, monkeypatch, caplog):
+        """
+        Тест кеша production-настроек.
+
+        1. Без CACHE_BACKEND и CACHE_LOCATION используется общий для воркеров memcached.
+        2. Кеш в памяти процесса, не общий для воркеров, не мешает запуску, но выводит предупреждение.
+        """
+
+        def import_production():
+            monkeypatch.delitem(sys.modules, "lizaalert.settings.production", raising=False)
+            return importlib.import_module("lizaalert.settings.production")
+
+        # 1. Общий кеш по умолчанию.
+        monkeypatch.delenv("CACHE_BACKEND", raising=False)
+        monkeypatch.delenv("CACHE_LOCATION", raising=False)
+        assert import_production().CACHES["default"] == {
+            "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+            "LOCATION": "memcached:11211",
+        }
+        assert "LocMemCache" not in caplog.text
+
+        # 2. Предупреждение о кеше в памяти процесса.
+        monkeypatch.setenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache")
+        assert import_production().CACHES["default"]["BACKEND"] == "django.core.cache.backends.locmem.LocMemCache"
+        assert "LocMemCache не разделяется между воркерами" in caplog.text
+        monkeypatch.delitem(sys.modules, "lizaalert.settings.production")
+
+    def test_course_and_lesson_conditional_get(self, user_client, user, anonymous_client):
+        """
+        Тест условных GET-запросов курса и урока.
+
+        Повторный запрос с ETag получает 304 без тела, изменение прогресса пользователя
+        или содержимого курса меняет ETag. Анонимному пользователю курс отдается из кеша каталога без ETag.
+        """
+        course = CourseWith2Chapters()
+        _ = CohortAlwaysAvailableFactory(course=course)
+        subscription = SubscriptionFactory(course=course, user=user)
+        lesson = Lesson.objects.filter(course=course).order_by("position").first()
+        course_url = reverse("courses-detail", kwargs={"pk": course.id})
+        lesson_url = reverse("lessons-detail", kwargs={"pk": lesson.id})
+
+        response = user_client.get(course_url)
+        etag = response["ETag"]
+        assert response["Last-Modified"]
+        response = user_client.get(course_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert not response.content
+        assert response["ETag"] == etag
+        response = anonymous_client.get(course_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert "ETag" not in response
+
+        lesson_etag = user_client.get(lesson_url)["ETag"]
+        response = user_client.get(lesson_url, HTTP_IF_NONE_MATCH=lesson_etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        etag = user_client.get(course_url)["ETag"]
+
+        lesson.finish(subscription)
+        response = user_client.get(lesson_url, HTTP_IF_NONE_MATCH=lesson_etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["user_lesson_progress"] == BaseProgress.ProgressStatus.FINISHED
+        response = user_client.get(course_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        etag = response["ETag"]
+
+        Lesson.objects.filter(course=course).order_by("position").last().delete()
+        assert user_client.get(course_url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_200_OK
+
+    def test_fast_serializers_match_drf_serializers(self, user):
+        """Тест, что облегченные сериализаторы выдают побайтно тот же JSON, что и DRF-сериализаторы."""
+        course = CourseWith2Chapters()
+        for factory_class in (CourseFaqFactory, CourseFaqFactory, CourseKnowledgeFactory):
+            _ = factory_class(course=course)
+        _ = CohortTodayFactory(course=course)
+        subscription = SubscriptionFactory(course=course, user=user)
+        lessons = list(Lesson.objects.filter(course=course).order_by("position"))
+        lessons[0].finish(subscription)
+        lessons[1].activate(subscription)
+        quiz = Quiz.objects.create(
+            title="Квиз", description="Вопросы", status="active", deadline=timezone.now(), retries=2
+        )
+        _ = Question.objects.create(
+            quiz=quiz, question_type="radio", title="Вопрос", order_number=1, content=[{"id": 1, "text": "Ответ"}]
+        )
+        renderer = JSONRenderer()
+
+        def assert_same_json(serializer_class, fast_serializer_class, instance, **kwargs):
+            expected = renderer.render(serializer_class(instance, **kwargs).data)
+            assert renderer.render(fast_serializer_class(instance, **kwargs).data) == expected
+
+        for request_user in (user, AnonymousUser()):
+            request = Request(APIRequestFactory().get("/"))
+            request.user = request_user
+            context = {"request": request}
+            courses = CourseCatalogQuery(request_user).build()
+            assert_same_json(CourseSerializer, FastCourseSerializer, courses, many=True, context=context)
+            course_detail = CourseCatalogQuery(request_user, course=course).build().get(id=course.id)
+            context["progress"] = ProgressSnapshot.load(request_user, course.id)
+            assert_same_json(CourseDetailSerializer, FastCourseDetailSerializer, course_detail, context=context)
+            expected = renderer.render(CourseDetailSerializer(course_detail, context=context).data)
+            context_with_snapshot = {**context, "snapshot": CourseSnapshot.build(course.id)}
+            assert renderer.render(FastCourseDetailSerializer(course_detail, context=context_with_snapshot).data) == (
+                expected
+            )
+            for lesson in lessons[:2]:
+                lesson = Lesson.objects.select_related("chapter").get(id=lesson.id)
+                assert_same_json(LessonSerializer, FastLessonSerializer, lesson, context=context)
+                lesson.user_lesson_progress = BaseProgress.ProgressStatus.FINISHED
+                assert_same_json(LessonSerializer, FastLessonSerializer, lesson, context=context)
+            assert_same_json(QuizWithQuestionsSerializer, FastQuizWithQuestionsSerializer, quiz, context=context)
+
+    def test_benchmark_serializers_command(self):
+        """Тест команды сравнения сериализаторов: данные откатываются, JSON совпадает."""
+        out = StringIO()
+        call_command("benchmark_serializers", chapters=3, lessons=2, repeat=1, stdout=out)
+        assert out.getvalue().count("Ускорение") == 3
+        assert "различается" not in out.getvalue()
+        assert not Course.all_objects.exists()
+
+    def test_seed_dataset_and_benchmark_endpoints_commands(self, tmp_path):
+        """
+        Тест команд заполнения базы данных и замера эндпоинтов.
+
+        Прогресс по урокам, главам и курсу согласован, все эндпоинты сценария отвечают без ошибок,
+        изменения сценария откатываются, результат сохраняется в JSON и сравнивается с базовым замером.
+        """
+        call_command("seed_dataset", courses=3, chapters=2, lessons=2, users=4, subscriptions=2, stdout=StringIO())
+        assert Course.objects.filter(status=Course.CourseStatus.PUBLISHED).count() == 3
+        assert Subscription.objects.count() == 8
+        assert Cohort.objects.filter(cohort_number=1).aggregate(total=Sum("students_count"))["total"] == 8
+        for progress in ChapterProgressStatus.objects.all():
+            assert (
+                progress.finished_lessons
+                == LessonProgressStatus.objects.filter(
+                    subscription=progress.subscription_id,
+                    lesson__chapter=progress.chapter_id,
+                    progress=BaseProgress.ProgressStatus.FINISHED,
+                ).count()
+            )
+        lesson_progress_count = LessonProgressStatus.objects.count()
+        Subscription.objects.update(status=Subscription.Status.IN_PROGRESS)
+
+        output = tmp_path / "benchmark.json"
+        call_command("benchmark_endpoints", users=2, repeat=1, output=str(output), stdout=StringIO())
+        report = json.loads(output.read_text())
+        assert set(report["endpoints"]) == {
+            "catalog",
+            "course_detail",
+            "lesson_open",
+            "lesson_complete",
+            "quiz_submit",
+            "profile",
+        }
+        for result in report["endpoints"].values():
+            assert result["errors"] == 0
+            assert result["requests"] == 2
+            assert result["p50_ms"] <= result["p95_ms"]
+            assert result["queries_max"] > 0
+        assert LessonProgressStatus.objects.count() == lesson_progress_count
+
+        out = StringIO()
+        call_command(
+            "benchmark_endpoints",
+            users=2,
+            repeat=1,
+            output=str(tmp_path / "next.json"),
+            baseline=str(output),
+            stdout=out,
+        )
+        assert "Сравнение с коммитом" in out.getvalue()
+
+    def test_course_snapshot(self, user_client, user):
+        """
+        Тест снимка содержимого курса.
+
+        Повторный просмотр курса берет содержимое из кеша, поля пользователя накладываются на снимок,
+        изменение урока, главы или FAQ курса сбрасывает снимок.
+        """
+        course = CourseWith2Chapters()
+        _ = CohortAlwaysAvailableFactory(course=course)
+        subscription = SubscriptionFactory(course=course, user=user)
+        lesson = Lesson.objects.filter(course=course).order_by("position").first()
+        lesson.finish(subscription)
+        url = reverse("courses-detail", kwargs={"pk": course.id})
+        detail = user_client.get(url).json()
+        assert CourseSnapshot.get(course.id)["chapters"][0]["lessons"][0] == {
+            key: value for key, value in detail["chapters"][0]["lessons"][0].items() if key != "user_lesson_progress"
+        }
+        assert detail["chapters"][0]["lessons"][0]["user_lesson_progress"] == BaseProgress.ProgressStatus.FINISHED
+        assert detail["cover_path"].startswith("http://testserver/")
+
+        lesson.title = "Новое название"
+        lesson.save()
+        assert cache.get(CourseSnapshot.cache_key(course.id)) is None
+        assert user_client.get(url).json()["chapters"][0]["lessons"][0]["title"] == lesson.title
+        faq = CourseFaqFactory(course=course).faq
+        assert cache.get(CourseSnapshot.cache_key(course.id)) is None
+        user_client.get(url)
+        faq.answer = "Новый ответ"
+        faq.save()
+        assert user_client.get(url).json()["faq"][0]["answer"] == faq.answer
+
+    @pytest.mark.skipif(connection.vendor != "sqlite", reason="План запроса проверяется для SQLite.")
+    def test_catalog_query_plan(self, user):
+        """
+        Тест плана запроса каталога.
+
+        Выборка курсов не группируется и не очищается от дублей целиком: агрегаты по урокам считаются
+        подзапросами, а подписка пользователя присоединяется по уникальному индексу (user, course).
+        """
+        _ = SubscriptionFactory(user=user, course=CourseWith2Chapters())
+        plan = CourseCatalogQuery(user).build().explain()
+        assert "TEMP B-TREE FOR GROUP BY" not in plan
+        assert "TEMP B-TREE FOR DISTINCT" not in plan
+        assert "SEARCH user_subscription USING INDEX" in plan
+
+    def test_course_statistics_follow_lessons_and_chapters(self):
+        """
+        Тест, что статистика курса пересчитывается при изменении уроков и глав.
+
+        1. После создания курса учтены все опубликованные уроки.
+        2. Снятый с публикации урок не учитывается.
+        3. Мягко удаленный урок не учитывается.
+        4. Уроки мягко удаленной главы не учитываются.
+        5. Команда rebuild_course_statistics восстанавливает рассинхронизированные значения.
+        6. Урок, перенесенный в главу другого курса, учитывается только в новом курсе.
+        7. Глава, перенесенная в другой курс, учитывается только в новом курсе.
+        """
+        course = CourseWith2Chapters()
+        lessons = Lesson.objects.filter(chapter__course=course).order_by("id")
+
+        def assert_statistics(expected_lessons):
+            course.refresh_from_db()
+            assert course.lessons_count == len(expected_lessons)
+            assert course.course_duration == sum(lesson.duration for lesson in expected_lessons)
+
+        # 1. После создания курса учтены все опубликованные уроки.
+        expected_lessons = list(lessons)
+        assert_statistics(expected_lessons)
+
+        # 2. Снятый с публикации урок не учитывается.
+        unpublished_lesson = expected_lessons.pop()
+        unpublished_lesson.status = Lesson.LessonStatus.DRAFT
+        unpublished_lesson.save()
+        assert_statistics(expected_lessons)
+
+        # 3. Мягко удаленный урок не учитывается.
+        expected_lessons.pop().delete()
+        assert_statistics(expected_lessons)
+
+        # 4. Уроки мягко удаленной главы не учитываются.
+        chapter = Chapter.objects.filter(course=course).order_by("order_number").first()
+        chapter.delete()
+        expected_lessons = [lesson for lesson in expected_lessons if lesson.chapter_id != chapter.id]
+        assert_statistics(expected_lessons)
+
+        # 5. Команда rebuild_course_statistics восстанавливает рассинхронизированные значения.
+        Course.objects.filter(id=course.id).update(lessons_count=0, course_duration=0)
+        call_command("rebuild_course_statistics", courses=[course.id])
+        assert_statistics(expected_lessons)
+
+        # 6. Урок, перенесенный в главу другого курса, учитывается только в новом курсе.
+        other_chapter = ChapterFactory()
+        other_course = other_chapter.course
+        moved_lesson = expected_lessons.pop()
+        moved_lesson.chapter = other_chapter
+        moved_lesson.save()
+        assert_statistics(expected_lessons)
+        other_course.refresh_from_db()
+        assert (
+            other_course.lessons_count
+            == Lesson.objects.filter(chapter__course=other_course, status=Lesson.LessonStatus.PUBLISHED).count()
+        )
+        assert moved_lesson.course_id == other_course.id
+
+        # 7. Глава, перенесенная в другой курс, учитывается только в новом курсе.
+        moved_chapter = Chapter.objects.filter(course=course).first()
+        moved_chapter.course = other_course
+        moved_chapter.save()
+        assert_statistics([lesson for lesson in expected_lessons if lesson.chapter_id != moved_chapter.id])
+
+    def test_course_statistics_follow_bulk_changes(self):
+        """
+        Тест, что статистика и позиции уроков пересчитываются при массовом изменении глав и уроков.
+
+        1. Глава, добавленная в курс через course.chapters.add(), учитывается только в новом курсе.
+        2. Уроки, снятые с публикации через queryset.update(), не учитываются.
+        3. Уроки, мягко удаленные через queryset.delete(), не учитываются.
+        """
+        chapter = ChapterWith3Lessons()
+        old_course = chapter.course
+        course = CourseWithAvailableCohortFactory()
+        lessons = Lesson.objects.filter(chapter=chapter)
+
+        def assert_statistics(course, expected_lessons):
+            course.refresh_from_db()
+            assert course.lessons_count == len(expected_lessons)
+            assert course.course_duration == sum(lesson.duration for lesson in expected_lessons)
+
+        # 1. Перенос главы через related manager пересчитывает статистику и позиции уроков.
+        course.chapters.add(chapter)
+        assert_statistics(course, list(lessons))
+        assert_statistics(old_course, [])
+        for lesson in lessons.select_related("chapter"):
+            assert lesson.course_id == course.id
+            assert lesson.position == lesson.chapter.order_number + lesson.order_number
+
+        # 2. Массовое снятие с публикации.
+        draft_lesson = lessons.order_by("order_number").first()
+        Lesson.objects.filter(id=draft_lesson.id).update(status=Lesson.LessonStatus.DRAFT)
+        assert_statistics(course, list(lessons.exclude(id=draft_lesson.id)))
+
+        # 3. Массовое мягкое удаление.
+        lessons.delete()
+        assert_statistics(course, [])
+
+    def test_lesson_positions_follow_ordering(self):
+        """
+        Тест сквозных позиций уроков в курсе.
+
+        1) Позиции уроков равны сумме порядковых номеров главы и урока, уроки курса идут подряд.
+        2) После переноса урока и главы позиции и соседние уроки пересчитываются, а изменение
+           без смены очередности и родителя позиции не пересчитывает.
+        3) Команда check_lesson_positions --fix восстанавливает рассинхронизированные позиции.
+        """
+
+        def assert_positions(course):
+            lessons = Lesson.objects.filter(chapter__course=course).select_related("chapter")
+            for lesson in lessons:
+                assert lesson.course_id == course.id
+                assert lesson.position == lesson.chapter.order_number + lesson.order_number
+            ordered = list(lessons.order_by("chapter__order_number", "order_number"))
+            for prev, current in zip(ordered, ordered[1:]):
+                assert current.prev_lesson.get() == prev
+                assert prev.next_lesson.get() == current
+
+        # 1. Позиции проставлены при создании.
+        course = CourseWith2Chapters()
+        assert_positions(course)
+
+        # 2. Перенос урока и главы пересчитывает позиции.
+        chapter = Chapter.objects.filter(course=course).order_by("order_number").first()
+        lesson = Lesson.objects.filter(chapter=chapter).order_by("order_number").last()
+        lesson.order_number = 13
+        lesson.save()
+        assert_positions(course)
+        chapter.order_number = 3947
+        chapter.save()
+        assert_positions(course)
+
+        # Изменение без смены очередности и родителя не пересчитывает позиции уроков курса.
+        for obj in (lesson, chapter):
+            obj.title = "Новое название"
+            with CaptureQueriesContext(connection) as queries:
+                obj.save()
+            # позиции пересчитываются одним UPDATE уроков курса с подзапросом к главам
+            assert not [
+                query
+                for query in queries
+                if query["sql"].startswith('UPDATE "courses_lesson"') and "SELECT" in query["sql"]
+            ]
+
+        # 3. Команда находит и исправляет расхождения.
+        Lesson.objects.filter(id=lesson.id).update(position=None)
+        Lesson.objects.exclude(id=lesson.id).filter(course=course).update(position=1)
+        call_command("check_lesson_positions", fix=True)
+        assert_positions(course)
+
+    def test_course_outline_cache(self):
+        """
+        Тест закешированного оглавления курса.
+
+        1) Повторное получение оглавления не выполняет SQL-запросов, навигация совпадает с позициями уроков.
+        2) Перенос урока сбрасывает кеш, оглавление отражает новый порядок.
+        3) Мягко удаленный урок пропадает из оглавления.
+        4) Кеш сбрасывается после фиксации транзакции, в которой пересчитаны позиции уроков.
+        """
+
+        def ordered_ids(course):
+            return list(Lesson.objects.filter(course=course).order_by("position").values_list("id", flat=True))
+
+        # 1. Оглавление берется из кеша.
+        course = CourseWith2Chapters()
+        CourseOutline.get(course.id)
+        with CaptureQueriesContext(connection) as queries:
+            outline = CourseOutline.get(course.id)
+        assert len(queries) == 0
+        lesson_ids = ordered_ids(course)
+        assert [lesson_id for lesson_id, _, _ in outline.lessons] == lesson_ids
+        assert outline.next_lesson(lesson_ids[0])["lesson_id"] == lesson_ids[1]
+        assert outline.prev_lesson(lesson_ids[0]) is None
+        assert outline.next_lesson(lesson_ids[-1]) is None
+
+        # 2. Перенос урока сбрасывает кеш.
+        lesson = Lesson.objects.get(id=lesson_ids[3])
+        lesson.order_number = 13
+        lesson.save()
+        outline = CourseOutline.get(course.id)
+        assert [lesson_id for lesson_id, _, _ in outline.lessons] == ordered_ids(course)
+        assert outline.prev_lesson(lesson.id)["lesson_id"] == lesson_ids[0]
+
+        # 3. Мягко удаленный урок пропадает из оглавления.
+        lesson.delete()
+        assert CourseOutline.get(course.id).index(lesson.id) is None
+
+        # 4. Кеш сбрасывается после фиксации транзакции, в которой пересчитаны позиции уроков.
+        CourseOutline.get(course.id)
+        with transaction.atomic():
+            LessonFactory(chapter=lesson.chapter)
+            assert cache.get(CourseOutline.cache_key(course.id)) is not None
+        assert cache.get(CourseOutline.cache_key(course.id)) is None
+        assert [lesson_id for lesson_id, _, _ in CourseOutline.get(course.id).lessons] == ordered_ids(course)
+
+    def test_course_progress_snapshot(self, user_client, user, anonymous_client):
+        """
+        Тест снимка прогресса пользователя по курсу.
+
+        1) Эндпоинт progress доступен только подписанному пользователю.
+        2) Прогресс по урокам, главам и курсу совпадает в эндпоинте progress и в детальном просмотре курса.
+        3) Количество запросов детального просмотра не зависит от количества уроков в курсе.
+        """
+        course = CourseWith2Chapters()
+        _ = CohortAlwaysAvailableFactory(course=course)
+        url = reverse("courses-progress", kwargs={"pk": course.id})
+        detail_url = reverse("courses-detail", kwargs={"pk": course.id})
+
+        # 1. Доступ только для подписанного пользователя.
+        assert anonymous_client.get(url).status_code == status.HTTP_401_UNAUTHORIZED
+        assert user_client.get(url).status_code == status.HTTP_404_NOT_FOUND
+        _ = SubscriptionFactory(course=course, user=user)
+
+        # 2. Прогресс совпадает в обоих эндпоинтах.
+        lesson = Lesson.objects.filter(course=course).order_by("position").first()
+        user_client.get(reverse("lessons-detail", kwargs={"pk": lesson.id}))
+        user_client.post(reverse("lessons-complete", kwargs={"pk": lesson.id}))
+        response = user_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        progress = response.json()
+        assert progress["course_id"] == course.id
+        assert progress["user_course_progress"] == BaseProgress.ProgressStatus.ACTIVE
+        assert {"id": lesson.id, "progress": BaseProgress.ProgressStatus.FINISHED} in progress["lessons"]
+        assert progress["chapters"] == [{"id": lesson.chapter_id, "progress": BaseProgress.ProgressStatus.ACTIVE}]
+
+        detail = user_client.get(detail_url).json()
+        lessons = {
+            item["id"]: item["user_lesson_progress"] for chapter in detail["chapters"] for item in chapter["lessons"]
+        }
+        chapters = {chapter["id"]: chapter["user_chapter_progress"] for chapter in detail["chapters"]}
+        assert lessons[lesson.id] == BaseProgress.ProgressStatus.FINISHED
+        assert sum(lessons.values()) == BaseProgress.ProgressStatus.FINISHED
+        assert chapters.pop(lesson.chapter_id) == BaseProgress.ProgressStatus.ACTIVE
+        assert set(chapters.values()) == {BaseProgress.ProgressStatus.NOT_STARTED}
+        assert detail["user_course_progress"] == progress["user_course_progress"]
+
+        # 3. Запросов не становится больше с ростом числа уроков.
+        with CaptureQueriesContext(connection) as queries:
+            user_client.get(detail_url)
+        LessonFactory.create_batch(5, chapter=lesson.chapter, status=Lesson.LessonStatus.PUBLISHED)
+        # Первый запрос после изменения уроков пересобирает снимок курса
+        user_client.get(detail_url)
+        with CaptureQueriesContext(connection) as more_lessons_queries:
+            user_client.get(detail_url)
+        assert len(more_lessons_queries) == len(queries)
+
+    def test_completion_counters(self, user):
+        """
+        Тест счетчиков пройденных уроков и глав.
+
+        1) Завершение урока увеличивает счетчик главы, количество запросов не зависит от числа уроков.
+        2) Неопубликованный урок не учитывается, глава завершается по опубликованным урокам.
+        3) После прохождения всех глав завершается курс.
+        4) Команда rebuild_course_statistics --progress восстанавливает счетчики.
+        """
+        course = CourseWith2Chapters()
+        subscription = SubscriptionFactory(course=course, user=user)
+        first_chapter, second_chapter = Chapter.objects.filter(course=course).order_by("order_number")
+        lessons = list(Lesson.objects.filter(chapter=first_chapter).order_by("order_number"))
+
+        def chapter_progress(chapter):
+            return ChapterProgressStatus.objects.get(subscription=subscription, chapter=chapter)
+
+        # 1. Счетчик главы растет, запросов постоянное количество.
+        lessons[0].finish(subscription)
+        with CaptureQueriesContext(connection) as queries:
+            lessons[1].finish(subscription)
+        LessonFactory.create_batch(5, chapter=first_chapter)
+        with CaptureQueriesContext(connection) as more_lessons_queries:
+            lessons[2].finish(subscription)
+        assert len(more_lessons_queries) == len(queries)
+        assert chapter_progress(first_chapter).finished_lessons == 3
+        assert chapter_progress(first_chapter).progress == BaseProgress.ProgressStatus.ACTIVE
+
+        # 2. Неопубликованные уроки не нужны для завершения главы, повторное завершение урока сверяет счетчик.
+        Lesson.objects.filter(chapter=first_chapter).exclude(id__in=[lesson.id for lesson in lessons[:3]]).update(
+            status=Lesson.LessonStatus.DRAFT
+        )
+        call_command("rebuild_course_statistics", courses=[course.id])
+        lessons[2].finish(subscription)
+        assert chapter_progress(first_chapter).progress == BaseProgress.ProgressStatus.FINISHED
+        assert CourseProgressStatus.objects.get(subscription=subscription, course=course).finished_chapters == 1
+
+        # 3. Курс завершается после прохождения всех глав.
+        for lesson in Lesson.objects.filter(chapter=second_chapter):
+            lesson.finish(subscription)
+        course_progress = CourseProgressStatus.objects.get(subscription=subscription, course=course)
+        assert course_progress.finished_chapters == 2
+        assert course_progress.progress == BaseProgress.ProgressStatus.FINISHED
+
+        # 4. Счетчики пересчитываются командой.
+        ChapterProgressStatus.objects.filter(subscription=subscription).update(finished_lessons=0)
+        CourseProgressStatus.objects.filter(subscription=subscription).update(finished_chapters=0)
+        call_command("rebuild_course_statistics", courses=[course.id], progress=True)
+        assert chapter_progress(first_chapter).finished_lessons == 3
+        assert chapter_progress(second_chapter).finished_lessons == 4
+        assert CourseProgressStatus.objects.get(subscription=subscription, course=course).finished_chapters == 2
+
+    def test_completion_counters_follow_published_lessons(self, user):
+        """
+        Тест, что глава не завершается раньше времени после изменения состава опубликованных уроков.
+
+        1) Снятый с публикации пройденный урок больше не учитывается в счетчике главы.
+        2) Глава не завершается, пока не пройден добавленный опубликованный урок.
+        3) Урок, пройденный до публикации, учитывается после его публикации.
+        4) Изменение, не меняющее состав опубликованных уроков, не пересчитывает прогресс подписчиков.
+        """
+        chapter = ChapterWith3Lessons()
+        _ = CohortAlwaysAvailableFactory(course=chapter.course)
+        subscription = SubscriptionFactory(course=chapter.course, user=user)
+        first, second, third = Lesson.objects.filter(chapter=chapter).order_by("order_number")
+
+        def chapter_progress():
+            return ChapterProgressStatus.objects.get(subscription=subscription, chapter=chapter)
+
+        # 1. Снятый с публикации урок не учитывается.
+        first.finish(subscription)
+        second.finish(subscription)
+        second.status = Lesson.LessonStatus.DRAFT
+        second.save()
+        assert chapter_progress().finished_lessons == 1
+
+        # 2. Добавленный урок нужно пройти.
+        added = LessonFactory(chapter=chapter)
+        third.finish(subscription)
+        assert chapter_progress().progress == BaseProgress.ProgressStatus.ACTIVE
+        draft = UnpublishedLessonFactory(chapter=chapter)
+        draft.finish(subscription)
+        added.finish(subscription)
+        assert chapter_progress().progress == BaseProgress.ProgressStatus.FINISHED
+
+        # 3. Урок, пройденный до публикации, учитывается после нее.
+        draft.status = Lesson.LessonStatus.PUBLISHED
+        draft.save()
+        assert chapter_progress().finished_lessons == 4
+
+        # 4. Изменение, не меняющее состав опубликованных уроков, не пересчитывает прогресс подписчиков.
+        draft.title = "Новое название"
+        with CaptureQueriesContext(connection) as queries:
+            draft.save()
+        progress_tables = (ChapterProgressStatus._meta.db_table, CourseProgressStatus._meta.db_table)
+        assert not [
+            query
+            for query in queries
+            if query["sql"].startswith("UPDATE") and any(t in query["sql"] for t in progress_tables)
+        ]
+
+    def test_progress_upsert(self, user):
+        """
+        Тест записи прогресса через upsert.
+
+        1) Запись создается и обновляется одним запросом, повторная установка того же статуса ничего не меняет.
+        2) Дублировать прогресс по паре (подписка, урок) нельзя.
+        """
+        lesson = LessonFactory()
+        _ = CohortAlwaysAvailableFactory(course=lesson.chapter.course)
+        subscription = SubscriptionFactory(course=lesson.chapter.course, user=user)
+
+        # 1. Один запрос на запись прогресса.
+        for progress, changed in (
+            (BaseProgress.ProgressStatus.ACTIVE, True),
+            (BaseProgress.ProgressStatus.ACTIVE, False),
+            (BaseProgress.ProgressStatus.FINISHED, True),
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                assert LessonProgressStatus.set_progress(subscription, lesson, progress) is changed
+            assert len(queries) == 1
+            assert LessonProgressStatus.objects.get(subscription=subscription, lesson=lesson).progress == progress
+
+        # 2. Дубликат запрещен ограничением уникальности.
+        with pytest.raises(IntegrityError), transaction.atomic():
+            LessonProgressStatus.objects.create(subscription=subscription, lesson=lesson)
+
+    @pytest.mark.skipif(connection.vendor != "sqlite", reason="План запроса проверяется для SQLite")
+    def test_hot_queries_use_indexes(self, user):
+        """Тест, что горячие запросы курсов используют составные частичные индексы."""
+        course = CourseWith2Chapters()
+        _ = CohortAlwaysAvailableFactory(course=course)
+        subscription = SubscriptionFactory(course=course, user=user)
+        lesson = Lesson.objects.filter(course=course).order_by("position").first()
+        lesson.finish(subscription)
+        out = StringIO()
+        call_command("explain_hot_queries", subscription=subscription.id, stdout=out)
+        plans = out.getvalue()
+        for index in (
+            "lesson_progress_status_idx",
+            "cohort_course_start_idx",
+            "lesson_chapter_status_idx",
+            "lesson_course_position_idx",
+        ):
+            assert index in plans
+
+    def test_lesson_retrieve_query_count(self, user_client, user, django_assert_num_queries):
+        """
+        Тест количества запросов при открытии урока.
+
+        Подписка с когортой загружается один раз за запрос и переиспользуется разрешениями и представлением.
+        Повторное открытие урока (оглавление курса в кеше, урок уже активирован):
+        пользователь (аутентификация), урок, подписки пользователя, пройденные уроки для
+        CurrentLessonOrProhibited, прогресс по уроку, состояние глав и уроков курса для ETag.
+        """
+        course = CourseWith2Chapters()
+        _ = CohortAlwaysAvailableFactory(course=course)
+        _ = SubscriptionFactory(course=course, user=user)
+        lesson = Lesson.objects.filter(course=course).order_by("position").first()
+        url = reverse("lessons-detail", kwargs={"pk": lesson.id})
+        assert user_client.get(url).status_code == status.HTTP_200_OK
+        with django_assert_num_queries(6):
+            response = user_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["user_lesson_progress"] == BaseProgress.ProgressStatus.ACTIVE
@@ -0,0 +1,138 @@
+import logging
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from lizaalert.courses.models import Lesson
+from lizaalert.homeworks.models import Homework
+from lizaalert.quizzes.answer_key import AnswerKey
+from lizaalert.quizzes.models import Question, Quiz, UserAnswer
+from lizaalert.settings.instrumentation import fingerprint
+from tests.factories.courses import CohortAlwaysAvailableFactory, CourseWith2Chapters, SubscriptionFactory
+
+# Бюджеты SQL-запросов представлений при первом запросе (кеши оглавления и снимка курса пусты).
+# Превышение бюджета - регрессия (например, N+1), уменьшение - повод снизить бюджет.
+QUERY_BUDGETS = {
+    "CourseViewSet.list": 4,
+    "CourseViewSet.retrieve": 13,
+    "LessonViewSet.retrieve": 11,
+    "QuizDetailAnswerView.get": 2,
+    "QuizDetailAnswerView.post": 3,
+    "HomeworkViewSet.retrieve": 2,
+    "VolunteerAPIview.get": 3,
+}
+
+
+@pytest.mark.django_db(transaction=True)
+class TestQueryBudgets:
+    @pytest.fixture
+    def course(self, user):
+        course = CourseWith2Chapters()
+        _ = CohortAlwaysAvailableFactory(course=course)
+        subscription = SubscriptionFactory(course=course, user=user)
+        lesson = Lesson.objects.filter(course=course).order_by("position").first()
+        lesson.activate(subscription)
+        return course
+
+    @pytest.fixture
+    def lesson(self, course):
+        return Lesson.objects.filter(course=course).order_by("position").first()
+
+    def assert_budget(self, query_budget, response):
+        assert response.status_code == status.HTTP_200_OK
+        stats = query_budget(response, QUERY_BUDGETS[response.query_stats.view])
+        assert not stats.duplicates
+        return stats
+
+    def test_course_list_budget(self, user_client, course, query_budget):
+        """Тест бюджета списка курсов: количество запросов не зависит от количества курсов."""
+        _ = CourseWith2Chapters()
+        self.assert_budget(query_budget, user_client.get(reverse("courses-list")))
+
+    def test_course_retrieve_budget(self, user_client, course, query_budget):
+        """Тест бюджета детального просмотра курса: курс и текущий урок загружаются один раз."""
+        self.assert_budget(query_budget, user_client.get(reverse("courses-detail", kwargs={"pk": course.id})))
+
+    def test_lesson_retrieve_budget(self, user_client, lesson, query_budget):
+        """Тест бюджета просмотра урока."""
+        self.assert_budget(query_budget, user_client.get(reverse("lessons-detail", kwargs={"pk": lesson.id})))
+
+    def test_quiz_answer_budget(self, user, user_client, lesson, query_budget):
+        """Тест бюджета получения ответов пользователя на квиз: последняя попытка загружается по указателю с квизом."""
+        quiz = Quiz.objects.create(
+            title="Квиз", description="Вопросы", status="active", deadline=timezone.now() + timedelta(days=1), retries=2
+        )
+        _ = Question.objects.create(
+            quiz=quiz, question_type="radio", title="Вопрос", order_number=1, content=[{"id": 1, "text": "Ответ"}]
+        )
+        Lesson.objects.filter(id=lesson.id).update(lesson_type=Lesson.LessonType.QUIZ, quiz=quiz)
+        _ = UserAnswer.start(user, quiz)
+        url = reverse("quiz-answer", kwargs={"lesson_id": lesson.id})
+        self.assert_budget(query_budget, user_client.get(url))
+
+    def test_quiz_submit_budget(self, user, user_client, lesson, query_budget):
+        """Тест бюджета отправки ответов на квиз: попытка с квизом загружается одним запросом, сохраняется одним UPDATE."""
+        quiz = Quiz.objects.create(
+            title="Квиз",
+            description="Вопросы",
+            status="active",
+            deadline=timezone.now() + timedelta(days=1),
+            duration_minutes=30,
+        )
+        _ = Question.objects.bulk_create(
+            Question(
+                quiz=quiz,
+                question_type="radio",
+                title=f"Вопрос {number}",
+                order_number=number,
+                content=[{"id": 1, "text": "Ответ", "is_correct": True}],
+            )
+            for number in range(1, 4)
+        )
+        Lesson.objects.filter(id=lesson.id).update(lesson_type=Lesson.LessonType.QUIZ, quiz=quiz)
+        _ = UserAnswer.start(user, quiz)
+        _ = AnswerKey.get(quiz)
+        url = reverse("quiz-answer", kwargs={"lesson_id": lesson.id})
+        answers = [{"question_id": question.id, "answer_id": [1]} for question in Question.objects.filter(quiz=quiz)]
+        self.assert_budget(query_budget, user_client.post(url, answers, format="json"))
+
+    def test_homework_retrieve_budget(self, user, user_client, course, lesson, query_budget):
+        """Тест бюджета получения домашней работы."""
+        _ = Homework.objects.create(lesson=lesson, subscription=course.subscriptions.get(user=user), text="Текст")
+        url = reverse("lesson-homework-detail", kwargs={"lesson_id": lesson.id})
+        self.assert_budget(query_budget, user_client.get(url))
+
+    def test_volunteer_profile_budget(self, user_client, query_budget):
+        """Тест бюджета профиля волонтера: пользователь, регион и отряд загружаются вместе с профилем."""
+        self.assert_budget(query_budget, user_client.get(reverse("profile")))
+
+
+@pytest.mark.django_db
+class TestQueryInstrumentation:
+    def test_disabled_by_default(self, user_client):
+        """Тест, что без настройки QUERY_INSTRUMENTATION ответ не меняется."""
+        response = user_client.get(reverse("profile"))
+        assert "Server-Timing" not in response
+        assert not hasattr(response, "query_stats")
+
+    def test_server_timing_and_log(self, user_client, settings, caplog):
+        """Тест заголовка Server-Timing и структурированной записи в лог."""
+        settings.QUERY_INSTRUMENTATION = True
+        with caplog.at_level(logging.INFO, logger="lizaalert.queries"):
+            response = user_client.get(reverse("profile"))
+        stats = response.query_stats
+        assert response["Server-Timing"] == f'db;dur={stats.duration:.1f};desc="{stats.count} queries"'
+        (record,) = caplog.records
+        assert record.query_stats["view"] == "VolunteerAPIview.get"
+        assert record.query_stats["queries"] == stats.count
+        assert record.query_stats["status"] == status.HTTP_200_OK
+
+    def test_fingerprint(self):
+        """Тест, что запросы, отличающиеся параметрами, длиной списка IN и LIMIT, имеют один отпечаток."""
+        assert fingerprint('SELECT * FROM "a" WHERE "id" IN (%s, %s) LIMIT 21') == fingerprint(
+            'SELECT *  FROM "a" WHERE "id" IN (%s) LIMIT 1'
+        )
+        assert fingerprint('SELECT * FROM "a"') != fingerprint('SELECT * FROM "b"')
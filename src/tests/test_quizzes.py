@@ -0,0 +1,358 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from lizaalert.courses.models import Lesson
+from lizaalert.quizzes.answer_key import AnswerKey
+from lizaalert.quizzes.models import LatestAttempt, Question, QuestionStatistics, Quiz, QuizStatistics, UserAnswer
+from lizaalert.quizzes.utils import compare_answers
+from tests.factories.courses import CourseWith2Chapters
+from tests.factories.users import UserFactory
+
+
+@pytest.fixture
+def quiz():
+    quiz = Quiz.objects.create(
+        title="Квиз",
+        description="Вопросы",
+        status="active",
+        deadline=timezone.now() + timedelta(days=1),
+        duration_minutes=30,
+        retries=2,
+    )
+    variants = [{"id": 1, "text": "Да", "is_correct": True}, {"id": 2, "text": "Нет", "is_correct": False}]
+    quiz.radio = Question.objects.create(
+        quiz=quiz, question_type="radio", title="Один ответ", order_number=1, content=variants
+    )
+    quiz.checkbox = Question.objects.create(
+        quiz=quiz,
+        question_type="checkbox",
+        title="Несколько ответов",
+        order_number=2,
+        content=[*variants, {"id": 3, "text": "Возможно", "is_correct": True}],
+    )
+    quiz.text = Question.objects.create(
+        quiz=quiz,
+        question_type="text_answer",
+        title="Текстовый ответ",
+        order_number=3,
+        content=[{"id": 1, "text": "Лиза  Алерт", "is_correct": True}, {"id": 2, "text": "ЛА", "is_correct": True}],
+    )
+    return quiz
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAnswerKey:
+    def test_grading(self, quiz):
+        """Тест правил проверки: множества вариантов для checkbox и radio, нормализованный текст для text_answer."""
+        answers = [
+            {"question_id": quiz.radio.id, "answer_id": [1]},
+            {"question_id": quiz.checkbox.id, "answer_id": [3, 1]},
+            {"question_id": quiz.text.id, "answer_id": [" лиза алерт "]},
+            {"question_id": 0, "answer_id": [1]},
+        ]
+        result, score = compare_answers(answers, quiz)
+        assert score == 3
+        assert result == [
+            {"question_id": quiz.radio.id, "correct_answer_id": [1], "is_correct": True},
+            {"question_id": quiz.checkbox.id, "correct_answer_id": [1, 3], "is_correct": True},
+            {"question_id": quiz.text.id, "correct_answer_id": [1, 2], "is_correct": True},
+            {"question_id": 0, "correct_answer_id": [], "is_correct": False},
+        ]
+        wrong = [
+            {"question_id": quiz.radio.id, "answer_id": [1, 2]},
+            {"question_id": quiz.checkbox.id, "answer_id": [1]},
+            {"question_id": quiz.text.id, "answer_id": ["Лиза", "ЛА"]},
+        ]
+        assert compare_answers(wrong, quiz)[1] == 0
+
+    def test_grading_without_queries(self, quiz, django_assert_num_queries):
+        """Тест, что после компиляции ключа проверка не обращается к базе данных, в том числе из памяти процесса."""
+        answers = [{"question_id": quiz.radio.id, "answer_id": [1]}]
+        with django_assert_num_queries(1):
+            compare_answers(answers, quiz)
+        with django_assert_num_queries(0):
+            assert compare_answers(answers, quiz)[1] == 1
+        AnswerKey._compiled.clear()
+        with django_assert_num_queries(0):
+            assert compare_answers(answers, quiz)[1] == 1
+        assert AnswerKey.get(quiz).revision == Question.objects.filter(quiz=quiz).latest("updated_at").updated_at
+
+    def test_invalidation_on_question_change(self, quiz):
+        """Тест пересборки ключа при изменении вопроса квиза."""
+        answers = [{"question_id": quiz.radio.id, "answer_id": [2]}]
+        assert compare_answers(answers, quiz)[1] == 0
+        quiz.radio.content = [
+            {"id": 1, "text": "Да", "is_correct": False},
+            {"id": 2, "text": "Нет", "is_correct": True},
+        ]
+        quiz.radio.save()
+        # Версия ключа читается из квиза, загруженного из базы данных, как при проверке ответов попытки
+        previous_version = AnswerKey.current_version(quiz)
+        quiz.refresh_from_db()
+        assert AnswerKey.current_version(quiz) != previous_version
+        assert compare_answers(answers, quiz)[1] == 1
+
+    def test_invalidation_on_question_move(self, quiz):
+        """Тест пересборки ключей прежнего и нового квиза при переносе вопроса в другой квиз."""
+        quiz.refresh_from_db()
+        answers = [{"question_id": quiz.radio.id, "answer_id": [1]}]
+        assert compare_answers(answers, quiz)[1] == 1
+        other_quiz = Quiz.objects.create(
+            title="Другой квиз", description="Вопросы", status="active", deadline=quiz.deadline
+        )
+        Question.objects.create(
+            quiz=other_quiz, question_type="radio", title="Вопрос", order_number=1, content=quiz.radio.content
+        )
+        other_quiz.refresh_from_db()
+        assert compare_answers(answers, other_quiz)[1] == 0
+        previous_versions = AnswerKey.current_version(quiz), AnswerKey.current_version(other_quiz)
+        quiz.radio.quiz = other_quiz
+        quiz.radio.save()
+        quiz.refresh_from_db()
+        other_quiz.refresh_from_db()
+        assert AnswerKey.current_version(quiz) != previous_versions[0]
+        assert AnswerKey.current_version(other_quiz) != previous_versions[1]
+        assert compare_answers(answers, quiz)[1] == 0
+        assert compare_answers(answers, other_quiz)[1] == 1
+
+    def test_submit_text_answer(self, quiz, user_client):
+        """Тест проверки текстового ответа при отправке ответов на квиз."""
+        lesson = Lesson.objects.filter(course=CourseWith2Chapters()).first()
+        Lesson.objects.filter(id=lesson.id).update(lesson_type=Lesson.LessonType.QUIZ, quiz=quiz)
+        response = user_client.post(reverse("run-quiz", kwargs={"lesson_id": lesson.id}), format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+        answers = [{"question_id": quiz.text.id, "answer_id": ["ла"]}]
+        response = user_client.post(reverse("quiz-answer", kwargs={"lesson_id": lesson.id}), answers, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["score"] == 1
+        assert response.data["result"] == [
+            {"question_id": quiz.text.id, "correct_answer_id": [1, 2], "is_correct": True}
+        ]
+
+
+@pytest.mark.django_db(transaction=True)
+class TestQuizSubmission:
+    @pytest.fixture
+    def lesson(self, quiz):
+        lesson = Lesson.objects.filter(course=CourseWith2Chapters()).first()
+        Lesson.objects.filter(id=lesson.id).update(lesson_type=Lesson.LessonType.QUIZ, quiz=quiz)
+        return lesson
+
+    def test_submit(self, quiz, lesson, user, user_client):
+        """Тест отправки ответов: результат сохранен в последней попытке пользователя."""
+        for _ in range(2):
+            user_client.post(reverse("run-quiz", kwargs={"lesson_id": lesson.id}), format="json")
+        answers = [
+            {"question_id": quiz.radio.id, "answer_id": [1]},
+            {"question_id": quiz.checkbox.id, "answer_id": [1]},
+        ]
+        response = user_client.post(reverse("quiz-answer", kwargs={"lesson_id": lesson.id}), answers, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["remaining_retries"] == 0
+        first, last = UserAnswer.objects.filter(user=user, quiz=quiz).order_by("id")
+        assert (first.answers, first.status) == (None, UserAnswer.Status.EXPIRED)
+        assert (last.answers, last.score, last.final_result) == (answers, 1, "True")
+        assert last.status == UserAnswer.Status.SUBMITTED
+        assert last.end_date is not None
+        assert response.data["id"] == last.id
+
+    def test_submit_errors(self, quiz, lesson, user_client):
+        """Тест отправки ответов без начатой попытки и с некорректными ответами."""
+        url = reverse("quiz-answer", kwargs={"lesson_id": lesson.id})
+        response = user_client.post(url, [{"question_id": quiz.radio.id, "answer_id": [1]}], format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data == {"message": "Тест еще не начат."}
+        user_client.post(reverse("run-quiz", kwargs={"lesson_id": lesson.id}), format="json")
+        response = user_client.post(url, [{"question_id": "вопрос"}], format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert {error["loc"][-1] for error in response.data["answers"]} == {"question_id", "answer_id"}
+        assert UserAnswer.objects.get(quiz=quiz).answers is None
+
+    def test_attempt_state_machine(self, quiz, lesson, user, user_client):
+        """Тест состояний попытки: повторная отправка, истечение времени, ограничение попыток и срок выполнения."""
+        run_url = reverse("run-quiz", kwargs={"lesson_id": lesson.id})
+        answer_url = reverse("quiz-answer", kwargs={"lesson_id": lesson.id})
+        answers = [{"question_id": quiz.radio.id, "answer_id": [1]}]
+        response = user_client.post(run_url, format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["status"] == UserAnswer.Status.STARTED
+        assert user_client.post(answer_url, answers, format="json").status_code == status.HTTP_200_OK
+        response = user_client.post(answer_url, answers, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data == {"message": "Ответы на эту попытку уже отправлены, начните новую попытку."}
+
+        assert user_client.post(run_url, format="json").status_code == status.HTTP_201_CREATED
+        attempt = LatestAttempt.objects.get(user=user, quiz=quiz).attempt
+        assert attempt.retry_count == 2
+        assert attempt.expires_at == attempt.start_date + timedelta(minutes=30)
+        UserAnswer.objects.filter(id=attempt.id).update(expires_at=timezone.now() - timedelta(seconds=1))
+        response = user_client.post(answer_url, answers, format="json")
+        assert response.data == {"message": "Время истекло"}
+        attempt.refresh_from_db()
+        assert (attempt.status, attempt.answers) == (UserAnswer.Status.EXPIRED, None)
+        assert user_client.get(answer_url).data["id"] == attempt.id
+
+        response = user_client.post(run_url, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data == {"message": "Попытки закончились"}
+        Quiz.objects.filter(id=quiz.id).update(retries=0, deadline=timezone.now() - timedelta(seconds=1))
+        response = user_client.post(run_url, format="json")
+        assert response.data == {"message": "Срок выполнения теста истек."}
+        assert UserAnswer.objects.filter(quiz=quiz).count() == 2
+
+    def test_attempt_expires_at(self, quiz):
+        """Тест времени окончания попытки: по длительности квиза, но не позже срока выполнения."""
+        now = timezone.now()
+        assert quiz.attempt_expires_at(now) == now + timedelta(minutes=30)
+        assert quiz.attempt_expires_at(quiz.deadline) == quiz.deadline
+        # Без длительности попытка истекает сразу, как и при прежней проверке времени решения
+        quiz.duration_minutes = 0
+        assert quiz.attempt_expires_at(now) == now
+
+    def test_concurrent_first_start(self, quiz):
+        """Тест, что первый запуск, проигравший гонку за создание указателя LatestAttempt, повторяется."""
+        user = UserFactory()
+        create, conflicts = LatestAttempt.objects.create, [IntegrityError()]
+
+        def create_after_conflict(**kwargs):
+            # Параллельный запуск создал указатель раньше: первая вставка нарушает уникальность
+            if conflicts:
+                raise conflicts.pop()
+            return create(**kwargs)
+
+        with patch.object(LatestAttempt.objects, "create", side_effect=create_after_conflict) as create_pointer:
+            attempt = UserAnswer.start(user, quiz)
+        assert create_pointer.call_count == 2
+        assert LatestAttempt.objects.get(user=user, quiz=quiz).attempt == attempt
+        assert list(UserAnswer.objects.filter(user=user, quiz=quiz)) == [attempt]
+
+    def test_expire_quiz_attempts_command(self, quiz):
+        """Тест закрытия истекших попыток: пачками по одному UPDATE, с окончательным результатом и временем завершения."""
+        attempts = [UserAnswer.start(UserFactory(), quiz) for _ in range(4)]
+        overdue_ids = [attempt.id for attempt in attempts[:3]]
+        UserAnswer.objects.filter(id__in=overdue_ids).update(expires_at=timezone.now() - timedelta(minutes=1))
+        out = StringIO()
+        with CaptureQueriesContext(connection) as context:
+            call_command("expire_quiz_attempts", batch_size=2, stdout=out)
+        assert [query["sql"].startswith("UPDATE") for query in context.captured_queries] == [True, True]
+        assert "Закрыто истекших попыток: 3" in out.getvalue()
+        for attempt in UserAnswer.objects.filter(id__in=overdue_ids):
+            assert (attempt.status, attempt.final_result, attempt.end_date) == (
+                UserAnswer.Status.EXPIRED,
+                "False",
+                attempt.expires_at,
+            )
+        assert UserAnswer.objects.get(id=attempts[3].id).status == UserAnswer.Status.STARTED
+
+        with patch("time.sleep", side_effect=KeyboardInterrupt):
+            call_command("expire_quiz_attempts", loop=True, stdout=out)
+        assert "Остановлено" in out.getvalue()
+
+    def test_benchmark_quiz_submit_command(self):
+        """Тест команды замера отправки ответов: данные откатываются, целевое количество запросов проверяется."""
+        out = StringIO()
+        call_command("benchmark_quiz_submit", questions=10, repeat=2, max_queries=3, stdout=out)
+        assert "p95" in out.getvalue()
+        assert not Quiz.objects.exists()
+        with pytest.raises(CommandError, match="запросов к БД"):
+            call_command("benchmark_quiz_submit", questions=10, repeat=1, max_queries=1, stdout=StringIO())
+
+
+@pytest.mark.django_db(transaction=True)
+class TestQuizStatistics:
+    @staticmethod
+    def submit(quiz, answer_id):
+        attempt = UserAnswer.start(UserFactory(), quiz)
+        attempt.submit([{"question_id": quiz.radio.id, "answer_id": [answer_id]}, {"question_id": 0, "answer_id": [1]}])
+        return attempt
+
+    def test_aggregate_quiz_statistics(self, quiz):
+        """Тест инкрементальной агрегации: каждая закрытая попытка учитывается один раз, открытые не учитываются."""
+        Quiz.objects.filter(id=quiz.id).update(passing_score=1)
+        quiz.refresh_from_db()
+        self.submit(quiz, 1)
+        self.submit(quiz, 2)
+        expired = UserAnswer.start(UserFactory(), quiz)
+        UserAnswer.close_expired(UserAnswer.objects.filter(id=expired.id), timezone.now(), timezone.now())
+        _ = UserAnswer.start(UserFactory(), quiz)
+        out = StringIO()
+        call_command("aggregate_quiz_statistics", lag=0, batch_size=2, stdout=out)
+        assert "Учтено попыток: 3" in out.getvalue()
+        statistics = QuizStatistics.objects.get(quiz=quiz)
+        assert (statistics.attempts, statistics.submitted, statistics.passed) == (3, 2, 1)
+        assert statistics.pass_rate == pytest.approx(1 / 3)
+        assert statistics.average_solve_seconds is not None
+        radio = QuestionStatistics.objects.get(question=quiz.radio)
+        assert (radio.attempts, radio.correct, radio.correct_rate) == (2, 1, 0.5)
+        assert not QuestionStatistics.objects.filter(question=quiz.checkbox).exists()
+
+        call_command("aggregate_quiz_statistics", lag=0, stdout=out)
+        assert "Учтено попыток: 0" in out.getvalue()
+        self.submit(quiz, 1)
+        call_command("aggregate_quiz_statistics", lag=0, stdout=out)
+        statistics.refresh_from_db()
+        assert (statistics.attempts, statistics.passed) == (4, 2)
+        radio.refresh_from_db()
+        assert (radio.attempts, radio.correct) == (3, 2)
+        call_command("aggregate_quiz_statistics", stdout=out)
+        assert "Учтено попыток: 0" in out.getvalue()
+
+    def test_quiz_statistics_endpoint(self, quiz, user_client, user_admin_teacher_role, anonymous_client):
+        """Тест статистики квиза для преподавателей: доступ, счетчики квиза и вопросов."""
+        lesson = Lesson.objects.filter(course=CourseWith2Chapters()).first()
+        Lesson.objects.filter(id=lesson.id).update(lesson_type=Lesson.LessonType.QUIZ, quiz=quiz)
+        url = reverse("quiz-statistics", kwargs={"lesson_id": lesson.id})
+        assert anonymous_client.get(url).status_code == status.HTTP_401_UNAUTHORIZED
+        response = user_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert (response.data["attempts"], response.data["pass_rate"], response.data["aggregated_until"]) == (
+            0,
+            None,
+            None,
+        )
+        self.submit(quiz, 2)
+        call_command("aggregate_quiz_statistics", lag=0, stdout=StringIO())
+        response = user_client.get(url)
+        assert (response.data["attempts"], response.data["submitted"], response.data["pass_rate"]) == (1, 1, 1.0)
+        assert response.data["aggregated_until"] is not None
+        assert [question["question_id"] for question in response.data["questions"]] == [
+            quiz.radio.id,
+            quiz.checkbox.id,
+            quiz.text.id,
+        ]
+        assert response.data["questions"][0] == {
+            "question_id": quiz.radio.id,
+            "title": "Один ответ",
+            "order_number": 1,
+            "attempts": 1,
+            "correct": 0,
+            "correct_rate": 0.0,
+        }
+
+    def test_quiz_statistics_forbidden_for_students(self, quiz, user_client):
+        """Тест, что статистика квиза недоступна слушателям."""
+        lesson = Lesson.objects.filter(course=CourseWith2Chapters()).first()
+        Lesson.objects.filter(id=lesson.id).update(lesson_type=Lesson.LessonType.QUIZ, quiz=quiz)
+        response = user_client.get(reverse("quiz-statistics", kwargs={"lesson_id": lesson.id}))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_statistics_admin(self, quiz, admin_client):
+        """Тест страниц статистики в админке: вопросы без ответов - в конце списка."""
+        self.submit(quiz, 1)
+        call_command("aggregate_quiz_statistics", lag=0, stdout=StringIO())
+        _ = QuestionStatistics.objects.create(question=quiz.checkbox)
+        for model in ("quizstatistics", "questionstatistics"):
+            response = admin_client.get(reverse(f"admin:quizzes_{model}_changelist"))
+            assert response.status_code == status.HTTP_200_OK
+        results = list(response.context["cl"].result_list)
+        assert [item.question_id for item in results] == [quiz.radio.id, quiz.checkbox.id]
@@ -72,3 +72,20 @@ class TestWebinar:
 
         # 2. Проверяем, что пройденный вебинар возвращается со статусом завершен.
         assert_status(datetime.date.today() - datetime.timedelta(days=5), Webinar.Status.FINISHED)
+
+    def test_webinar_conditional_get(self, user_client, user):
+        """Проверить, что повторный запрос вебинара с ETag получает 304, а изменение вебинара меняет ETag."""
+        lesson = LessonFactory(lesson_type=Lesson.LessonType.WEBINAR)
+        cohort = CohortAlwaysAvailableFactory(course=lesson.chapter.course)
+        webinar = WebinarFactory(
+            lesson=lesson, webinar_date=datetime.date.today() + datetime.timedelta(days=5), cohort=cohort
+        )
+        _ = SubscriptionFactory(user=user, course=lesson.chapter.course, cohort=cohort)
+        url = reverse("lesson-webinar-detail", kwargs={"lesson_id": lesson.id})
+        etag = user_client.get(url)["ETag"]
+        assert user_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        webinar.link = "https://example.com/webinar"
+        webinar.save()
+        response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.json()["link"] == webinar.link